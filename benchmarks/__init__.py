@@ -0,0 +1,20 @@
+"""Benchmarks of rayvision_clarisse.
+
+Results are saved as json to ``benchmarks/results``.
+
+"""
+
+# Import built-in models
+import json
+import os
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "results")
+
+
+def save_results(name, results):
+    """Save benchmark results to ``results/<name>.json``."""
+    if not os.path.exists(RESULTS_FOLDER):
+        os.makedirs(RESULTS_FOLDER)
+    with open(os.path.join(RESULTS_FOLDER, name + ".json"), "w") as json_f:
+        json.dump(results, json_f, indent=2, sort_keys=True)
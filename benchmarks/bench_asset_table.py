@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the memory and iteration speed of ``AssetTable``.
+
+The entries of a synthetic scene of ``BENCH_ENTRIES`` cache frames, one
+million by default, are stored as a list of dicts and as an ``AssetTable``.
+The table holds them in less than half the memory, reading them back is
+slower, see ``asset_table``::
+
+    python -m pytest benchmarks/bench_asset_table.py
+    BENCH_ENTRIES=100000 python -m benchmarks.bench_asset_table
+
+"""
+
+# Import built-in models
+import gc
+import os
+import time
+import tracemalloc
+
+from benchmarks import save_results
+from rayvision_clarisse.asset_table import AssetTable
+
+ENTRIES = int(os.environ.get("BENCH_ENTRIES", 1000000))
+
+# Frames per cache folder of the synthetic scene.
+FRAMES_PER_FOLDER = 1000
+
+
+def iter_synthetic_entries(entries=ENTRIES):
+    """Iterate the upload entries of cache frames."""
+    for index in range(entries):
+        folder, frame = divmod(index, FRAMES_PER_FOLDER)
+        local = "/mnt/project/cache/sim_{:05d}/sim.{:04d}.vdb".format(
+            folder, frame)
+        yield {"local": local, "server": "/mnt" + local, "size": 1024}
+
+
+def traced_size(build):
+    """Build a store and get it with the memory it holds, in MB."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        store = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return store, round(size / 1024.0 / 1024.0, 1)
+
+
+def timed(function):
+    """Get the seconds taken by a function, best of three runs."""
+    seconds = []
+    for _ in range(3):
+        start = time.time()
+        function()
+        seconds.append(time.time() - start)
+    return round(min(seconds), 4)
+
+
+def run_benchmark(entries=ENTRIES):
+    """Measure both stores.
+
+    Returns:
+        dict: Memory in MB and iteration seconds of each store.
+
+    """
+    dicts, dicts_mb = traced_size(
+        lambda: [dict(entry) for entry in iter_synthetic_entries(entries)])
+    table, table_mb = traced_size(
+        lambda: AssetTable(iter_synthetic_entries(entries)))
+    return {
+        "entries": entries,
+        "dicts": {
+            "memory_mb": dicts_mb,
+            "iterate_local_seconds": timed(
+                lambda: [entry["local"] for entry in dicts]),
+        },
+        "table": {
+            "memory_mb": table_mb,
+            "iterate_local_seconds": timed(
+                lambda: [entry["local"] for entry in table]),
+            "iterate_column_seconds": timed(
+                lambda: list(table.iter_column("local"))),
+        },
+    }
+
+
+def test_asset_table_memory():
+    """Test the table holds the entries in less than half the memory."""
+    results = run_benchmark()
+    save_results("asset_table", results)
+    assert (results["table"]["memory_mb"] <
+            results["dicts"]["memory_mb"] / 2)
+
+
+if __name__ == "__main__":
+    print(run_benchmark())
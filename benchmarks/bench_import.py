@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the import time of rayvision_clarisse.
+
+Runs ``python -X importtime`` in fresh interpreters and records the fastest
+cumulative import time of each module, the least disturbed by the load of
+the machine. Run it with pytest or directly::
+
+    python -m pytest benchmarks/bench_import.py
+    python -m benchmarks.bench_import
+
+The budgets are for a desktop machine, scale them on slower ones, e.g. a
+shared CI runner, with ``BENCH_IMPORT_SCALE=3``.
+
+"""
+
+# Import built-in models
+import os
+import subprocess
+import sys
+
+from benchmarks import save_results
+
+# Modules measured and their budget in milliseconds.
+IMPORT_BUDGETS_MS = {
+    "rayvision_clarisse": 20,
+    "rayvision_clarisse.analyse_clarisse": 150,
+}
+
+RUNS = 5
+
+# Factor applied to every budget.
+BUDGET_SCALE = float(os.environ.get("BENCH_IMPORT_SCALE", 1.0))
+
+
+def import_time_ms(module):
+    """Get the cumulative import time of a module in a fresh interpreter.
+
+    Args:
+        module (str): Module name.
+
+    Returns:
+        float: Milliseconds.
+
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    for line in process.stderr.decode().splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000.0
+    raise Exception("{} was not imported".format(module))
+
+
+def run_benchmark(runs=RUNS):
+    """Measure every module of ``IMPORT_BUDGETS_MS``.
+
+    Returns:
+        dict: Fastest milliseconds by module.
+
+    """
+    return {module: min(import_time_ms(module) for _ in range(runs))
+            for module in IMPORT_BUDGETS_MS}
+
+
+def test_import_time():
+    """Test the import time of every module is within its budget."""
+    results = run_benchmark()
+    save_results("import_time", results)
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        assert results[module] <= budget * BUDGET_SCALE, (module,
+                                                          results[module])
+
+
+if __name__ == "__main__":
+    for module_name, milliseconds in sorted(run_benchmark().items()):
+        print("%-45s %8.1f ms" % (module_name, milliseconds))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the steps of the analysis pipeline on synthetic scenes.
+
+The analyzer is replaced by the stub of ``stub_analyzer``, so the cases run
+on any platform with a shebang. Run them with::
+
+    python -m pytest benchmarks/bench_pipeline.py
+    BENCH_SIZES=1k,100k python -m pytest benchmarks/bench_pipeline.py
+
+"""
+
+# Import built-in models
+import os
+import shutil
+
+import pytest
+
+from benchmarks.conftest import bench_sizes
+from benchmarks import synthetic
+from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+from rayvision_clarisse.constants import MISSING_ASSET_CODE
+from rayvision_clarisse.dir_index import DirectoryIndex
+from rayvision_clarisse.utils import convert_path
+from rayvision_clarisse.utils import PathMapper
+
+SOFTWARE_VERSION = "clarisse_ifx_4.0_sp3"
+
+
+def make_analyze_obj(scene, analyzer, **kwargs):
+    """Create an AnalyzeClarisse of a synthetic scene in its own root."""
+    workspace = os.path.join(os.path.dirname(scene), "workspace")
+    if not os.path.exists(workspace):
+        os.makedirs(workspace)
+    kwargs.setdefault("fingerprint_cache", False)
+    return AnalyzeClarisse(scene, SOFTWARE_VERSION, workspace=workspace,
+                           custom_exe_path=analyzer, **kwargs)
+
+
+@pytest.mark.parametrize("assets", bench_sizes())
+def test_analyse(benchmark, scene_factory, stub_analyzer, assets):
+    """Benchmark a whole analysis with the stub analyzer."""
+    scene = scene_factory(assets, output_lines=min(assets, 10000),
+                          missing_lines=10)
+
+    def setup():
+        return (make_analyze_obj(scene, stub_analyzer),), {}
+
+    def analyse(analyze_obj):
+        analyze_obj.analyse()
+        return analyze_obj
+
+    analyze_obj = benchmark.pedantic(analyse, setup=setup, rounds=1)
+    assert len(analyze_obj.upload_info["asset"]) >= assets
+    assert len(analyze_obj.tips_info[MISSING_ASSET_CODE]) == 10
+
+
+@pytest.mark.parametrize("assets", bench_sizes())
+def test_gather_upload_dict(benchmark, scene_factory, stub_analyzer,
+                            assets):
+    """Benchmark gathering upload.json from the analyzer output."""
+    scene = scene_factory(assets)
+    analyzed = make_analyze_obj(scene, stub_analyzer)
+    analyzed.analyse(no_upload=True)
+    upload_json = analyzed.upload_json + ".analyzer"
+    shutil.copyfile(analyzed.upload_json, upload_json)
+
+    def setup():
+        shutil.copyfile(upload_json, analyzed.upload_json)
+        analyzed.result.sync_from_disk()
+        return (), {}
+
+    benchmark.pedantic(analyzed.gather_upload_dict, setup=setup, rounds=3)
+    assert len(analyzed.upload_info["asset"]) >= assets
+
+
+@pytest.mark.parametrize("assets", bench_sizes())
+def test_get_file_md5(benchmark, tmpdir, stub_analyzer, assets):
+    """Benchmark hashing a file of 64 bytes per asset, without cache."""
+    scene = tmpdir.join("scene.project")
+    scene.write_binary(b"x" * (64 * assets))
+    analyze_obj = make_analyze_obj(str(scene), stub_analyzer)
+
+    digest = benchmark(analyze_obj.get_file_md5, str(scene))
+    assert len(digest) == 32
+
+
+@pytest.mark.parametrize("assets", bench_sizes())
+def test_convert_path(benchmark, assets):
+    """Benchmark converting the local paths of a scene to server paths."""
+    paths = list(synthetic.iter_asset_files("D:/project", assets))
+
+    servers = benchmark(lambda: [convert_path(path) for path in paths])
+    assert servers[0] == "/D/project/textures/tex_00000.exr"
+
+
+@pytest.mark.parametrize("assets", bench_sizes())
+def test_path_mapper(benchmark, assets):
+    """Benchmark converting paths with mapping rules."""
+    paths = list(synthetic.iter_asset_files("D:/project", assets))
+    mapper = PathMapper({"D:/project/cache": "/cache"})
+
+    servers = benchmark(mapper.to_server_list, paths)
+    assert servers[-1].startswith("/cache/")
+
+
+@pytest.mark.parametrize("use_index", [False, True], ids=["stat", "index"])
+@pytest.mark.parametrize("assets", bench_sizes())
+def test_exists(benchmark, scene_factory, assets, use_index):
+    """Benchmark checking every file of a scene, one by one or indexed."""
+    scene = scene_factory(assets)
+    paths = list(synthetic.iter_asset_files(os.path.dirname(scene), assets))
+
+    def check():
+        exists = DirectoryIndex().exists if use_index else os.path.exists
+        return sum(1 for path in paths if exists(path))
+
+    found = benchmark(check)
+    assert found in (0, len(paths))
+
+
+@pytest.mark.parametrize("assets", bench_sizes())
+def test_tips(benchmark, tmpdir, stub_analyzer, assets):
+    """Benchmark collecting one analyzer tip per asset and saving them."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    lines = ["Reference file not found: D:/missing/{}.exr".format(index)
+             for index in range(assets)]
+
+    def setup():
+        analyze_obj = make_analyze_obj(str(scene), stub_analyzer)
+        # Start each round without the tips saved by the previous one.
+        if os.path.exists(analyze_obj.tips_json):
+            os.remove(analyze_obj.tips_json)
+        return (analyze_obj,), {}
+
+    def collect_tips(analyze_obj):
+        parser = analyze_obj.create_output_parser()
+        for line in lines:
+            parser.feed(line)
+        analyze_obj.save_tips()
+        return analyze_obj
+
+    analyze_obj = benchmark.pedantic(collect_tips, setup=setup, rounds=3)
+    assert len(analyze_obj.tips_info[MISSING_ASSET_CODE]) == assets
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the peak memory of gathering a huge upload.json.
+
+A synthetic upload.json of ``BENCH_ENTRIES`` entries, one million by
+default, is gathered by loading it into an ``UploadManifest`` and by
+``stream_upload``, the peak memory of each is traced with ``tracemalloc``.
+A whole incremental ``analyse()`` of a synthetic scene of
+``BENCH_ANALYSE_ENTRIES`` files is traced the same way, with and without
+``stream_upload``::
+
+    python -m pytest benchmarks/bench_stream.py
+    BENCH_ENTRIES=100000 python -m benchmarks.bench_stream
+
+"""
+
+# Import built-in models
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import pytest
+
+from benchmarks import save_results
+from benchmarks import synthetic
+from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+from rayvision_clarisse.json_stream import JsonStreamWriter
+from rayvision_clarisse.manifest import stream_upload
+from rayvision_clarisse.manifest import UploadManifest
+from rayvision_clarisse import utils
+
+ENTRIES = int(os.environ.get("BENCH_ENTRIES", 1000000))
+
+# Files of the scene analysed end to end, all created on disk.
+ANALYSE_ENTRIES = int(os.environ.get("BENCH_ANALYSE_ENTRIES", 100000))
+
+# Frames per cache folder of the synthetic scene.
+FRAMES_PER_FOLDER = 1000
+
+
+def write_synthetic_upload(upload_path, entries=ENTRIES):
+    """Write an upload.json of cache frames, a tenth of them listed twice."""
+    with JsonStreamWriter(upload_path) as writer:
+        for index in range(entries):
+            if index % 10 == 9:
+                index -= 5
+            folder, frame = divmod(index, FRAMES_PER_FOLDER)
+            local = "/mnt/project/cache/sim_{:05d}/sim.{:04d}.vdb".format(
+                folder, frame)
+            writer.append("asset", {"local": local, "server": local})
+
+
+def gather_in_memory(upload_path):
+    """Gather upload.json the way ``gather_upload_dict`` does."""
+    upload_info = utils.json_load(upload_path)
+    manifest = UploadManifest(upload_info["asset"])
+    manifest.fill_sizes()
+    upload_info["asset"] = manifest.to_list()
+    utils.json_save(upload_path, upload_info)
+    return len(manifest)
+
+
+def gather_streaming(upload_path):
+    """Gather upload.json with ``stream_upload``."""
+    return stream_upload(upload_path, upload_path)[0]
+
+
+def measure(function, upload_path):
+    """Run a gather function on a fresh copy of upload.json.
+
+    Returns:
+        dict: Entries written, seconds and peak traced memory in MB.
+
+    """
+    work_path = upload_path + ".work"
+    shutil.copyfile(upload_path, work_path)
+    tracemalloc.start()
+    start = time.time()
+    try:
+        count = function(work_path)
+        seconds = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        os.remove(work_path)
+    return {"entries": count, "seconds": round(seconds, 3),
+            "peak_mb": round(peak / 1024.0 / 1024.0, 1)}
+
+
+def run_benchmark(entries=ENTRIES):
+    """Measure both ways of gathering upload.json.
+
+    Returns:
+        dict: Measures by way, see ``measure``.
+
+    """
+    folder = tempfile.mkdtemp()
+    try:
+        upload_path = os.path.join(folder, "upload.json")
+        write_synthetic_upload(upload_path, entries)
+        return {
+            "source_entries": entries,
+            "in_memory": measure(gather_in_memory, upload_path),
+            "streaming": measure(gather_streaming, upload_path),
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def measure_analyse(folder, scene, analyzer, stream):
+    """Run an incremental analysis of a scene in a new workspace.
+
+    The upload.json and asset state are written in both cases, the previous
+    workspace is not given so every file is stat.
+
+    Returns:
+        dict: Upload entries, seconds and peak traced memory in MB.
+
+    """
+    workspace = tempfile.mkdtemp(dir=folder)
+    analyze_obj = AnalyzeClarisse(scene, "clarisse_ifx_4.0_sp3",
+                                  workspace=workspace,
+                                  custom_exe_path=analyzer,
+                                  stream_upload=stream, incremental=True)
+    tracemalloc.start()
+    start = time.time()
+    try:
+        analyze_obj.analyse()
+        seconds = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    count = sum(1 for _ in analyze_obj.iter_upload_assets())
+    shutil.rmtree(workspace, ignore_errors=True)
+    return {"entries": count, "seconds": round(seconds, 3),
+            "peak_mb": round(peak / 1024.0 / 1024.0, 1)}
+
+
+def run_analyse_benchmark(entries=ANALYSE_ENTRIES):
+    """Measure a whole analysis with and without ``stream_upload``.
+
+    Returns:
+        dict: Measures by way, see ``measure_analyse``.
+
+    """
+    folder = tempfile.mkdtemp()
+    try:
+        scene = synthetic.generate_scene(os.path.join(folder, "scene"),
+                                         entries, output_lines=100)
+        analyzer = synthetic.make_stub_analyzer(os.path.join(folder, "bin"))
+        return {
+            "source_entries": entries,
+            "in_memory": measure_analyse(folder, scene, analyzer, False),
+            "streaming": measure_analyse(folder, scene, analyzer, True),
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_stream_upload_peak_memory():
+    """Test streaming keeps the peak memory well under the in-memory one."""
+    results = run_benchmark()
+    save_results("stream_upload", results)
+    assert (results["streaming"]["entries"] ==
+            results["in_memory"]["entries"])
+    assert (results["streaming"]["peak_mb"] <
+            results["in_memory"]["peak_mb"] / 2)
+
+
+@pytest.mark.skipif(os.name == "nt",
+                    reason="the stub analyzer launcher needs a shebang")
+def test_analyse_peak_memory():
+    """Test a streamed analysis, asset state included, stays bounded."""
+    results = run_analyse_benchmark()
+    save_results("stream_analyse", results)
+    assert (results["streaming"]["entries"] ==
+            results["in_memory"]["entries"])
+    assert (results["streaming"]["peak_mb"] <
+            results["in_memory"]["peak_mb"] / 2)
+
+
+if __name__ == "__main__":
+    print(run_benchmark())
+    print(run_analyse_benchmark())
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Compare two saved benchmark runs, e.g. of two versions::
+
+    python -m benchmarks.compare results/pipeline_1.0.json \\
+        results/pipeline_1.1.json
+
+Files saved by ``conftest`` and by ``pytest --benchmark-json`` are read.
+
+"""
+
+# Import built-in models
+import json
+import sys
+
+
+def load_medians(json_path):
+    """Get the median seconds of every case of a saved run.
+
+    Returns:
+        dict: Median seconds by case full name.
+
+    """
+    with open(json_path) as json_f:
+        results = json.load(json_f)
+    return {case["fullname"]: case["stats"]["median"]
+            for case in results["benchmarks"]}
+
+
+def compare(base_path, new_path):
+    """Get the lines comparing two runs, slower cases first.
+
+    Returns:
+        list: One line per case run by both.
+
+    """
+    base = load_medians(base_path)
+    new = load_medians(new_path)
+    rows = []
+    for name in sorted(set(base) & set(new)):
+        ratio = new[name] / base[name] if base[name] else float("inf")
+        rows.append((ratio, "{:8.3f}s {:8.3f}s {:6.2f}x  {}".format(
+            base[name], new[name], ratio, name)))
+    rows.sort(reverse=True)
+    return [row for _, row in rows]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m benchmarks.compare BASE.json NEW.json")
+    print("\n".join(compare(sys.argv[1], sys.argv[2])))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Fixtures of the benchmarks.
+
+The ``benchmark`` fixture of pytest-benchmark is used when installed, save
+its results with ``--benchmark-json``. Otherwise a minimal fixture with the
+same ``benchmark(function)`` and ``benchmark.pedantic`` calls times the
+cases and the results are saved to ``results/pipeline_<version>.json``.
+
+Sizes run by the parametrized cases are set with ``BENCH_SIZES``, e.g.
+``BENCH_SIZES=1k,100k``, default is ``1k,100k,1m``.
+
+"""
+
+# Import built-in models
+import datetime
+import os
+import platform
+import statistics
+import time
+
+import pytest
+
+from benchmarks import save_results
+from benchmarks import synthetic
+
+_SIZES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+# Largest scene whose files are created on disk, bigger scenes reference
+# missing files.
+MAX_CREATED_FILES = int(os.environ.get("BENCH_MAX_CREATED_FILES", 100000))
+
+_RESULTS = []
+
+
+def bench_sizes():
+    """Get the sizes of ``BENCH_SIZES`` as pytest params."""
+    names = os.environ.get("BENCH_SIZES", "1k,100k,1m").split(",")
+    return [pytest.param(_SIZES[name.strip().lower()], id=name.strip())
+            for name in names if name.strip()]
+
+
+class _Benchmark(object):
+    """Time a function like the fixture of pytest-benchmark."""
+
+    def __init__(self, node):
+        self.node = node
+        self.extra_info = {}
+        self.stats = None
+
+    def __call__(self, function, *args, **kwargs):
+        rounds = int(os.environ.get("BENCH_ROUNDS", 3))
+        return self.pedantic(function, args, kwargs, rounds=rounds)
+
+    def pedantic(self, target, args=(), kwargs=None, setup=None, rounds=1,
+                 iterations=1, warmup_rounds=0):
+        """Run ``target`` ``rounds`` times, ``setup`` before each round."""
+        kwargs = kwargs or {}
+        seconds = []
+        result = None
+        for round_index in range(warmup_rounds + rounds):
+            if setup is not None:
+                setup_result = setup()
+                if setup_result is not None:
+                    args, kwargs = setup_result
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = target(*args, **kwargs)
+            if round_index >= warmup_rounds:
+                seconds.append((time.perf_counter() - start) / iterations)
+        self.stats = {
+            "min": min(seconds),
+            "max": max(seconds),
+            "mean": statistics.mean(seconds),
+            "median": statistics.median(seconds),
+            "stddev": statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+            "rounds": len(seconds),
+        }
+        _RESULTS.append({
+            "name": self.node.name,
+            "fullname": self.node.nodeid,
+            "params": getattr(getattr(self.node, "callspec", None), "params",
+                              None),
+            "stats": self.stats,
+            "extra_info": self.extra_info,
+        })
+        return result
+
+
+try:
+    import pytest_benchmark  # noqa: F401 pylint: disable=unused-import
+except ImportError:
+    @pytest.fixture()
+    def benchmark(request):
+        """Time a function, see ``_Benchmark``."""
+        return _Benchmark(request.node)
+
+    def pytest_sessionfinish(session, exitstatus):
+        """Save the timings of the session."""
+        if not _RESULTS:
+            return
+        import rayvision_clarisse
+        version = rayvision_clarisse.__version__
+        save_results("pipeline_{}".format(version), {
+            "version": version,
+            "datetime": datetime.datetime.now().isoformat(),
+            "machine_info": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "benchmarks": _RESULTS,
+        })
+
+
+@pytest.fixture()
+def stub_analyzer(tmpdir):
+    """Path of the stub analyzer, to pass as ``custom_exe_path``."""
+    if os.name == "nt":
+        pytest.skip("the stub analyzer launcher needs a shebang")
+    return synthetic.make_stub_analyzer(str(tmpdir.join("bin")))
+
+
+@pytest.fixture()
+def scene_factory(tmpdir):
+    """Create synthetic scenes, see ``synthetic.generate_scene``."""
+    def make_scene(assets, **kwargs):
+        kwargs.setdefault("create_files", assets <= MAX_CREATED_FILES)
+        return synthetic.generate_scene(
+            str(tmpdir.join("scene_{}".format(assets))), assets, **kwargs)
+    return make_scene
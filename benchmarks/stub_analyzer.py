@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for Analyze.exe, run through ``synthetic.make_stub_analyzer``.
+
+Called like the analyzer, ``-cf <scene> -tj <task.json>``, it reads the
+settings written by ``synthetic.generate_scene`` next to the scene, prints
+progress and log lines, waits for the configured latency and writes the
+result files of the scene to the folder of task.json.
+
+"""
+
+# Import built-in models
+import json
+import os
+import sys
+import time
+
+from benchmarks import synthetic
+from rayvision_clarisse.json_stream import JsonStreamWriter
+from rayvision_clarisse.utils import convert_path
+
+
+def print_output(settings):
+    """Print the log, progress and missing file lines of the analysis."""
+    output_lines = settings["output_lines"]
+    missing_lines = settings["missing_lines"]
+    for index in range(output_lines):
+        if index < missing_lines:
+            line = "Reference file not found: {}/missing/{}.exr".format(
+                settings["root"], index)
+        elif index % 10 == 0:
+            line = "analyse {}%".format(index * 100 // output_lines)
+        else:
+            line = "[INFO] loading node node_{}".format(index)
+        sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+def write_result(workspace, settings):
+    """Write asset.json, tips.json and upload.json of the scene."""
+    root, assets, frames = (settings["root"], settings["assets"],
+                            settings["frames"])
+    asset_info = {"texture": [], "cache": []}
+    for kind, path in synthetic.iter_asset_patterns(root, assets, frames):
+        asset_info[kind].append(path)
+    with open(os.path.join(workspace, "asset.json"), "w") as asset_f:
+        json.dump(asset_info, asset_f)
+    with open(os.path.join(workspace, "tips.json"), "w") as tips_f:
+        json.dump({}, tips_f)
+    with JsonStreamWriter(os.path.join(workspace, "upload.json")) as writer:
+        writer.extend("asset", ())
+        for path in synthetic.iter_asset_files(root, assets, frames):
+            writer.append("asset", {"local": path,
+                                    "server": convert_path(path)})
+
+
+def main(argv):
+    """Run the stub analysis."""
+    scene = argv[argv.index("-cf") + 1]
+    task_json = argv[argv.index("-tj") + 1]
+    with open(scene + synthetic.STUB_SUFFIX) as stub_f:
+        settings = json.load(stub_f)
+    print_output(settings)
+    time.sleep(settings["latency"])
+    write_result(os.path.dirname(task_json), settings)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Generate synthetic Clarisse scenes and the stub analyzer running them.
+
+A scene of ``assets`` files is made of textures and of cache sequences::
+
+    <root>/scene.project
+    <root>/scene.project.stub.json      settings of the stub analyzer
+    <root>/textures/tex_00000.exr       a tenth of the assets
+    <root>/cache/sim_0000/sim.0001.vdb  the others, by sequence
+
+"""
+
+# Import built-in models
+import json
+import os
+import stat
+import sys
+
+# Frames of each cache sequence.
+FRAMES_PER_SEQUENCE = 100
+
+STUB_SUFFIX = ".stub.json"
+
+# Launcher written next to a scene, ``custom_exe_path`` runs it with the
+# interpreter of the benchmark.
+_LAUNCHER = """#!{python}
+import runpy
+import sys
+
+sys.path.insert(0, {root!r})
+runpy.run_module("benchmarks.stub_analyzer", run_name="__main__")
+"""
+
+
+def split_assets(assets, frames=FRAMES_PER_SEQUENCE):
+    """Get the number of textures and of cache sequences of a scene.
+
+    Returns:
+        tuple: Textures and sequences, together ``assets`` files or a bit
+            more to fill the last sequence.
+
+    """
+    textures = assets // 10
+    sequences = -(-(assets - textures) // frames)
+    return textures, sequences
+
+
+def iter_asset_patterns(root, assets, frames=FRAMES_PER_SEQUENCE):
+    """Iterate the paths written in the project, ``####`` for sequences.
+
+    Yields:
+        tuple: Kind, "texture" or "cache", and path.
+
+    """
+    root = root.replace("\\", "/")
+    textures, sequences = split_assets(assets, frames)
+    for index in range(textures):
+        yield "texture", "{}/textures/tex_{:05d}.exr".format(root, index)
+    for index in range(sequences):
+        yield "cache", "{}/cache/sim_{:04d}/sim.####.vdb".format(root, index)
+
+
+def iter_asset_files(root, assets, frames=FRAMES_PER_SEQUENCE):
+    """Iterate the files referenced by a scene, sequences expanded."""
+    for kind, path in iter_asset_patterns(root, assets, frames):
+        if kind == "texture":
+            yield path
+        else:
+            for frame in range(1, frames + 1):
+                yield path.replace("####", "{:04d}".format(frame))
+
+
+def write_project(project_path, root, assets, frames=FRAMES_PER_SEQUENCE):
+    """Write the .project file of a scene."""
+    with open(project_path, "w") as project_f:
+        project_f.write("#Isotropix_Serial_Version 1.2\n"
+                        "#Isotropix_Clarisse_Version 4.0 SP3\n"
+                        'Context "scene" {\n')
+        for index, (kind, path) in enumerate(
+                iter_asset_patterns(root, assets, frames)):
+            node_type = ("TextureMapFile" if kind == "texture" else
+                         "GeometryVolumeFile")
+            project_f.write('    {} "node_{}" {{ filename "{}" }}\n'.format(
+                node_type, index, path))
+        project_f.write("}\n")
+
+
+def generate_scene(root, assets, frames=FRAMES_PER_SEQUENCE,
+                   create_files=True, file_size=16, latency=0.0,
+                   output_lines=100, missing_lines=0):
+    """Generate a synthetic scene and the settings of its stub analyzer.
+
+    Args:
+        root (str): Folder of the scene, created if needed.
+        assets (int): Number of files referenced by the scene.
+        frames (int): Frames of each cache sequence.
+        create_files (bool): Create the referenced files, default is True.
+        file_size (int): Size of each created file in bytes.
+        latency (float): Seconds the stub analyzer waits before writing.
+        output_lines (int): Lines printed by the stub analyzer.
+        missing_lines (int): Of those, lines reporting a missing file.
+
+    Returns:
+        str: Path of the .project file.
+
+    """
+    if not os.path.exists(root):
+        os.makedirs(root)
+    project_path = os.path.join(root, "scene.project")
+    write_project(project_path, root, assets, frames)
+    if create_files:
+        data = b"x" * file_size
+        for path in iter_asset_files(root, assets, frames):
+            folder = os.path.dirname(path)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            with open(path, "wb") as asset_f:
+                asset_f.write(data)
+    with open(project_path + STUB_SUFFIX, "w") as stub_f:
+        json.dump({"root": root, "assets": assets, "frames": frames,
+                   "latency": latency, "output_lines": output_lines,
+                   "missing_lines": missing_lines}, stub_f)
+    return project_path
+
+
+def make_stub_analyzer(folder):
+    """Write the launcher of the stub analyzer.
+
+    Returns:
+        str: Path to pass as ``custom_exe_path``.
+
+    """
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    launcher = os.path.join(folder, "stub_analyzer")
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(launcher, "w") as launcher_f:
+        launcher_f.write(_LAUNCHER.format(python=sys.executable,
+                                          root=repo_root))
+    os.chmod(launcher, stat.S_IRWXU)
+    return launcher
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""batch analyze clarisse"""
+
+from rayvision_clarisse.analyse_clarisse import analyse_batch
+
+analyze_info = {
+    "workspace": "c:/workspace",
+    "software_version": "clarisse_ifx_4.0_sp3",
+    "project_name": "Project1",
+    "plugin_config": {}
+}
+
+scenes = [
+    r"D:\Houdini\cg_file\clarisse_test1.project",
+    r"D:\Houdini\cg_file\clarisse_test2.project",
+]
+
+# A process pool imports this script again in each worker on Windows.
+if __name__ == "__main__":
+    for result in analyse_batch(scenes, max_workers=4, **analyze_info):
+        if result["error"]:
+            print("failed: %s %s" % (result["cg_file"], result["error"]))
+        else:
+            print("done: %s %s" % (result["cg_file"], result["workspace"]))
@@ -6,7 +6,8 @@ from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
 from rayvision_sync.upload import RayvisionUpload
 from rayvision_sync.download import RayvisionDownload
 from rayvision_api.task.check import RayvisionCheck
-from rayvision_api.utils import update_task_info, append_to_task, append_to_upload
+from rayvision_api.utils import update_task_info, append_to_task
+from rayvision_clarisse.manifest import append_to_upload
 
 # API Parameter
 render_para = {
@@ -1,17 +1,51 @@
 """A Python-based API for Using Renderbus cloud rendering houdini service."""
 
-# pylint: disable=import-error
-from pkg_resources import DistributionNotFound, get_distribution
+# Import built-in models
+import sys
 
-from rayvision_log import init_logger
+# The version is read and the logger is set up on first use, importing the
+# package stays cheap for short-lived command line tools.
 
-from rayvision_clarisse.constants import PACKAGE_NAME
 
-# Initialize the logger.
-init_logger(PACKAGE_NAME)
+def _read_version():
+    """Get the version of the installed package.
 
-try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
-    # Package is not installed.
-    __version__ = '0.0.0-dev.1'
+    Returns:
+        str: The version, ``0.0.0-dev.1`` if the package is not installed.
+
+    """
+    try:
+        from importlib import metadata
+    except ImportError:
+        # Python older than 3.8.
+        try:
+            import importlib_metadata as metadata
+        except ImportError:
+            metadata = None
+    if metadata is not None:
+        try:
+            return metadata.version(__name__)
+        except metadata.PackageNotFoundError:
+            # Package is not installed.
+            return '0.0.0-dev.1'
+    # pylint: disable=import-error
+    from pkg_resources import DistributionNotFound, get_distribution
+    try:
+        return get_distribution(__name__).version
+    except DistributionNotFound:
+        return '0.0.0-dev.1'
+
+
+if sys.version_info < (3, 7):
+    # Module ``__getattr__`` (PEP 562) is not supported, read it now.
+    __version__ = _read_version()
+
+
+def __getattr__(name):
+    """Resolve ``__version__`` lazily."""
+    if name == "__version__":
+        version = _read_version()
+        globals()["__version__"] = version
+        return version
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name))
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Asyncio pipeline of ``AnalyzeClarisse``.
+
+The steps are the ones of ``AnalyzeClarisse.iter_steps``, also run by
+``analyse``. Python 3 only, imported on demand by
+``AnalyzeClarisse.analyse_async``.
+
+"""
+
+# Import built-in models
+import asyncio
+import os
+import shutil
+
+from rayvision_clarisse.runner import handle_output_lines
+from rayvision_clarisse.runner import kill_process_tree
+from rayvision_clarisse.runner import popen_kwargs
+from rayvision_clarisse.runner import READ_SIZE
+from rayvision_clarisse.utils import StreamDecoder
+
+
+async def run_in_executor(func, *args, on_cancel=None):
+    """Run a blocking function in the default executor of the loop.
+
+    A thread can not be stopped, a cancelled call still waits for the
+    function to return before the cancellation goes on, so nothing of the
+    analysis runs behind the back of the caller.
+
+    Args:
+        func (function): Blocking function.
+        *args: Arguments of ``func``.
+        on_cancel (function, optional): Called on cancellation before
+            waiting, to make ``func`` return early.
+
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if on_cancel:
+            on_cancel()
+        try:
+            await future
+        except Exception:  # pylint: disable=broad-except
+            # The caller only sees the cancellation.
+            pass
+        raise
+
+
+async def run_streaming_async(cmd, line_callback=None, logger=None):
+    """Run a command as an asyncio subprocess and stream its output.
+
+    The process tree is killed if the coroutine is cancelled.
+
+    Args:
+        cmd (list): Command to run.
+        line_callback (function, optional): Called with every decoded line,
+            returning True terminates the command.
+        logger (logging.Logger, optional): Logger of the output lines.
+
+    Returns:
+        tuple: Return code and whether the command was terminated by the
+            callback.
+
+    """
+    if logger:
+        logger.info("run command:\n%s", cmd)
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT, **popen_kwargs())
+    aborted = False
+    decoder = StreamDecoder()
+    try:
+        while not aborted:
+            chunk = await process.stdout.read(READ_SIZE)
+            lines = decoder.feed(chunk) if chunk else decoder.flush()
+            aborted = handle_output_lines(lines, line_callback, logger)
+            if aborted:
+                kill_process_tree(process.pid)
+            if not chunk:
+                break
+        code = await process.wait()
+    except BaseException:
+        # Cancelled or timed out, do not leave the analyzer behind.
+        if process.returncode is None:
+            kill_process_tree(process.pid)
+            await asyncio.shield(process.wait())
+        raise
+    return code, aborted
+
+
+async def run_analyzer_async(analyze_obj):
+    """Run the analyzer of ``analyze_obj`` without blocking the loop.
+
+    The analyzer runs as an asyncio subprocess, or in the worker of the
+    analysis on the executor.
+
+    """
+    parser = analyze_obj.prepare_analyse()
+    if analyze_obj.worker:
+        # The parser callbacks run in the executor thread.
+        code, aborted = await run_in_executor(
+            analyze_obj.run_analyzer, parser,
+            on_cancel=analyze_obj.worker.terminate)
+    else:
+        code, aborted = await run_streaming_async(
+            analyze_obj.get_analyse_cmd(), parser, logger=analyze_obj.logger)
+    await run_in_executor(analyze_obj.handle_analyse_result, code, aborted,
+                          parser)
+
+
+def _measured(analyze_obj, phase, function, args):
+    """Run a step measured in the calling thread."""
+    with analyze_obj.measure(phase):
+        return function(*args)
+
+
+async def run_steps_async(analyze_obj, steps):
+    """Run the steps of ``AnalyzeClarisse.iter_steps`` without blocking.
+
+    Coroutine functions are awaited, the other steps run in the executor.
+    The phases are measured like the ones of ``analyse``, in the thread
+    running them, the cpu time of a coroutine step is the one of the loop
+    thread, including the other tasks of the loop running meanwhile.
+
+    """
+    result = None
+    while True:
+        try:
+            phase, function, args = steps.send(result)
+        except StopIteration:
+            return
+        if phase is None:
+            result = await run_in_executor(function, *args)
+            continue
+        if asyncio.iscoroutinefunction(function):
+            with analyze_obj.measure(phase):
+                result = await function(*args)
+        else:
+            result = await run_in_executor(_measured, analyze_obj, phase,
+                                           function, args)
+
+
+async def analyse_async(analyze_obj, no_upload=False, timeout=None,
+                        mode="full"):
+    """Analyse a scene on the running event loop.
+
+    Args:
+        analyze_obj (AnalyzeClarisse): The analysis to run.
+        no_upload (bool): Skip gathering upload.json, default is False.
+        timeout (float, optional): Seconds before the analysis is aborted.
+        mode (str): "full" or "fast", see ``AnalyzeClarisse.analyse``.
+
+    Raises:
+        asyncio.TimeoutError: The analysis took longer than ``timeout``.
+        asyncio.CancelledError: The analysis was cancelled.
+
+    """
+    analyze_obj.check_mode(mode)
+
+    async def analyzer_step():
+        await run_analyzer_async(analyze_obj)
+
+    steps = analyze_obj.iter_steps(no_upload, mode,
+                                   analyzer_step=analyzer_step)
+    # Only a workspace created by this run is removed on abort.
+    created_before = analyze_obj.workspace_created
+    analyze_obj.recorder.reset()
+    try:
+        with analyze_obj.recorder.total():
+            await asyncio.wait_for(run_steps_async(analyze_obj, steps),
+                                   timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        # The step running at the time has returned, see
+        # ``run_in_executor``, nothing writes to the workspace any more.
+        if (analyze_obj.workspace_created and not created_before and
+                os.path.exists(analyze_obj.workspace)):
+            analyze_obj.logger.info("analyse aborted, remove workspace: %s",
+                                    analyze_obj.workspace)
+            await asyncio.shield(run_in_executor(
+                shutil.rmtree, analyze_obj.workspace, True))
+        raise
+    finally:
+        analyze_obj.save_metrics()
+        analyze_obj.close_workspace()
@@ -5,27 +5,61 @@
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import codecs
-import hashlib
+import copy
 import json
 import logging
 import os
+import pickle
 import re
 import sys
 import time
 import threading
+from concurrent import futures
 
 from builtins import str
 
-from rayvision_clarisse.utils import convert_path
+from rayvision_clarisse.delta import load_fingerprints
+from rayvision_clarisse.delta import merge_unchanged
+from rayvision_clarisse.delta import UNCHANGED_NAME
+from rayvision_clarisse.delta import write_delta
+from rayvision_clarisse.dir_index import DirectoryIndex
+from rayvision_clarisse.fingerprint import FingerprintCache
+from rayvision_clarisse.hashing import hash_file
+from rayvision_clarisse.hashing import HashEngine
+from rayvision_clarisse import incremental
+from rayvision_clarisse.json_stream import iter_json_items
+from rayvision_clarisse.json_stream import JsonStreamWriter
+from rayvision_clarisse.manifest import stream_upload
+from rayvision_clarisse.manifest import UploadManifest
+from rayvision_clarisse.metrics import PhaseMetrics
+from rayvision_clarisse.metrics import STATS_FILE
+from rayvision_clarisse.project_parser import expand_sequence
+from rayvision_clarisse.project_parser import is_sequence_path
+from rayvision_clarisse.project_parser import iter_references
+from rayvision_clarisse.result import AnalysisResult
+from rayvision_clarisse.result import json_dump_atomic
+from rayvision_clarisse.result_cache import iter_referenced_paths
+from rayvision_clarisse.result_cache import ResultCache
+from rayvision_clarisse.result_cache import RESULT_FILES
+from rayvision_clarisse.runner import AnalyzeOutputParser
+from rayvision_clarisse.runner import run_streaming
+from rayvision_clarisse.sequence import collapse_asset_info
+from rayvision_clarisse.sequence import collapse_entries
+from rayvision_clarisse.sequence import iter_expanded
+from rayvision_clarisse.shard import remove_shards
+from rayvision_clarisse.shard import stream_shards
+from rayvision_clarisse import utils
+from rayvision_clarisse.utils import PathMapper
 from rayvision_clarisse.utils import str_to_unicode
 from rayvision_clarisse.utils import unicode_to_str
+from rayvision_clarisse.validate import validate_files
+from rayvision_clarisse.workspace import claim_folder
+from rayvision_clarisse.workspace import new_workspace_name
+from rayvision_clarisse.workspace import scene_workspace_name
+from rayvision_clarisse.workspace import WorkspaceManager
+from rayvision_clarisse.constants import MISSING_ASSET_CODE
 from rayvision_clarisse.constants import PACKAGE_NAME
-from rayvision_utils import constants
-from rayvision_utils import utils
-from rayvision_utils.cmd import Cmd
-from rayvision_utils.exception import tips_code
-from rayvision_utils.exception.exception import AnalyseFailError
+from rayvision_clarisse.constants import STREAM_INDEX_ENTRIES
 
 VERSION = sys.version_info[0]
 
@@ -43,7 +77,29 @@ class AnalyzeClarisse(object):
                  logger=None,
                  log_folder=None,
                  log_name=None,
-                 log_level="DEBUG"
+                 log_level="DEBUG",
+                 fingerprint_cache=False,
+                 result_cache=False,
+                 progress_callback=None,
+                 line_hook=None,
+                 fail_fast=False,
+                 previous_workspace=None,
+                 validate_assets=False,
+                 validate_workers=16,
+                 hash_assets=False,
+                 hash_algorithm="md5",
+                 hash_workers=4,
+                 path_mapping=None,
+                 workspace_manager=False,
+                 reuse_workspace=False,
+                 stream_upload=False,
+                 metrics_hook=None,
+                 worker=None,
+                 dir_index=True,
+                 collapse_sequences=False,
+                 upload_shards=0,
+                 previous_upload=None,
+                 incremental=False
                  ):
         """Initialize and examine the analysis information.
 
@@ -61,14 +117,92 @@ class AnalyzeClarisse(object):
             log_folder (str, optional): Custom log save location.
             log_name (str, optional): Custom log file name.
             log_level (string):  Set log level, example: "DEBUG","INFO","WARNING","ERROR".
+            fingerprint_cache (bool, str or FingerprintCache): Cache of file
+                hashes, True uses ``fingerprint.db`` under the workspace
+                root, a str is the database path, default is False.
+            result_cache (bool, str or ResultCache): Cache of analysis
+                results, True uses ``result_cache`` under the workspace
+                root, a str is the cache folder, False disables it.
+            progress_callback (function, optional): Called as
+                ``progress_callback(percent, line)`` when the analyzer
+                reports progress.
+            line_hook (function, optional): Called with every analyzer
+                output line.
+            fail_fast (bool): Stop the analyzer at the first fatal error
+                line, default is False.
+            previous_workspace (str, optional): Workspace of a previous
+                analysis of the scene, its result is reused when the scene
+                and the settings did not change and only the changed assets
+                are checked again.
+            validate_assets (bool): Check that every referenced file exists
+                and is not empty, default is False.
+            validate_workers (int): Number of folders listed, or chunks of
+                files stat, at the same time by the validation.
+            hash_assets (bool): Write the hash of every asset into
+                upload.json, default is False.
+            hash_algorithm (str): "md5", "sha1" or "blake2b", default is md5.
+            hash_workers (int): Number of assets hashed at the same time.
+            path_mapping (list or dict, optional): (local prefix, server
+                prefix) rules of the server paths in upload.json, e.g.
+                ``{"Z:/": "/projects/"}``, other paths are converted by
+                ``convert_path``.
+            workspace_manager (bool or WorkspaceManager): Lock the workspace
+                while in use, True only locks, a WorkspaceManager with
+                ``max_age``, ``max_bytes`` or ``max_count`` also removes the
+                old workspaces it created, default is False.
+            reuse_workspace (bool): Analyse the scene in the workspace of
+                its previous analysis, whose result is reused when still
+                valid, default is False.
+            stream_upload (bool): Gather upload.json in chunks instead of
+                loading it, memory stays bounded for scenes with millions
+                of files, a later duplicate entry is dropped instead of
+                merged, default is False. The asset state of ``incremental``
+                is written as upload.json is read and the index of
+                ``dir_index`` keeps at most ``STREAM_INDEX_ENTRIES`` files.
+            metrics_hook (function, optional): Called as
+                ``metrics_hook(phase, record)`` after each phase of
+                ``analyse`` with its time and resource usage, see
+                ``metrics``.
+            worker (AnalyzerWorker, optional): Warm analyzer process running
+                the analysis instead of a new analyzer process, it can be
+                shared by the analyses of many scenes. Experimental, the
+                bundled Analyze.exe does not serve the worker protocol, see
+                ``rayvision_clarisse.worker``.
+            dir_index (bool or DirectoryIndex): Answer the bulk lookups of
+                the asset files from folder listings, one listing per folder
+                instead of one round trip per file, sizes and mtimes still
+                take a stat per file on POSIX. The scene, the workspace and
+                other single paths are checked directly. True uses an
+                index of this analysis, a DirectoryIndex can be shared by
+                analyses, see its ``recheck`` and ``ttl``, False looks up
+                every file.
+            collapse_sequences (bool): Store frame sequences and UDIM sets
+                as one pattern record in upload.json and as their pattern in
+                asset.json, ``iter_upload_assets`` expands them, default is
+                False.
+            upload_shards (int): Split upload.json into this many
+                ``upload_shard_<k>.json`` of about the same bytes and files
+                for parallel uploaders, with a summary in
+                ``upload_shards.json``, see ``shard``, 0 writes no shards.
+            previous_upload (str or dict, optional): upload.json of the
+                previous submission of the scene, or its content, the files
+                whose hash did not change since are moved from upload.json
+                to ``upload_unchanged.json``, see ``delta``, needs
+                ``hash_assets``.
+            incremental (bool): Save the asset state of the workspace, so a
+                later analysis given it as ``previous_workspace`` can reuse
+                the result, default is False, implied by
+                ``previous_workspace`` and ``reuse_workspace``.
 
         """
-        self.logger = logger
-        if not self.logger:
-            from rayvision_log.core import init_logger
-            init_logger(PACKAGE_NAME, log_folder, log_name)
-            self.logger = logging.getLogger(__name__)
-            self.logger.setLevel(level=log_level.upper())
+        # The package logger is set up on first use, see ``logger``.
+        self._logger = logger
+        self._log_settings = (log_folder, log_name, log_level)
+
+        if dir_index is True:
+            dir_index = DirectoryIndex(
+                max_entries=STREAM_INDEX_ENTRIES if stream_upload else None)
+        self.dir_index = dir_index or None
 
         self.check_path(cg_file)
         self.cg_file = cg_file
@@ -80,12 +214,25 @@ class AnalyzeClarisse(object):
 
         local_os = self.check_local_os(local_os)
         self.local_os = local_os
-        self.tmp_mark = str(int(time.time())) + str(self.get_current_id())
-        workspace = os.path.join(self.check_workspace(workspace),
-                                 self.tmp_mark)
-        if not os.path.exists(workspace):
-            os.makedirs(workspace)
-        self.workspace = workspace
+        self.tmp_mark = new_workspace_name()
+        workspace_root = self.check_workspace(workspace)
+        if workspace_manager is True:
+            workspace_manager = WorkspaceManager(workspace_root)
+        self.workspace_manager = workspace_manager or None
+        self.reuse_workspace = reuse_workspace
+        if reuse_workspace:
+            workspace = os.path.join(workspace_root,
+                                     scene_workspace_name(cg_file))
+            if not previous_workspace and os.path.exists(workspace):
+                previous_workspace = workspace
+        else:
+            workspace = os.path.join(workspace_root, self.tmp_mark)
+        # Created on first write, see ``make_workspace``.
+        self._workspace_open = False
+        # Whether this object created its workspace folder.
+        self._workspace_created = False
+        self.result = AnalysisResult(workspace)
+        self.set_workspace(workspace)
 
         if custom_exe_path:
             self.check_path(custom_exe_path)
@@ -93,27 +240,219 @@ class AnalyzeClarisse(object):
 
         self.platform = platform
 
-        self.task_json = os.path.join(workspace, "task.json")
-        self.tips_json = os.path.join(workspace, "tips.json")
-        self.asset_json = os.path.join(workspace, "asset.json")
-        self.upload_json = os.path.join(workspace, "upload.json")
-        self.tips_info = {}
-        self.task_info = {}
-        self.asset_info = {}
-        self.upload_info = {}
+        if fingerprint_cache is True:
+            fingerprint_cache = FingerprintCache(
+                os.path.join(workspace_root, "fingerprint.db"))
+        elif isinstance(fingerprint_cache, str):
+            fingerprint_cache = FingerprintCache(fingerprint_cache)
+        self.fingerprint_cache = fingerprint_cache or None
+
+        if result_cache is True:
+            result_cache = ResultCache(
+                os.path.join(workspace_root, "result_cache"))
+        elif isinstance(result_cache, str):
+            result_cache = ResultCache(result_cache)
+        self.result_cache = result_cache or None
+
+        self.progress_callback = progress_callback
+        self.line_hook = line_hook
+        self.fail_fast = fail_fast
+
+        if previous_workspace:
+            self.check_path(previous_workspace)
+        self.previous_workspace = previous_workspace
+        self.incremental = bool(incremental or reuse_workspace or
+                                previous_workspace)
+        self.delta = {}
+        # Assets added, changed or missing since the previous analysis.
+        self._recheck_assets = set()
+        self._restored_previous = False
+        # Hash of the scene, computed once per analysis.
+        self._scene_md5 = None
+
+        self.validate_assets = validate_assets
+        self.validate_workers = validate_workers
+
+        self.hash_assets = hash_assets
+        self.hash_engine = HashEngine(hash_algorithm, hash_workers,
+                                      fingerprint_cache=self.fingerprint_cache)
+        self.hash_stats = {}
+
+        self.path_mapper = PathMapper(path_mapping)
+        self.stream_upload = stream_upload
+        self.collapse_sequences = collapse_sequences
+        self.upload_shards = upload_shards
+        self.shard_summary = {}
+        self.previous_upload = previous_upload
+        self.upload_delta = {}
+
+        self.worker = worker
+        self.recorder = PhaseMetrics(hook=metrics_hook)
+        self.result.recorder = self.recorder
 
         py_version = sys.version_info.major
         if py_version != 2:
             py = "py3"
         else:
             py = "py2"
-        self.analyze_script_path = os.path.normpath(os.path.join(
-            os.path.dirname(__file__).replace("\\", "/"),
-            "tool", py, "Analyze.exe"))
+        self.analyze_script_path = custom_exe_path or os.path.normpath(
+            os.path.join(os.path.dirname(__file__).replace("\\", "/"),
+                         "tool", py, "Analyze.exe"))
 
         self.check_path(self.analyze_script_path)
         self.py_version = sys.version_info[0]
 
+    @property
+    def logger(self):
+        """logging.Logger: Logger of the analysis, set up on first use."""
+        if self._logger is None:
+            from rayvision_log.core import init_logger
+            log_folder, log_name, log_level = self._log_settings
+            init_logger(PACKAGE_NAME, log_folder, log_name)
+            self._logger = logging.getLogger(__name__)
+            self._logger.setLevel(level=log_level.upper())
+        return self._logger
+
+    @logger.setter
+    def logger(self, logger):
+        self._logger = logger
+
+    @property
+    def workspace_created(self):
+        """bool: Whether this analysis created its workspace folder."""
+        return self._workspace_created
+
+    @property
+    def metrics(self):
+        """dict: Time and resources used by the phases of ``analyse``.
+
+        The cpu time of a phase is the one of the thread running it, the
+        bytes and peak memory are only known for the whole process, in
+        ``process`` of ``total``, the analyzer ones are of its own process,
+        see the module ``rayvision_clarisse.metrics``.
+
+        Examples:
+            {
+                "phases": {
+                    "analyze": {
+                        "wall": 12.4, "cpu": 0.3, "analyzer_cpu": 11.8,
+                        "analyzer_peak_rss": 1073741824, "calls": 1
+                    }
+                },
+                "total": {"wall": 14.1, ..., "process": {
+                    "cpu": 2.1, "read_bytes": 40960, "write_bytes": 1024,
+                    "peak_rss": 52428800}}
+            }
+
+        """
+        return self.recorder.metrics
+
+    def measure(self, phase):
+        """Measure a phase into ``metrics``, a context manager."""
+        return self.recorder.phase(phase)
+
+    def save_metrics(self):
+        """Write ``metrics`` to stats.json in the workspace."""
+        if self._workspace_open and os.path.exists(self.workspace):
+            json_dump_atomic(os.path.join(self.workspace, STATS_FILE),
+                             self.metrics)
+
+    @property
+    def task_info(self):
+        """dict: Content of task.json, loaded on first access."""
+        return self.result.get("task")
+
+    @task_info.setter
+    def task_info(self, task_info):
+        self.result.set("task", task_info)
+
+    @property
+    def asset_info(self):
+        """dict: Content of asset.json, loaded on first access."""
+        return self.result.get("asset")
+
+    @asset_info.setter
+    def asset_info(self, asset_info):
+        self.result.set("asset", asset_info)
+
+    @property
+    def tips_info(self):
+        """dict: Content of tips.json, loaded on first access."""
+        return self.result.get("tips")
+
+    @tips_info.setter
+    def tips_info(self, tips_info):
+        self.result.set("tips", tips_info)
+
+    @property
+    def upload_info(self):
+        """dict: Content of upload.json, loaded on first access."""
+        return self.result.get("upload")
+
+    @upload_info.setter
+    def upload_info(self, upload_info):
+        self.result.set("upload", upload_info)
+
+    def set_workspace(self, workspace):
+        """Set the workspace and the paths of the result files."""
+        self.workspace = workspace
+        self.result.workspace = workspace
+        self.task_json = os.path.join(workspace, "task.json")
+        self.tips_json = os.path.join(workspace, "tips.json")
+        self.asset_json = os.path.join(workspace, "asset.json")
+        self.upload_json = os.path.join(workspace, "upload.json")
+
+    def make_workspace(self):
+        """Create the workspace folder if needed.
+
+        With a workspace manager the workspace is locked until
+        ``close_workspace``, a new one is used if another analysis holds it,
+        and the old workspaces of the root are cleaned up.
+
+        """
+        if self._workspace_open:
+            return
+        # The workspace of a new analysis must not hold the result of
+        # another one, a suffix is added if its name is taken.
+        new = not (self.reuse_workspace or self._workspace_created)
+        wanted = self.workspace
+        existed = os.path.exists(wanted)
+        if self.workspace_manager:
+            workspace = self.workspace_manager.open(self.workspace,
+                                                    scene=self.cg_file,
+                                                    new=new)
+            if workspace != self.workspace:
+                self.set_workspace(workspace)
+            removed = self.workspace_manager.maybe_cleanup(exclude=[
+                path for path in (self.workspace, self.previous_workspace)
+                if path])
+            if removed:
+                self.logger.info("removed %s old workspaces", len(removed))
+        elif new:
+            workspace = claim_folder(self.workspace)
+            if workspace != self.workspace:
+                self.set_workspace(workspace)
+        elif not existed:
+            os.makedirs(self.workspace)
+        if new or not existed or self.workspace != wanted:
+            self._workspace_created = True
+        self._workspace_open = True
+
+    def close_workspace(self):
+        """Unlock the workspace, so it can be reused or cleaned up."""
+        if self._workspace_open and self.workspace_manager:
+            self.workspace_manager.release(self.workspace)
+        self._workspace_open = False
+
+    def clear_result(self):
+        """Remove the result files left in a reused workspace."""
+        for name in (RESULT_FILES +
+                     (incremental.STATE_FILE, incremental.DELTA_FILE)):
+            file_path = os.path.join(self.workspace, name)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        self.result.sync_from_disk()
+
     @staticmethod
     def get_current_id():
         if isinstance(threading.current_thread(), threading._MainThread):
@@ -141,10 +480,29 @@ class AnalyzeClarisse(object):
             self.tips_info[code] = info
         else:
             raise Exception("info must a list or str.")
+        self.result.mark_dirty("tips")
+
+    def extend_tip(self, code, infos):
+        """Add error messages to a code, keeping the existing ones.
+
+        Args:
+            code (str): error code.
+            infos (list): Error message descriptions.
+
+        """
+        tips = self.tips_info.setdefault(code, [])
+        known = set(tips)
+        for info in infos:
+            if info not in known:
+                known.add(info)
+                tips.append(info)
+        self.result.mark_dirty("tips")
 
     def save_tips(self):
         """Write the error message to tips.json."""
-        utils.json_save(self.tips_json, self.tips_info, ensure_ascii=False)
+        self.make_workspace()
+        self.result.mark_dirty("tips")
+        self.result.flush(["tips"])
 
     @staticmethod
     def check_local_os(local_os):
@@ -185,19 +543,40 @@ class AnalyzeClarisse(object):
 
         return workspace
 
-    def write_task_json(self):
-        """The initialization task.json."""
-        constants.TASK_INFO["task_info"]["input_cg_file"] = self.cg_file.replace("\\", "/")
-        constants.TASK_INFO["task_info"]["project_name"] = self.project_name
-        constants.TASK_INFO["task_info"]["cg_id"] = constants.CG_SETTING.get(self.render_software.capitalize())
-        constants.TASK_INFO["task_info"]["os_name"] = "1" if self.local_os == "windows" else "0"
-        constants.TASK_INFO["task_info"]["platform"] = self.platform
-        constants.TASK_INFO["software_config"] = {
+    def build_task_info(self):
+        """Build the content of task.json of the scene.
+
+        The template, ``constants.TASK_INFO`` of rayvision_utils, is copied
+        and never changed, so analyses can run in threads of one process.
+
+        Returns:
+            dict: Task info of this analysis.
+
+        """
+        from rayvision_utils import constants
+        task_info = copy.deepcopy(constants.TASK_INFO)
+        task_info["task_info"].update({
+            "input_cg_file": self.cg_file.replace("\\", "/"),
+            "project_name": self.project_name,
+            "cg_id": constants.CG_SETTING.get(
+                self.render_software.capitalize()),
+            "os_name": "1" if self.local_os == "windows" else "0",
+            "platform": self.platform,
+        })
+        task_info["software_config"] = {
             "plugins": self.plugin_config,
             "cg_version": self.software_version,
             "cg_name": self.render_software
         }
-        utils.json_save(self.task_json, constants.TASK_INFO)
+        return task_info
+
+    def write_task_json(self):
+        """The initialization task.json."""
+        self.make_workspace()
+        self.clear_result()
+        self.result.set("task", self.build_task_info())
+        # The analyzer reads it, it is loaded again once the analyzer ran.
+        self.result.flush(["task"])
 
     def print_info(self, info):
         """Print info by logger.
@@ -263,18 +642,14 @@ class AnalyzeClarisse(object):
                 self.tips_info[error_code] = info
             else:
                 self.tips_info[error_code] = []
+        self.result.mark_dirty("tips")
 
     def write_tips_info(self):
-        """Write tips info."""
-        if os.path.exists(self.tips_json):
-            with open(self.tips_json, 'r') as tips_f:
-                json_src = json.load(tips_f)
-                for i in self.tips_info:
-                    json_src[i] = self.tips_info[i]
-        else:
-            json_src = self.tips_info
-        with codecs.open(self.tips_json, 'w', 'utf-8') as tips_f:
-            json.dump(json_src, tips_f, ensure_ascii=False, indent=4)
+        """Write tips info, merged into the tips already in tips.json."""
+        self.make_workspace()
+        self.result.mark_dirty("tips")
+        self.result.sync_from_disk(["tips"])
+        self.result.flush(["tips"])
 
     def check_result(self):
         """Check that the analysis results file exists."""
@@ -285,8 +660,8 @@ class AnalyzeClarisse(object):
                 return False, msg
         return True, None
 
-    def analyse_cg_file(self):
-        """Start analyse cg file.
+    def get_analyse_cmd(self):
+        """Get the command line of the analyzer.
 
         Examples cmd command:
             "D:/myproject/internal_news/rayvision_clarisse/rayvision_clarisse
@@ -294,19 +669,41 @@ class AnalyzeClarisse(object):
             "E:/copy/DHGB_sc05_zhuta_610-1570_v0102.project" -tj
              "c:/workspace/work/10398483/task.json"
 
+        Returns:
+            list: Analyzer path and its arguments.
+
         """
-        analyse_cmd = '\"%s\" -cf \"%s\" -tj \"%s\"' % (
-            self.analyze_script_path, os.path.normpath(self.cg_file),
-            os.path.normpath(self.task_json))
-        self.print_info("\n\n-----------------------------"
-                        "--------------Start clarisse analyse--------"
-                        "-----------------------------\n\n")
-        self.print_info("analyse cmd info:\n  ")
+        return [self.analyze_script_path,
+                "-cf", os.path.normpath(self.cg_file),
+                "-tj", os.path.normpath(self.task_json)]
+
+    def create_output_parser(self):
+        """Create the parser of the analyzer output lines."""
+        return AnalyzeOutputParser(self.writing_error_abort,
+                                   progress_callback=self.progress_callback,
+                                   line_hook=self.line_hook,
+                                   fail_fast=self.fail_fast)
 
-        code, _, _ = Cmd.run(analyse_cmd, shell=True)
+    def handle_analyse_result(self, code, aborted, parser):
+        """Check the end of the analyzer run.
 
+        Args:
+            code (int): Return code of the analyzer.
+            aborted (bool): Whether the analyzer was stopped by the parser.
+            parser (AnalyzeOutputParser): Parser of the analyzer output.
+
+        Raises:
+            AnalyseFailError: The analysis failed.
+
+        """
+        from rayvision_utils.exception import tips_code
+        from rayvision_utils.exception.exception import AnalyseFailError
+        if aborted:
+            self.save_tips()
+            raise AnalyseFailError(parser.fatal_line)
         if code != 0:
-            self.add_tip(tips_code.UNKNOW_ERR, "")
+            if not self.tips_info:
+                self.add_tip(tips_code.UNKNOW_ERR, "")
             self.save_tips()
             raise AnalyseFailError
 
@@ -317,19 +714,122 @@ class AnalyzeClarisse(object):
             self.add_tip(tips_code.UNKNOW_ERR, msg)
             self.save_tips()
             raise AnalyseFailError(msg)
+        # The tips collected from the output are merged with the ones of
+        # the analyzer by ``load_result``.
+        self.logger.info('--[end]--')
+
+    def analyse_cg_file(self):
+        """Start analyse cg file."""
+        parser = self.prepare_analyse()
+        code, aborted = self.run_analyzer(parser)
+        self.handle_analyse_result(code, aborted, parser)
+
+    def prepare_analyse(self):
+        """Log the start of the analyzer and get the parser of its output.
+
+        Returns:
+            AnalyzeOutputParser: Parser collecting the tips of the output.
+
+        """
+        self.print_info("\n\n-----------------------------"
+                        "--------------Start clarisse analyse--------"
+                        "-----------------------------\n\n")
+        self.print_info("analyse cmd info:\n  ")
+
+        # The tips of the output are collected while the analyzer writes the
+        # workspace, tips.json of a previous analysis must not be read then.
+        if not self.result.is_loaded("tips"):
+            self.tips_info = {}
+        return self.create_output_parser()
+
+    def run_analyzer(self, parser):
+        """Run the analyzer, in ``worker`` if set, feeding ``parser``.
+
+        Returns:
+            tuple: Return code of the analyzer and whether it was stopped by
+                the parser.
+
+        """
+        if self.worker:
+            return self.worker.run(self.get_analyse_cmd()[1:], parser,
+                                   logger=self.logger)
+        return run_streaming(self.get_analyse_cmd(), parser,
+                             logger=self.logger,
+                             usage_callback=self.recorder.add_analyzer_usage)
+
+    def analyse_fast_cg_file(self):
+        """Analyse cg file with the project parser instead of the analyzer.
+
+        Only the files referenced by the scene are found, the task.json
+        written by ``write_task_json`` is kept as is.
+
+        Examples asset.json:
+            {
+                "texture": ["D:/textures/diffuse.<UDIM>.tx"],
+                "cache": ["D:/cache/character.abc"],
+                "reference": ["D:/scene/set.project"]
+            }
+
+        """
+        self.print_info("\n\n-----------------------------"
+                        "--------------Start clarisse fast analyse---"
+                        "-----------------------------\n\n")
+        asset_info = {"texture": [], "cache": [], "reference": []}
+        upload_asset = []
+        upload_writer = None
+        if self.stream_upload:
+            # The expanded sequences are written as they are found.
+            upload_writer = JsonStreamWriter(self.upload_json)
+            upload_writer.extend("asset", ())
+        missing = []
+        try:
+            for reference in iter_references(self.cg_file,
+                                             index=self.dir_index):
+                asset_info[reference.kind].append(reference.path)
+                files = expand_sequence(reference.path, self.dir_index)
+                if not files:
+                    missing.append(reference.path)
+                for file_path in files:
+                    entry = {
+                        "local": file_path,
+                        "server": self.path_mapper.to_server(file_path)
+                    }
+                    if upload_writer:
+                        upload_writer.append("asset", entry)
+                    else:
+                        upload_asset.append(entry)
+        except BaseException:
+            if upload_writer:
+                upload_writer.abort()
+            raise
+        if missing:
+            self.extend_tip(MISSING_ASSET_CODE, missing)
+        self.asset_info = asset_info
+        if upload_writer:
+            upload_writer.close()
+        else:
+            self.upload_info = {"asset": upload_asset}
+        self.result.mark_dirty("tips")
         self.logger.info('--[end]--')
 
     def get_file_md5(self, file_path):
-        """Generate the md5 values for the scenario."""
-        hash_md5 = hashlib.md5()
-        if os.path.exists(file_path):
-            with open(file_path, 'rb') as file_path_f:
-                while True:
-                    data_flow = file_path_f.read(8096)
-                    if not data_flow:
-                        break
-                    hash_md5.update(data_flow)
-        return hash_md5.hexdigest()
+        """Generate the md5 values for the scenario.
+
+        An unchanged file is not read again when a fingerprint cache is set.
+
+        Returns:
+            str: Hex digest, None if the file can not be read.
+
+        """
+        if self.fingerprint_cache:
+            return self.fingerprint_cache.hash_file(file_path)
+        return hash_file(file_path)
+
+    def get_scene_md5(self):
+        """Get the md5 of the scene, read once per analysis."""
+        if self._scene_md5 is None:
+            self._scene_md5 = self.get_file_md5(self.cg_file)
+        return self._scene_md5
 
     def gather_upload_dict(self):
         """Gather upload info.
@@ -339,34 +839,581 @@ class AnalyzeClarisse(object):
                 "asset": [
                     {
                         "local": "E:/copy/muti_layer_test.ma",
-                        "server": "/E/copy/muti_layer_test.ma"
+                        "server": "/E/copy/muti_layer_test.ma",
+                        "size": 1024
                     }
                 ]
         }
 
         """
-        self.upload_info = utils.json_load(self.upload_json)
-        self.upload_info["asset"].append({
+        unchanged_path = os.path.join(self.workspace, UNCHANGED_NAME)
+        if os.path.exists(unchanged_path):
+            # Left by a delta submission, upload.json lists every file again.
+            os.remove(unchanged_path)
+        if self.stream_upload:
+            self.gather_upload_stream()
+            return
+        upload_info = self.upload_info
+        manifest = UploadManifest(iter_expanded(upload_info.get("asset", [])),
+                                  self.path_mapper)
+        manifest.add(self.cg_file)
+        if self.path_mapper.rules:
+            manifest.remap_servers()
+        manifest.fill_sizes(self.validate_workers, self.dir_index)
+        if self.hash_assets:
+            with self.measure("hash"):
+                self.hash_stats = self.hash_engine.hash_manifest(manifest)
+            self.logger.info("hash %(files)s assets with %(algorithm)s, "
+                             "%(bytes)s bytes read at %(mb_per_second).1f "
+                             "MB/s", self.hash_stats)
+        if self.collapse_sequences:
+            upload_info["asset"] = collapse_entries(manifest)
+        else:
+            # The loaded dicts, completed in place.
+            upload_info["asset"] = manifest.to_list()
+        upload_info["scene"] = self.get_scene_entries()
+        self.result.mark_dirty("upload")
+
+    def get_scene_entries(self):
+        """Get the ``scene`` list of upload.json."""
+        scene_entry = {
             "local": self.cg_file.replace("\\", "/"),
-            "server": convert_path(self.cg_file)
+            "server": self.path_mapper.to_server(self.cg_file)
+        }
+        scene_hash = self.get_scene_md5()
+        if scene_hash is not None:
+            scene_entry["hash"] = scene_hash
+        return [scene_entry]
+
+    def gather_upload_stream(self):
+        """Gather upload info in chunks, without loading upload.json.
+
+        See ``stream_upload`` of ``manifest``, ``upload_info`` is left
+        unloaded, ``iter_upload_assets`` reads the entries back.
+
+        """
+        # Entries changed in memory, e.g. by the fast mode, go first.
+        self.result.flush(["upload"])
+        count, hash_stats = stream_upload(
+            self.upload_json, self.upload_json, self.path_mapper,
+            extra_paths=[self.cg_file],
+            scene_entries=self.get_scene_entries(),
+            hash_engine=self.hash_engine if self.hash_assets else None,
+            max_workers=self.validate_workers, index=self.dir_index,
+            collapse=self.collapse_sequences)
+        self.result.sync_from_disk(["upload"])
+        if hash_stats:
+            self.hash_stats = hash_stats
+            self.logger.info("hash %(files)s assets with %(algorithm)s, "
+                             "%(bytes)s bytes read at %(mb_per_second).1f "
+                             "MB/s", self.hash_stats)
+        self.logger.info("upload.json gathered: %s assets", count)
+
+    def iter_upload_assets(self):
+        """Iterate the asset entries of upload.json, one per file.
+
+        With ``stream_upload`` they are read one by one from the file unless
+        ``upload_info`` was loaded. Sequence records are expanded as they
+        are reached.
+
+        """
+        if (self.stream_upload and not self.result.is_loaded("upload") and
+                os.path.exists(self.upload_json)):
+            return iter_expanded(entry for _, entry in iter_json_items(
+                self.upload_json, keys=["asset"]))
+        return iter_expanded(self.upload_info.get("asset", []))
+
+    def write_upload_delta(self):
+        """Move the files unchanged since ``previous_upload`` to their list.
+
+        Returns:
+            dict: Number of changed and unchanged files, see
+                ``delta.write_delta``.
+
+        """
+        if not self.hash_assets:
+            self.logger.warning("previous_upload without hash_assets, every "
+                                "file is uploaded again.")
+        fingerprints = load_fingerprints(self.previous_upload)
+        self.result.flush(["upload"])
+        self.upload_delta = write_delta(
+            self.upload_json, self.upload_json,
+            os.path.join(self.workspace, UNCHANGED_NAME), fingerprints,
+            collapse=self.collapse_sequences)
+        self.result.sync_from_disk(["upload"])
+        self.logger.info("upload.json delta: %(changed)s changed, "
+                         "%(unchanged)s unchanged files, %(unchanged_bytes)s "
+                         "bytes not uploaded again", self.upload_delta)
+        return self.upload_delta
+
+    def write_upload_shards(self):
+        """Split the assets of upload.json into ``upload_shards`` shards.
+
+        The shards and their summary are written in the workspace, the ones
+        of a previous analysis of the workspace are removed first. The
+        assets are read twice through ``iter_upload_assets``, with
+        ``stream_upload`` they are not all loaded at once.
+
+        Returns:
+            dict: The summary, see ``shard.write_shards``.
+
+        """
+        remove_shards(self.workspace)
+        if self.result.is_loaded("upload"):
+            scene_entries = self.upload_info.get("scene")
+        else:
+            scene_entries = [entry for _, entry in iter_json_items(
+                self.upload_json, keys=["scene"])]
+        self.shard_summary = stream_shards(
+            self.iter_upload_assets, self.upload_shards, self.workspace,
+            scene_entries, max_workers=self.validate_workers,
+            index=self.dir_index)
+        self.logger.info("upload.json split into %s shards, imbalance "
+                         "%.2f", len(self.shard_summary["shards"]),
+                         self.shard_summary["imbalance"])
+        return self.shard_summary
+
+    def validate_asset_files(self):
+        """Check the files referenced by the analysis and collect tips.
+
+        Missing files are added to the tips as missing references, empty
+        and unreadable ones as missing files. When the previous result was
+        reused, its tips already cover the assets whose stat did not change,
+        only the other ones are checked.
+
+        Returns:
+            ValidationReport: Result of the check.
+
+        """
+        from rayvision_utils.exception import tips_code
+        paths = [path for path in iter_referenced_paths(
+            self.asset_info, {"asset": self.iter_upload_assets()})
+                 if not is_sequence_path(path) and (
+                     not self._restored_previous or
+                     path in self._recheck_assets)]
+        report = validate_files(paths, self.validate_workers,
+                                self.dir_index)
+        for code, bad_paths in ((MISSING_ASSET_CODE, report.missing),
+                                (tips_code.MISSING_FILE, report.empty),
+                                (tips_code.MISSING_FILE, report.unreadable)):
+            if bad_paths:
+                self.extend_tip(code, bad_paths)
+        self.logger.info("validate %s files: %s missing, %s empty, "
+                         "%s unreadable", len(paths), len(report.missing),
+                         len(report.empty), len(report.unreadable))
+        return report
+
+    def get_analyse_settings(self):
+        """Get the settings the analysis result depends on, besides files.
+
+        Returns:
+            dict: Settings of the analysis.
+
+        """
+        settings = {
+            "cg_file": self.cg_file.replace("\\", "/"),
+            "project_name": self.project_name,
+            "render_software": self.render_software,
+            "local_os": self.local_os,
+            "platform": self.platform,
+        }
+        if self.collapse_sequences:
+            # Only set when on, the keys of the other results do not change.
+            settings["collapse_sequences"] = True
+        return settings
+
+    def get_result_cache_key(self):
+        """Get the key of this analysis in the result cache.
+
+        Returns:
+            str: Key made of the scene and analyzer content and settings.
+
+        """
+        return self.result_cache.make_key(
+            self.get_scene_md5(),
+            self.get_file_md5(self.analyze_script_path),
+            self.software_version,
+            self.plugin_config,
+            **self.get_analyse_settings()
+        )
+
+    def get_state_settings(self, mode):
+        """Get the settings recorded in the asset state of the workspace."""
+        settings = self.get_analyse_settings()
+        settings.update({
+            "software_version": self.software_version,
+            "plugin_config": self.plugin_config,
+            "analyzer": self.analyze_script_path,
+            "mode": mode,
+            # The validation tips are part of the reused result.
+            "validate_assets": self.validate_assets,
         })
-        self.upload_info["scene"] = [
-            {
-                "local": self.cg_file.replace("\\", "/"),
-                "server": convert_path(self.cg_file),
-                "hash": self.get_file_md5(self.cg_file)
-            }
-        ]
-        utils.json_save(self.upload_json, self.upload_info)
+        return settings
+
+    def load_previous_result(self, mode):
+        """Load the state of ``previous_workspace`` and reuse its result.
+
+        Returns:
+            tuple: The previous state, None without a previous workspace,
+                and whether its result was copied to the workspace.
+
+        """
+        previous_state = None
+        if self.previous_workspace:
+            previous_state = incremental.load_state(self.previous_workspace)
+        return previous_state, self.restore_previous_result(previous_state,
+                                                            mode)
+
+    def restore_previous_result(self, previous_state, mode):
+        """Reuse the result of the previous workspace if still valid.
+
+        Args:
+            previous_state (dict): Asset state of the previous workspace.
+            mode (str): Mode of this analysis.
+
+        Returns:
+            bool: True if the previous result was copied to the workspace.
+
+        """
+        if not previous_state:
+            return False
+        if previous_state.get("settings") != json.loads(json.dumps(
+                self.get_state_settings(mode))):
+            return False
+        scene = previous_state.get("scene", {})
+        # The scene is stat directly, a shared index may hold an older stat.
+        stat_record = incremental.stat_record(self.cg_file)
+        if stat_record["stat"] != scene.get("stat") and (
+                self.get_scene_md5() != scene.get("hash")):
+            return False
+        changed = incremental.changed_dependencies(
+            previous_state.get("assets", {}), self.hash_engine.hash_files)
+        if changed:
+            self.logger.info("analyse result not reused, changed scene "
+                             "dependencies: %s", changed)
+            return False
+        if not incremental.copy_result(self.previous_workspace,
+                                       self.workspace):
+            return False
+        # A result must list every file, also the ones left out of the
+        # upload.json of a delta submission.
+        unchanged_path = os.path.join(self.previous_workspace, UNCHANGED_NAME)
+        if merge_unchanged(self.upload_json, unchanged_path) and (
+                os.path.abspath(unchanged_path) == os.path.abspath(
+                    os.path.join(self.workspace, UNCHANGED_NAME))):
+            os.remove(unchanged_path)
+        self.logger.info("analyse result reused from: %s",
+                         self.previous_workspace)
+        self._restored_previous = True
+        return True
+
+    def update_asset_state(self, previous_state, mode):
+        """Save the asset state of the workspace and the delta.
+
+        Args:
+            previous_state (dict): Asset state of the previous workspace,
+                None without a previous workspace.
+            mode (str): Mode of this analysis.
+
+        """
+        previous_assets = (previous_state or {}).get("assets", {})
+        # Only the hashes of this analysis are current, the ones of a reused
+        # upload.json may belong to files changed since.
+        assets = ((asset["local"],
+                   asset.get("hash") if self.hash_assets else None)
+                  for asset in self.iter_upload_assets())
+        delta = incremental.new_delta()
+        scene_record = incremental.stat_record(self.cg_file)
+        scene_record["path"] = self.cg_file.replace("\\", "/")
+        scene_record["hash"] = self.get_scene_md5()
+        # The records are written as they are made, a streamed upload.json
+        # is read once and never held in memory.
+        incremental.save_state(self.workspace, {
+            "scene": scene_record,
+            "settings": self.get_state_settings(mode),
+            "assets": incremental.iter_asset_records(
+                assets, previous_assets, self.hash_engine.hash_files, delta,
+                index=self.dir_index),
+        })
+        if delta["missing"]:
+            self.extend_tip(MISSING_ASSET_CODE, delta["missing"])
+        if previous_state is not None:
+            self.delta = delta
+            utils.json_save(
+                os.path.join(self.workspace, incremental.DELTA_FILE), delta)
+            self._recheck_assets = set(delta["added"] + delta["changed"] +
+                                       delta["missing"])
+
+    def restore_cached_result(self):
+        """Put a cached analysis result into the workspace.
+
+        Returns:
+            tuple: Key of the analysis, None without a result cache, and
+                whether the result was restored.
+
+        """
+        if not self.result_cache:
+            return None, False
+        cache_key = self.get_result_cache_key()
+        if self.result_cache.restore(cache_key, self.workspace):
+            self.logger.info("analyse result restored from cache: %s",
+                             cache_key)
+            return cache_key, True
+        return cache_key, False
+
+    def store_cached_result(self, cache_key):
+        """Write the result and store it in the result cache."""
+        self.result.flush()
+        self.result_cache.store(cache_key, self.workspace)
+
+    def load_result(self):
+        """Take in the result files written to the workspace.
+
+        They are read on first access, the tips collected so far are merged
+        into tips.json. With ``collapse_sequences`` the sequences of
+        asset.json are replaced by their pattern.
+
+        """
+        self.result.sync_from_disk()
+        if self.collapse_sequences:
+            collapse_asset_info(self.asset_info)
+            self.result.mark_dirty("asset")
+
+    @staticmethod
+    def check_mode(mode):
+        """Check the mode of an analysis, "full" or "fast"."""
+        if mode not in ("full", "fast"):
+            raise Exception("mode must be full or fast.")
+
+    def analyse(self, no_upload=False, mode="full"):
+        """Analytical master method for clarrise.
 
-    def analyse(self, no_upload=False):
-        """Analytical master method for clarrise."""
-        self.write_task_json()
-        self.analyse_cg_file()
+        Args:
+            no_upload (bool): Skip gathering upload.json, default is False.
+            mode (str): "full" runs the analyzer, "fast" only parses the
+                project for the files it references, default is "full".
+
+        """
+        self.check_mode(mode)
+        self.recorder.reset()
+        try:
+            with self.recorder.total():
+                self.run_steps(self.iter_steps(no_upload, mode))
+        finally:
+            self.save_metrics()
+            self.close_workspace()
+
+    def run_steps(self, steps):
+        """Run the steps of ``iter_steps`` in turn, measuring each phase."""
+        result = None
+        while True:
+            try:
+                phase, function, args = steps.send(result)
+            except StopIteration:
+                return
+            if phase is None:
+                result = function(*args)
+            else:
+                with self.measure(phase):
+                    result = function(*args)
+
+    def iter_steps(self, no_upload, mode, analyzer_step=None):
+        """Iterate the steps of an analysis.
 
-        self.tips_info = utils.json_load(self.tips_json)
-        self.asset_info = utils.json_load(self.asset_json)
-        self.task_info = utils.json_load(self.task_json)
+        Each step is yielded as ``(phase, function, args)``, the caller runs
+        ``function(*args)``, measured as ``phase`` unless it is None, and
+        sends its result back. ``analyse`` runs them in turn, the asyncio
+        pipeline of ``analyse_async`` in the executor of its loop, so both
+        run the same steps.
+
+        Args:
+            no_upload (bool): Skip gathering upload.json.
+            mode (str): "full" or "fast", see ``analyse``.
+            analyzer_step (function, optional): Runs the analyzer instead of
+                ``analyse_cg_file``, e.g. a coroutine function.
+
+        """
+        self._scene_md5 = None
+        yield "make_workspace", self.make_workspace, ()
+        previous_state, restored = yield ("restore_previous",
+                                          self.load_previous_result, (mode,))
+        if restored:
+            cache_key = None
+        elif mode == "fast":
+            yield "write_task_json", self.write_task_json, ()
+            yield "analyze", self.analyse_fast_cg_file, ()
+            cache_key, restored = None, True
+        else:
+            cache_key, restored = yield ("restore_cache",
+                                         self.restore_cached_result, ())
+        if not restored:
+            yield "write_task_json", self.write_task_json, ()
+            yield "analyze", analyzer_step or self.analyse_cg_file, ()
+
+        yield None, self.load_result, ()
+        if cache_key and not restored:
+            yield "store_cache", self.store_cached_result, (cache_key,)
         if not no_upload:
-            self.gather_upload_dict()
+            yield "gather_upload", self.gather_upload_dict, ()
+            if self.incremental:
+                yield ("update_state", self.update_asset_state,
+                       (previous_state, mode))
+            if self.previous_upload:
+                yield "upload_delta", self.write_upload_delta, ()
+            if self.upload_shards:
+                yield "shard_upload", self.write_upload_shards, ()
+        if self.validate_assets:
+            yield "validate", self.validate_asset_files, ()
+        yield "flush", self.result.flush, ()
         self.logger.info("analyse end.")
+
+    def analyse_async(self, no_upload=False, timeout=None, mode="full"):
+        """Asyncio variant of ``analyse``.
+
+        The steps are the ones of ``analyse``, the analyzer runs as an
+        asyncio subprocess and the file work runs in the default executor.
+        On timeout or cancellation the analyzer process tree is killed and
+        the workspace is removed if this analysis created it.
+
+        Examples:
+            await AnalyzeClarisse(**analyze_info).analyse_async(timeout=600)
+
+        Args:
+            no_upload (bool): Skip gathering upload.json, default is False.
+            timeout (float, optional): Seconds before the analysis is
+                aborted with ``asyncio.TimeoutError``.
+            mode (str): "full" or "fast", see ``analyse``.
+
+        Returns:
+            coroutine: Awaitable running the analysis.
+
+        """
+        from rayvision_clarisse.aio import analyse_async
+        self.check_mode(mode)
+        return analyse_async(self, no_upload=no_upload, timeout=timeout,
+                             mode=mode)
+
+
+def _batch_result(cg_file, error=None):
+    """Create an empty per-scene result of ``analyse_batch``."""
+    return {
+        "cg_file": cg_file,
+        "workspace": None,
+        "task_info": {},
+        "asset_info": {},
+        "tips_info": {},
+        "upload_info": {},
+        "error": error,
+    }
+
+
+def _analyse_scene(analyse_kwargs, no_upload=False):
+    """Analyse one scene and collect its results, never raising.
+
+    Module level so it can be pickled into a process pool.
+
+    Args:
+        analyse_kwargs (dict): Keyword arguments of ``AnalyzeClarisse``.
+        no_upload (bool): Skip gathering upload.json, default is False.
+
+    Returns:
+        dict: Result of the scene, ``error`` is None on success.
+
+    """
+    result = _batch_result(analyse_kwargs.get("cg_file"))
+    try:
+        analyze_obj = AnalyzeClarisse(**analyse_kwargs)
+        result["workspace"] = analyze_obj.workspace
+        analyze_obj.analyse(no_upload=no_upload)
+        # Read from the workspace on first access, so they may fail too.
+        result["task_info"] = analyze_obj.task_info
+        result["asset_info"] = analyze_obj.asset_info
+        result["tips_info"] = analyze_obj.tips_info
+        result["upload_info"] = analyze_obj.upload_info
+    except Exception as err:  # pylint: disable=broad-except
+        result["error"] = "{}: {}".format(type(err).__name__, err)
+    return result
+
+
+def _check_picklable(analyse_kwargs):
+    """Check that the arguments of a scene can be sent to a process pool.
+
+    Objects such as a ``FingerprintCache``, a ``DirectoryIndex``, an
+    ``AnalyzerWorker`` or a lambda callback can not.
+
+    """
+    for name, value in analyse_kwargs.items():
+        try:
+            pickle.dumps(value)
+        except Exception:  # pylint: disable=broad-except
+            raise Exception(
+                "{} can not be sent to a process pool, use "
+                "executor=\"thread\".".format(name))
+
+
+def analyse_batch(scenes, max_workers=None, executor="thread",
+                  no_upload=False, **kwargs):
+    """Analyse many scenes concurrently.
+
+    Each scene is analysed by its own ``AnalyzeClarisse`` object, a failing
+    scene is reported in its result and does not abort the batch.
+
+    Examples:
+        results = analyse_batch(
+            ["D:/scene/a.project", "D:/scene/b.project"],
+            software_version="clarisse_ifx_4.0_sp3",
+            project_name="Project1",
+            workspace="c:/workspace")
+        failures = [res for res in results if res["error"]]
+
+    Args:
+        scenes (list): Scene file paths, or dicts of ``AnalyzeClarisse``
+            keyword arguments overriding ``kwargs`` for that scene.
+        max_workers (int, optional): Pool size, default is the cpu count.
+        executor (str): "thread" or "process", default is "thread".
+            Each job mostly waits on the analyzer subprocess, threads save
+            the memory and the startup of a process per worker. A process
+            pool needs picklable arguments and, on Windows, a caller
+            guarded by ``if __name__ == "__main__":``.
+        no_upload (bool): Skip gathering upload.json, default is False.
+        **kwargs: Keyword arguments shared by every ``AnalyzeClarisse``.
+
+    Returns:
+        list: One result dict per scene, in the order of ``scenes``.
+
+    """
+    if executor == "process":
+        pool_class = futures.ProcessPoolExecutor
+    elif executor == "thread":
+        pool_class = futures.ThreadPoolExecutor
+    else:
+        raise Exception("executor must be process or thread.")
+
+    jobs = []
+    for scene in scenes:
+        analyse_kwargs = dict(kwargs)
+        if isinstance(scene, dict):
+            analyse_kwargs.update(scene)
+        else:
+            analyse_kwargs["cg_file"] = scene
+        jobs.append(analyse_kwargs)
+    if not jobs:
+        return []
+    if executor == "process":
+        for job in jobs:
+            _check_picklable(job)
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    with pool_class(max_workers=max_workers) as pool:
+        future_list = [pool.submit(_analyse_scene, job, no_upload)
+                       for job in jobs]
+        results = []
+        for job, future in zip(jobs, future_list):
+            try:
+                results.append(future.result())
+            except Exception as err:  # pylint: disable=broad-except
+                # The worker process itself died.
+                results.append(_batch_result(
+                    job.get("cg_file"),
+                    "{}: {}".format(type(err).__name__, err)))
+    return results
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""Compact store of the asset entries of upload.json.
+
+An entry of upload.json is a dict such as::
+
+    {"local": "D:/cache/sim/sim.0001.vdb",
+     "server": "/D/cache/sim/sim.0001.vdb",
+     "size": 1024}
+
+Scenes with millions of cache frames repeat the same folders over and over.
+``AssetTable`` keeps the entries in columns: each folder is stored once and
+referenced by index, the file name is shared by the local and server paths,
+sizes sit in a typed array. ``AssetRecord`` is a mutable mapping view of one
+row, so code written for the dict entries keeps working.
+
+The table is for callers keeping a large asset list around, it saves memory
+only while it is the one copy of the entries. Reading a key through the
+records is several times slower than through dicts, ``iter_column`` narrows
+the gap for bulk passes. The analysis itself keeps ``upload_info["asset"]``
+a list of dicts, see ``manifest.UploadManifest``.
+
+"""
+
+# Import built-in models
+import array
+import re
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+# Marks an empty cell of the integer columns.
+_NONE = -1
+
+_SLASHES_RE = re.compile(r"/{2,}")
+
+
+def normalize_local_path(path):
+    """Get the key of a local path in the manifest.
+
+    Args:
+        path (str): Local path.
+            e.g.:
+                "d:\\work\\\\render/a.exr"
+
+    Returns:
+        str: Normalized path.
+            e.g.:
+                "D:/work/render/a.exr"
+
+    """
+    path = path.replace("\\", "/")
+    # Keep the double slash of a UNC path.
+    prefix = "//" if path.startswith("//") else ""
+    path = prefix + _SLASHES_RE.sub("/", path[len(prefix):])
+    if len(path) > 1 and path[1] == ":":
+        path = path[0].upper() + path[1:]
+    return path
+
+
+def _split(path):
+    """Split a path after its last slash, ``("D:/tex/", "a.exr")``."""
+    index = path.rfind("/") + 1
+    return path[:index], path[index:]
+
+
+def _index_key(local):
+    """Get the normalized folder and the name of a local path."""
+    folder, name = _split(local.replace("\\", "/"))
+    return normalize_local_path(folder), name
+
+
+class AssetRecord(MutableMapping):
+    """Dict-like view of one entry of an ``AssetTable``."""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        if key == "local":
+            # Fast path of the most read key.
+            table = self._table  # pylint: disable=protected-access
+            return (table._folders[table._local_folders[self._row]] +
+                    table._names[self._row])
+        return self._table.get_value(self._row, key)
+
+    def __setitem__(self, key, value):
+        self._table.set_value(self._row, key, value)
+
+    def __delitem__(self, key):
+        self._table.delete_value(self._row, key)
+
+    def __iter__(self):
+        return iter(self._table.row_keys(self._row))
+
+    def __len__(self):
+        return len(self._table.row_keys(self._row))
+
+    def __repr__(self):
+        return repr(self.to_json())
+
+    def copy(self):
+        """Get the entry as a new dict."""
+        return self.to_json()
+
+    def to_json(self):
+        """Get the entry as a dict, for json encoders."""
+        return {key: self[key] for key in self}
+
+
+class AssetTable(object):
+    """Columnar list of upload entries with interned folders.
+
+    Iterating gives ``AssetRecord`` mappings, ``to_json`` gives the
+    ``asset`` list of upload.json.
+
+    """
+
+    def __init__(self, entries=None):
+        """Initialize the table.
+
+        Args:
+            entries (iterable, optional): Entries to append, each a dict
+                with at least ``local``.
+
+        """
+        self._folders = []
+        self._folder_ids = {}
+        self._local_folders = array.array("l")
+        self._names = []
+        # Folder of the server path when it ends with the local name.
+        self._server_folders = array.array("l")
+        # Server paths that do not end with the local name, by row.
+        self._servers = {}
+        self._sizes = array.array("q")
+        self._hashes = []
+        # Any other key, by row.
+        self._extra = {}
+        # Normalized local folder -> {name: row}.
+        self._index = {}
+        for entry in entries or []:
+            self.append(entry)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        for row in range(len(self._names)):
+            yield AssetRecord(self, row)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self._names)
+        if not 0 <= row < len(self._names):
+            raise IndexError("asset table index out of range")
+        return AssetRecord(self, row)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def _intern(self, folder):
+        """Get the id of a folder, storing it on first use."""
+        folder_id = self._folder_ids.get(folder)
+        if folder_id is None:
+            folder_id = self._folder_ids[folder] = len(self._folders)
+            self._folders.append(folder)
+        return folder_id
+
+    def find(self, local):
+        """Get the row of a local path, None if not in the table.
+
+        Paths differing only by slash direction, repeated slashes or drive
+        letter case are the same entry.
+
+        """
+        folder, name = _index_key(local)
+        return self._index.get(folder, {}).get(name)
+
+    def _add_local(self, row, local):
+        """Store the local path of a row and index it."""
+        folder, name = _split(local)
+        self._local_folders[row] = self._intern(folder)
+        self._names[row] = name
+        index_folder, index_name = _index_key(local)
+        if index_name == name:
+            # Share the name string with the names column.
+            index_name = name
+        self._index.setdefault(index_folder, {})[index_name] = row
+
+    def append(self, entry):
+        """Append an entry.
+
+        Args:
+            entry (dict): Entry with ``local`` and any other key.
+
+        Returns:
+            AssetRecord: The new entry.
+
+        """
+        row = len(self._names)
+        self._local_folders.append(_NONE)
+        self._names.append(None)
+        self._server_folders.append(_NONE)
+        self._sizes.append(_NONE)
+        self._hashes.append(None)
+        self._add_local(row, entry["local"])
+        for key, value in entry.items():
+            if key != "local":
+                self.set_value(row, key, value)
+        return AssetRecord(self, row)
+
+    def extend(self, entries):
+        """Append entries, like ``list.extend``."""
+        for entry in entries:
+            self.append(entry)
+
+    def get_value(self, row, key):
+        """Get a value of an entry, raising KeyError if not set."""
+        if key == "local":
+            return self._folders[self._local_folders[row]] + self._names[row]
+        if key == "server":
+            folder_id = self._server_folders[row]
+            if folder_id != _NONE:
+                return self._folders[folder_id] + self._names[row]
+            if row in self._servers:
+                return self._servers[row]
+            raise KeyError(key)
+        if key == "size" and self._sizes[row] != _NONE:
+            return self._sizes[row]
+        if key == "hash" and self._hashes[row] is not None:
+            return self._hashes[row]
+        return self._extra.get(row, {})[key]
+
+    def set_value(self, row, key, value):
+        """Set a value of an entry."""
+        self.delete_value(row, key, missing_ok=True)
+        if key == "local":
+            folder, name = _index_key(self.get_value(row, "local"))
+            del self._index[folder][name]
+            self._add_local(row, value)
+        elif key == "server":
+            name = self._names[row]
+            if isinstance(value, str) and value.endswith(name) and (
+                    not name or value[-len(name) - 1:-len(name)] in ("/", "")):
+                self._server_folders[row] = self._intern(
+                    value[:len(value) - len(name)])
+            else:
+                self._servers[row] = value
+        elif key == "size" and isinstance(value, int) and value >= 0 and (
+                not isinstance(value, bool)):
+            self._sizes[row] = value
+        elif key == "hash" and isinstance(value, str):
+            self._hashes[row] = value
+        else:
+            self._extra.setdefault(row, {})[key] = value
+
+    def delete_value(self, row, key, missing_ok=False):
+        """Delete a value of an entry, ``local`` can not be deleted."""
+        if key == "local":
+            if missing_ok:
+                return
+            raise KeyError("local can not be deleted.")
+        found = False
+        if key == "server":
+            found = (self._server_folders[row] != _NONE or
+                     row in self._servers)
+            self._server_folders[row] = _NONE
+            self._servers.pop(row, None)
+        elif key == "size" and self._sizes[row] != _NONE:
+            found = True
+            self._sizes[row] = _NONE
+        elif key == "hash" and self._hashes[row] is not None:
+            found = True
+            self._hashes[row] = None
+        extra = self._extra.get(row)
+        if extra and key in extra:
+            found = True
+            del extra[key]
+            if not extra:
+                del self._extra[row]
+        if not found and not missing_ok:
+            raise KeyError(key)
+
+    def iter_column(self, key):
+        """Iterate the values of one key of every entry, None if not set.
+
+        Much faster than reading the key from every ``AssetRecord``.
+
+        """
+        folders = self._folders
+        if key == "local":
+            for folder_id, name in zip(self._local_folders, self._names):
+                yield folders[folder_id] + name
+        elif key == "server":
+            for row, (folder_id, name) in enumerate(zip(self._server_folders,
+                                                        self._names)):
+                if folder_id != _NONE:
+                    yield folders[folder_id] + name
+                else:
+                    yield self._servers.get(row)
+        elif key == "size" and not self._extra:
+            for size in self._sizes:
+                yield None if size == _NONE else size
+        elif key == "hash" and not self._extra:
+            for file_hash in self._hashes:
+                yield file_hash
+        else:
+            for row in range(len(self._names)):
+                try:
+                    yield self.get_value(row, key)
+                except KeyError:
+                    yield None
+
+    def row_keys(self, row):
+        """Get the keys set on an entry, in upload.json order."""
+        keys = ["local"]
+        if self._server_folders[row] != _NONE or row in self._servers:
+            keys.append("server")
+        if self._sizes[row] != _NONE:
+            keys.append("size")
+        if self._hashes[row] is not None:
+            keys.append("hash")
+        keys.extend(self._extra.get(row, ()))
+        return keys
+
+    def to_json(self):
+        """Get the entries as the ``asset`` list of upload.json.
+
+        The entries are views, each is turned into a dict by the json
+        encoder when it is written, see ``utils.json_default``.
+
+        """
+        return list(self)
+
+    def to_list(self):
+        """Get the entries as new dicts."""
+        return [record.to_json() for record in self]
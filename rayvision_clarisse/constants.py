@@ -1,2 +1,48 @@
 """Constant information about the Clarisse."""
 PACKAGE_NAME = 'rayvision_clarisse'
+
+# Tips codes of the files referenced by the scene.
+MISSING_ASSET_CODE = "25009"
+
+# Entries of the folder listings kept by the directory index of an analysis
+# with ``stream_upload``, about 20 MB.
+STREAM_INDEX_ENTRIES = 20000
+
+# Analyzer output lines collected as tips while the analyzer runs, each rule
+# is (regex, tips code, fatal). The first group of the regex is the tip
+# message, a fatal line stops the analysis when fail fast is enabled. Fatal
+# rules are tried first.
+ANALYZE_OUTPUT_RULES = [
+    (r"Reference file not found.*?:\s*(.+)", MISSING_ASSET_CODE, False),
+    (r"\[Analyze Error\]\s*(.+)", "999", True),
+]
+
+# Analyzer output line reporting the progress in percent, e.g.
+# "analyse 50%". Other lines with a percent sign are log text.
+ANALYZE_PROGRESS_PATTERN = (r"^\s*(?:analy[sz]e|progress)\b\D*?"
+                            r"(\d{1,3}(?:\.\d+)?)\s*%\s*$")
+
+# Attributes of a Clarisse project holding a file path.
+PROJECT_PATH_ATTRIBUTES = (
+    "filename",
+    "file",
+    "filename_sequence",
+    "reference_filename",
+    "path",
+)
+
+# Extensions of the cache files referenced by a Clarisse project, other
+# referenced files are reported as textures.
+CACHE_EXTENSIONS = (
+    ".abc", ".vdb", ".usd", ".usda", ".usdc", ".usdz", ".bgeo", ".obj",
+    ".lwo", ".fbx", ".ply",
+)
+
+# Extension of a referenced Clarisse project.
+PROJECT_EXTENSIONS = (".project",)
+
+# Extensions of files looked for in every attribute of a Clarisse project.
+ASSET_EXTENSIONS = CACHE_EXTENSIONS + PROJECT_EXTENSIONS + (
+    ".exr", ".tx", ".tif", ".tiff", ".tga", ".png", ".jpg", ".jpeg", ".hdr",
+    ".hdri", ".psd", ".bmp", ".dds", ".ies", ".osl", ".ptx", ".rat",
+)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Keep in upload.json only the files changed since a previous submission.
+
+The files of a previous submission are already on the cloud side. Their
+fingerprints, the ``hash`` and ``size`` of each entry, are indexed by server
+path, or by normalized local path for an entry without one. Each current
+entry is looked up in that index once, so a million entries take a million
+dict lookups and no scan of the previous list.
+
+An entry is unchanged when it has the same server path, the same hash and,
+if both sides know it, the same size as in the previous submission. An entry
+without a hash on either side is changed, the hashes come from
+``hash_assets``. The changed entries are left in upload.json and the
+unchanged ones are moved to ``upload_unchanged.json``, in the same format,
+to be referenced instead of uploaded again.
+
+"""
+
+# Import built-in models
+import os
+
+from rayvision_clarisse.asset_table import normalize_local_path
+from rayvision_clarisse.json_stream import iter_json_items
+from rayvision_clarisse.json_stream import JsonStreamWriter
+from rayvision_clarisse.sequence import collapse_entries
+from rayvision_clarisse.sequence import iter_expanded
+
+UNCHANGED_NAME = "upload_unchanged.json"
+
+
+def entry_key(entry):
+    """Get the key an entry is matched with across submissions."""
+    server = entry.get("server")
+    if server:
+        return server
+    return normalize_local_path(entry["local"])
+
+
+def _iter_assets(upload):
+    """Iterate the asset entries of upload.json or of its dict."""
+    if isinstance(upload, dict):
+        return iter_expanded(upload.get("asset", []))
+    return iter_expanded(entry for _, entry in iter_json_items(
+        upload, keys=["asset"]))
+
+
+def load_fingerprints(previous):
+    """Index the fingerprints of the files of a previous submission.
+
+    For an upload.json path, the ``upload_unchanged.json`` next to it is
+    read too, its files were part of that submission.
+
+    Args:
+        previous (str or dict): Previous upload.json, or its content.
+
+    Returns:
+        dict: ``(hash, size)`` by entry key, see ``entry_key``.
+
+    """
+    sources = [previous]
+    if not isinstance(previous, dict):
+        if not os.path.exists(previous):
+            raise Exception("{} is not found".format(previous))
+        unchanged_path = os.path.join(os.path.dirname(previous),
+                                      UNCHANGED_NAME)
+        if os.path.exists(unchanged_path):
+            sources.append(unchanged_path)
+    fingerprints = {}
+    for source in sources:
+        for entry in _iter_assets(source):
+            if entry.get("hash"):
+                fingerprints[entry_key(entry)] = (entry["hash"],
+                                                  entry.get("size"))
+    return fingerprints
+
+
+def is_unchanged(entry, fingerprints):
+    """Tell whether an entry is the same file as in ``fingerprints``."""
+    if not entry.get("hash"):
+        return False
+    fingerprint = fingerprints.get(entry_key(entry))
+    if fingerprint is None or fingerprint[0] != entry["hash"]:
+        return False
+    size = entry.get("size")
+    return size is None or fingerprint[1] is None or size == fingerprint[1]
+
+
+def write_delta(source_path, target_path, unchanged_path, fingerprints,
+                collapse=False, chunk_size=10000):
+    """Split upload.json into the changed and the unchanged entries.
+
+    Only one chunk of entries is in memory, ``target_path`` may be
+    ``source_path``. The ``scene`` list stays in ``target_path``.
+
+    Args:
+        source_path (str): upload.json to split.
+        target_path (str): upload.json of the new and changed entries.
+        unchanged_path (str): Json of the unchanged entries.
+        fingerprints (dict): See ``load_fingerprints``.
+        collapse (bool): Write the sequences of each chunk as records, see
+            ``sequence.collapse_entries``, default is False.
+        chunk_size (int): Number of entries written at once.
+
+    Returns:
+        dict: Number of ``changed`` and ``unchanged`` files and the
+            ``unchanged_bytes`` not uploaded again.
+
+    """
+    stats = {"changed": 0, "unchanged": 0, "unchanged_bytes": 0}
+    scene_entries = []
+    chunks = {"changed": [], "unchanged": []}
+    with JsonStreamWriter(target_path) as changed_writer, \
+            JsonStreamWriter(unchanged_path) as unchanged_writer:
+        writers = {"changed": changed_writer, "unchanged": unchanged_writer}
+
+        def write_chunk(name):
+            chunk = chunks[name]
+            writers[name].extend("asset", collapse_entries(chunk) if collapse
+                                 else chunk)
+            chunks[name] = []
+
+        for name in writers:
+            writers[name].extend("asset", ())
+        for key, item in iter_json_items(source_path,
+                                         keys=["asset", "scene"]):
+            if key == "scene":
+                scene_entries.append(item)
+                continue
+            for entry in iter_expanded([item]):
+                if is_unchanged(entry, fingerprints):
+                    name = "unchanged"
+                    stats["unchanged_bytes"] += entry.get("size") or 0
+                else:
+                    name = "changed"
+                stats[name] += 1
+                chunks[name].append(entry)
+                if len(chunks[name]) >= chunk_size:
+                    write_chunk(name)
+        for name in writers:
+            write_chunk(name)
+        changed_writer.write("scene", scene_entries)
+    return stats
+
+
+def merge_unchanged(upload_path, unchanged_path):
+    """Put unchanged entries back into an upload.json.
+
+    Used when the upload.json of a submission is reused as an analysis
+    result, which must list every file.
+
+    Args:
+        upload_path (str): upload.json of the changed entries.
+        unchanged_path (str): Json of the unchanged entries, may be missing.
+
+    Returns:
+        bool: True if there were unchanged entries to merge.
+
+    """
+    if not os.path.exists(unchanged_path):
+        return False
+    scene_entries = []
+    with JsonStreamWriter(upload_path) as writer:
+        writer.extend("asset", ())
+        for key, item in iter_json_items(upload_path,
+                                         keys=["asset", "scene"]):
+            if key == "scene":
+                scene_entries.append(item)
+            else:
+                writer.append("asset", item)
+        writer.extend("asset", (item for _, item in iter_json_items(
+            unchanged_path, keys=["asset"])))
+        writer.write("scene", scene_entries)
+    return True
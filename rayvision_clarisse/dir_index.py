@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""Answer file lookups from folder listings kept in memory.
+
+A scene references thousands of files living in a few folders. On a network
+share each ``os.path.exists`` or ``os.stat`` is a round trip, the index lists
+the folder of a path once with ``os.scandir`` and answers the lookups of the
+other files of that folder from the listing.
+
+Only the existence and the type of a file come with the listing everywhere.
+Its size and mtime come with it on Windows only, on POSIX ``stat`` is still a
+system call per file, made on first use and then cached by the entry.
+
+A listing is trusted for ``recheck`` seconds, then the folder is stat again
+and listed again only if its mtime changed, i.e. a file was added, removed or
+renamed. A listing older than ``ttl`` is dropped whatever the mtime, so the
+size and mtime of files changed in place are seen again. At most
+``max_folders`` listings, and with ``max_entries`` at most that many
+entries, are kept, the least recently used go first. An entry holds its
+``os.DirEntry`` and, once stat, its stat, about a kilobyte per file.
+
+"""
+
+# Import built-in models
+import collections
+import os
+import threading
+import time
+
+
+class _Listing(object):
+    """Entries of one folder."""
+
+    __slots__ = ("listed_at", "checked_at", "mtime", "entries", "error")
+
+    def __init__(self, now, mtime, entries, error):
+        self.listed_at = now
+        self.checked_at = now
+        self.mtime = mtime
+        self.entries = entries
+        self.error = error
+
+
+def _folder_mtime(folder):
+    """Get the mtime of a folder, None if it can not be stat."""
+    try:
+        return os.stat(folder).st_mtime_ns
+    except OSError:
+        return None
+
+
+class DirectoryIndex(object):
+    """Cache of folder listings, safe to share between threads.
+
+    Examples:
+        index = DirectoryIndex()
+        for path in paths:
+            if not index.exists(path):
+                print("missing", path)
+
+    """
+
+    def __init__(self, ttl=60.0, recheck=2.0, max_folders=4096,
+                 max_entries=None):
+        """Initialize the index, nothing is listed yet.
+
+        Args:
+            ttl (float): Seconds a listing is kept at most.
+            recheck (float): Seconds a listing is trusted before the mtime
+                of its folder is checked, 0 checks on every lookup.
+            max_folders (int): Number of listings kept.
+            max_entries (int, optional): Number of entries kept in all the
+                listings, the last listing is kept whatever its size.
+                Default is no limit.
+
+        """
+        self.ttl = ttl
+        self.recheck = recheck
+        self.max_folders = max_folders
+        self.max_entries = max_entries
+        self._listings = collections.OrderedDict()
+        self._entry_count = 0
+        # Key of each folder string looked up.
+        self._keys = {}
+        self._lock = threading.Lock()
+        self.stats = {"listings": 0, "rechecks": 0, "hits": 0}
+
+    @staticmethod
+    def folder_key(folder):
+        """Get the key of a folder, its normalized absolute path."""
+        return os.path.normcase(os.path.abspath(folder or "."))
+
+    @staticmethod
+    def split(path):
+        """Get the folder and the normalized name of a path.
+
+        Returns:
+            tuple: Folder and name, the name is empty for a root path.
+
+        """
+        path = path.rstrip("\\/") or path
+        folder, name = os.path.split(path)
+        return folder, os.path.normcase(name)
+
+    def _count(self, name):
+        """Add one to a counter of ``stats``, lookups run in many threads."""
+        with self._lock:
+            self.stats[name] += 1
+
+    def _list(self, folder):
+        """List a folder, the listing holds the error if it fails."""
+        mtime = _folder_mtime(folder)
+        entries, error = {}, None
+        try:
+            entries = {os.path.normcase(entry.name): entry
+                       for entry in os.scandir(folder or ".")}
+        except OSError as err:
+            error = err
+        self._count("listings")
+        return _Listing(time.time(), mtime, entries, error)
+
+    def _get_listing(self, folder):
+        """Get the listing of a folder, listing it if needed.
+
+        A listing moves to the end of the LRU order when checked, not on
+        every lookup, so lookups within ``recheck`` only take the lock to
+        count the hit.
+
+        """
+        key = self._keys.get(folder)
+        if key is None:
+            key = self._keys[folder] = self.folder_key(folder)
+        listing = self._listings.get(key)
+        now = time.time()
+        if listing is not None and now - listing.listed_at <= self.ttl:
+            if now - listing.checked_at < self.recheck:
+                self._count("hits")
+                return listing
+            self._count("rechecks")
+            if _folder_mtime(folder) == listing.mtime:
+                listing.checked_at = now
+                with self._lock:
+                    if key in self._listings:
+                        self._listings.move_to_end(key)
+                return listing
+        listing = self._list(folder)
+        with self._lock:
+            replaced = self._listings.pop(key, None)
+            if replaced is not None:
+                self._entry_count -= len(replaced.entries)
+            self._listings[key] = listing
+            self._entry_count += len(listing.entries)
+            while len(self._listings) > 1 and (
+                    len(self._listings) > self.max_folders or
+                    (self.max_entries is not None and
+                     self._entry_count > self.max_entries)):
+                self._entry_count -= len(
+                    self._listings.popitem(last=False)[1].entries)
+            if len(self._keys) > 4 * self.max_folders:
+                self._keys.clear()
+        return listing
+
+    def list_folder(self, folder):
+        """Get the entries of a folder.
+
+        Args:
+            folder (str): Folder path.
+
+        Returns:
+            dict: ``os.DirEntry`` by name, normalized with
+                ``os.path.normcase``.
+
+        Raises:
+            OSError: The folder can not be listed.
+
+        """
+        listing = self._get_listing(folder)
+        if listing.error is not None:
+            raise listing.error
+        return listing.entries
+
+    def entry(self, path):
+        """Get the ``os.DirEntry`` of a path, None if it does not exist."""
+        folder, name = self.split(path)
+        if not name:
+            return None
+        return self._get_listing(folder).entries.get(name)
+
+    def exists(self, path):
+        """Tell whether a path exists, like ``os.path.exists``."""
+        folder, name = self.split(path)
+        if not name:
+            return os.path.exists(path)
+        return name in self._get_listing(folder).entries
+
+    def isfile(self, path):
+        """Tell whether a path is a file, like ``os.path.isfile``."""
+        entry = self.entry(path)
+        try:
+            return entry is not None and entry.is_file()
+        except OSError:
+            return False
+
+    def isdir(self, path):
+        """Tell whether a path is a folder, like ``os.path.isdir``."""
+        folder, name = self.split(path)
+        if not name:
+            return os.path.isdir(path)
+        entry = self._get_listing(folder).entries.get(name)
+        try:
+            return entry is not None and entry.is_dir()
+        except OSError:
+            return False
+
+    def stat(self, path):
+        """Get the stat of a path, following links.
+
+        The stat comes from the listing on Windows, so ``st_ino`` is 0 there
+        as with ``os.DirEntry.stat``. On POSIX it is a system call, made once
+        per entry of the listing.
+
+        Returns:
+            os.stat_result: The stat, None if the path does not exist.
+
+        """
+        entry = self.entry(path)
+        if entry is None:
+            if self.split(path)[1]:
+                return None
+            try:
+                return os.stat(path)
+            except OSError:
+                return None
+        try:
+            return entry.stat()
+        except OSError:
+            return None
+
+    def getsize(self, path):
+        """Get the size of a file, None if it does not exist."""
+        stat = self.stat(path)
+        return None if stat is None else stat.st_size
+
+    def getmtime(self, path):
+        """Get the mtime of a file, None if it does not exist."""
+        stat = self.stat(path)
+        return None if stat is None else stat.st_mtime
+
+    def invalidate(self, folder=None):
+        """Drop the listing of a folder, or every listing."""
+        with self._lock:
+            if folder is None:
+                self._listings.clear()
+                self._entry_count = 0
+            else:
+                listing = self._listings.pop(self.folder_key(folder), None)
+                if listing is not None:
+                    self._entry_count -= len(listing.entries)
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""Persistent cache of file fingerprints.
+
+A fingerprint is the hash digest of a file, remembered together with the
+``(absolute path, size, mtime_ns, inode)`` the file had when it was hashed.
+As long as the stat of the file is unchanged the digest is served from the
+cache and the file is not read again.
+
+The cache is a sqlite database, so it can be shared by threads and processes
+of the same host. Between ``open`` and ``close``, e.g. during a run of the
+hash engine, one connection serves every thread and the new fingerprints and
+last use times are written in batches, a cache hit never takes the write
+lock. Entries beyond about ``max_entries`` are evicted least recently used
+first, checked every ``evict_every`` inserts and when the cache is closed.
+
+The database uses WAL when the file system supports it, the default journal
+otherwise, e.g. on NFS or SMB home folders.
+
+"""
+
+# Import built-in models
+import os
+import sqlite3
+import threading
+import time
+
+from rayvision_clarisse.hashing import hash_file
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprint (
+    path TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (path, algorithm)
+)
+"""
+
+
+def file_stat_key(file_path, index=None):
+    """Get the stat part of the fingerprint key of a file.
+
+    Args:
+        file_path (str): File path.
+        index (DirectoryIndex, optional): Index answering the stat from the
+            listing of the folder.
+
+    Returns:
+        tuple: ``(size, mtime_ns, inode)``, None if the file does not exist.
+
+    """
+    if index is not None:
+        stat = index.stat(file_path)
+        if stat is None:
+            return None
+    else:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+    mtime_ns = getattr(stat, "st_mtime_ns", None)
+    if mtime_ns is None:
+        mtime_ns = int(stat.st_mtime * 1000000000)
+    return stat.st_size, mtime_ns, stat.st_ino
+
+
+class FingerprintCache(object):
+    """Sqlite backed fingerprint cache with LRU eviction."""
+
+    def __init__(self, db_path, max_entries=200000, timeout=30,
+                 evict_every=1000):
+        """Initialize the cache.
+
+        Args:
+            db_path (str): Path of the sqlite database, created if needed.
+            max_entries (int): Number of fingerprints kept.
+            timeout (int): Seconds to wait for a lock held by another
+                process.
+            evict_every (int): Number of inserts between two evictions,
+                also the number of writes batched while the cache is open.
+
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.evict_every = evict_every
+        # The database is created on first use.
+        self._ready = False
+        self._wal = True
+        self._lock = threading.RLock()
+        # Connection shared between ``open`` and ``close``.
+        self._conn = None
+        self._users = 0
+        self._inserts = []
+        self._touches = []
+        self._inserted = 0
+
+    def _open_connection(self, wal):
+        """Open a connection in WAL or in the default journal mode."""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                               check_same_thread=False)
+        try:
+            if wal:
+                conn.execute("PRAGMA journal_mode=WAL")
+            if not self._ready:
+                conn.execute(_SCHEMA)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _connect(self):
+        """Open a connection, falling back to the default journal mode."""
+        if not self._ready:
+            db_folder = os.path.dirname(os.path.abspath(self.db_path))
+            if not os.path.exists(db_folder):
+                os.makedirs(db_folder)
+        conn = None
+        if self._wal:
+            try:
+                conn = self._open_connection(True)
+            except sqlite3.OperationalError:
+                # WAL needs shared memory, network file systems lack it.
+                self._wal = False
+        if conn is None:
+            conn = self._open_connection(False)
+        self._ready = True
+        return conn
+
+    def open(self):
+        """Share one connection until ``close``, may be nested."""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            self._users += 1
+
+    def close(self):
+        """Write what is pending and close the shared connection."""
+        with self._lock:
+            if not self._users:
+                return
+            self._users -= 1
+            if self._users:
+                return
+            conn, self._conn = self._conn, None
+            try:
+                self._flush(conn, evict=True)
+            finally:
+                conn.close()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write(self, inserts=(), touches=()):
+        """Queue writes, flushed at once when no connection is shared."""
+        with self._lock:
+            self._inserts.extend(inserts)
+            self._touches.extend(touches)
+            if self._conn is None:
+                with _ClosingConnection(self._connect()) as conn:
+                    self._flush(conn)
+            elif (len(self._inserts) + len(self._touches) >=
+                  self.evict_every):
+                self._flush(self._conn)
+
+    def _flush(self, conn, evict=False):
+        """Write the queued fingerprints and last use times.
+
+        Entries are evicted every ``evict_every`` inserts, or with ``evict``
+        if there was any insert since the last eviction.
+
+        """
+        inserts, self._inserts = self._inserts, []
+        touches, self._touches = self._touches, []
+        if inserts:
+            conn.executemany(
+                "INSERT OR REPLACE INTO fingerprint VALUES "
+                "(?, ?, ?, ?, ?, ?, ?)", inserts)
+            self._inserted += len(inserts)
+        if touches:
+            conn.executemany(
+                "UPDATE fingerprint SET last_used = ? "
+                "WHERE path = ? AND algorithm = ?", touches)
+        if self._inserted and (evict or
+                               self._inserted >= self.evict_every):
+            self._inserted = 0
+            self._evict(conn)
+        conn.commit()
+
+    def get(self, file_path, algorithm="md5"):
+        """Get the cached digest of a file.
+
+        Args:
+            file_path (str): File path.
+            algorithm (str): Hash algorithm name.
+
+        Returns:
+            str: The digest, None if missing or the file changed.
+
+        """
+        stat_key = file_stat_key(file_path)
+        if stat_key is None:
+            return None
+        path = os.path.abspath(file_path)
+        with self._lock:
+            if self._conn is not None:
+                row = self._select(self._conn, path, algorithm)
+            else:
+                with _ClosingConnection(self._connect()) as conn:
+                    row = self._select(conn, path, algorithm)
+        if row is None or tuple(row[:3]) != stat_key:
+            return None
+        self._write(touches=[(time.time(), path, algorithm)])
+        return row[3]
+
+    @staticmethod
+    def _select(conn, path, algorithm):
+        """Read the stat and the digest remembered for a file."""
+        return conn.execute(
+            "SELECT size, mtime_ns, inode, digest FROM fingerprint "
+            "WHERE path = ? AND algorithm = ?", (path, algorithm)).fetchone()
+
+    def set(self, file_path, digest, algorithm="md5", stat_key=None):
+        """Remember the digest of a file.
+
+        Args:
+            file_path (str): File path.
+            digest (str): Digest of the file.
+            algorithm (str): Hash algorithm name.
+            stat_key (tuple, optional): Stat the digest was computed for,
+                default is the current stat of the file.
+
+        """
+        stat_key = stat_key or file_stat_key(file_path)
+        if stat_key is None:
+            return
+        path = os.path.abspath(file_path)
+        self._write(inserts=[(path, algorithm) + tuple(stat_key) +
+                             (digest, time.time())])
+
+    def _evict(self, conn):
+        """Delete the least recently used entries beyond max_entries."""
+        count = conn.execute("SELECT COUNT(*) FROM fingerprint").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM fingerprint WHERE rowid IN ("
+                "SELECT rowid FROM fingerprint ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,))
+
+    def hash_file(self, file_path, algorithm="md5", hasher=None):
+        """Get the digest of a file, hashing it only on a cache miss.
+
+        Args:
+            file_path (str): File path.
+            algorithm (str): Hash algorithm name.
+            hasher (function, optional): Called as
+                ``hasher(file_path, algorithm)`` to hash the file, default
+                is ``hashing.hash_file``.
+
+        Returns:
+            str: Hex digest, None if the file can not be read.
+
+        """
+        digest = self.get(file_path, algorithm)
+        if digest is not None:
+            return digest
+        return self.refresh(file_path, algorithm, hasher)
+
+    def refresh(self, file_path, algorithm="md5", hasher=None):
+        """Hash a file and remember its digest.
+
+        Args:
+            file_path (str): File path.
+            algorithm (str): Hash algorithm name.
+            hasher (function, optional): See ``hash_file``.
+
+        Returns:
+            str: Hex digest, None if the file can not be read.
+
+        """
+        hasher = hasher or hash_file
+        stat_key = file_stat_key(file_path)
+        digest = hasher(file_path, algorithm)
+        # Only trust the digest if the file did not change while reading.
+        if (digest is not None and stat_key is not None and
+                stat_key == file_stat_key(file_path)):
+            self.set(file_path, digest, algorithm, stat_key)
+        return digest
+
+    def clear(self):
+        """Remove every fingerprint."""
+        with self._lock:
+            self._inserts, self._touches = [], []
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM fingerprint")
+                self._conn.commit()
+            else:
+                with _ClosingConnection(self._connect()) as conn:
+                    conn.execute("DELETE FROM fingerprint")
+
+
+class _ClosingConnection(object):
+    """Commit and close a sqlite connection when leaving the block."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""Hash the files of upload.json in parallel.
+
+Files are read with large reads into a reused buffer, or mapped into memory,
+and hashed on a thread pool, ``hashlib`` releases the GIL while hashing so
+the threads run in parallel.
+
+"""
+
+# Import built-in models
+import hashlib
+import mmap
+import os
+import time
+from concurrent import futures
+
+# Algorithms that can be selected by name.
+SUPPORTED_ALGORITHMS = ("md5", "sha1", "blake2b")
+
+# Size of each read, a multiple of the page size.
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+def check_algorithm(algorithm):
+    """Check that an algorithm is supported.
+
+    Args:
+        algorithm (str): Algorithm name.
+
+    Returns:
+        str: The algorithm name.
+
+    """
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        raise Exception("algorithm must be one of {}.".format(
+            ", ".join(SUPPORTED_ALGORITHMS)))
+    return algorithm
+
+
+def hash_file(file_path, algorithm="md5", buffer_size=DEFAULT_BUFFER_SIZE,
+              use_mmap=False):
+    """Hash the content of a file.
+
+    Args:
+        file_path (str): File path.
+        algorithm (str): Name of a ``hashlib`` algorithm, default is md5.
+        buffer_size (int): Size of each read.
+        use_mmap (bool): Map the file into memory instead of reading it,
+            default is False.
+
+    Returns:
+        str: Hex digest, None if the file is missing or can not be read.
+
+    """
+    file_hash = hashlib.new(algorithm)
+    try:
+        with open(file_path, 'rb') as file_path_f:
+            if use_mmap and os.fstat(file_path_f.fileno()).st_size:
+                file_map = mmap.mmap(file_path_f.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+                try:
+                    file_hash.update(file_map)
+                finally:
+                    file_map.close()
+            else:
+                buffer_data = bytearray(buffer_size)
+                buffer_view = memoryview(buffer_data)
+                while True:
+                    size = file_path_f.readinto(buffer_data)
+                    if not size:
+                        break
+                    file_hash.update(buffer_view[:size])
+    except (IOError, OSError):
+        # No digest rather than the one of no data, which would match
+        # another missing file.
+        return None
+    return file_hash.hexdigest()
+
+
+class HashEngine(object):
+    """Hash many files on a thread pool."""
+
+    def __init__(self, algorithm="md5", max_workers=4,
+                 buffer_size=DEFAULT_BUFFER_SIZE, use_mmap=False,
+                 fingerprint_cache=None):
+        """Initialize the engine.
+
+        Args:
+            algorithm (str): "md5", "sha1" or "blake2b", default is md5.
+            max_workers (int): Number of files hashed at the same time.
+            buffer_size (int): Size of each read.
+            use_mmap (bool): Map the files into memory instead of reading
+                them, default is False.
+            fingerprint_cache (FingerprintCache, optional): Cache serving
+                the hash of unchanged files.
+
+        """
+        self.algorithm = check_algorithm(algorithm)
+        self.max_workers = max_workers
+        self.buffer_size = buffer_size
+        self.use_mmap = use_mmap
+        self.fingerprint_cache = fingerprint_cache
+        self.stats = {}
+
+    def _hash(self, file_path, algorithm):
+        """Hash a file with the read settings of the engine."""
+        return hash_file(file_path, algorithm, self.buffer_size,
+                         self.use_mmap)
+
+    def _hash_one(self, file_path):
+        """Hash one file.
+
+        Returns:
+            tuple: Digest, None if the file can not be read, the number of
+                bytes read and whether the digest came from the fingerprint
+                cache.
+
+        """
+        if self.fingerprint_cache:
+            digest = self.fingerprint_cache.get(file_path, self.algorithm)
+            if digest is not None:
+                return digest, 0, True
+            digest = self.fingerprint_cache.refresh(file_path, self.algorithm,
+                                                    self._hash)
+        else:
+            digest = self._hash(file_path, self.algorithm)
+        if digest is None:
+            return None, 0, False
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0
+        return digest, size, False
+
+    def hash_files(self, paths):
+        """Hash files.
+
+        Args:
+            paths (iterable): File paths.
+
+        Returns:
+            dict: Digest by path, None for a file that can not be read.
+                ``self.stats`` is set to the throughput of the run, e.g.:
+                {
+                    "algorithm": "md5",
+                    "files": 120,
+                    "cached_files": 100,
+                    "bytes": 1048576000,
+                    "seconds": 2.0,
+                    "mb_per_second": 500.0
+                }
+
+        """
+        paths = list(_unique(paths))
+        start = time.time()
+        digests = {}
+        total_bytes = 0
+        cached_files = 0
+        if paths:
+            max_workers = max(1, min(self.max_workers, len(paths)))
+            if self.fingerprint_cache:
+                # One connection for the whole run.
+                self.fingerprint_cache.open()
+            try:
+                with futures.ThreadPoolExecutor(
+                        max_workers=max_workers) as pool:
+                    for path, (digest, size, cached) in zip(
+                            paths, pool.map(self._hash_one, paths)):
+                        digests[path] = digest
+                        total_bytes += size
+                        cached_files += cached
+            finally:
+                if self.fingerprint_cache:
+                    self.fingerprint_cache.close()
+        seconds = time.time() - start
+        self.stats = {
+            "algorithm": self.algorithm,
+            "files": len(paths),
+            "cached_files": cached_files,
+            "bytes": total_bytes,
+            "seconds": seconds,
+            "mb_per_second": (total_bytes / 1024.0 / 1024.0 / seconds
+                              if seconds else 0.0),
+        }
+        return digests
+
+    def hash_manifest(self, entries):
+        """Write ``hash`` into every upload entry.
+
+        An entry whose file can not be read gets no ``hash``, it is never
+        taken for the same file as in a previous submission.
+
+        Args:
+            entries (iterable): Entries of upload.json, each with ``local``.
+
+        Returns:
+            dict: Throughput of the run, see ``hash_files``.
+
+        """
+        entries = list(entries)
+        digests = self.hash_files(entry["local"] for entry in entries)
+        for entry in entries:
+            digest = digests[entry["local"]]
+            if digest is None:
+                entry.pop("hash", None)
+            else:
+                entry["hash"] = digest
+        return self.stats
+
+
+def _unique(items):
+    """Iterate items without duplicates, keeping their order."""
+    seen = set()
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            yield item
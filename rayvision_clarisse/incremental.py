@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Asset state of a workspace, used to re-analyse a scene incrementally.
+
+After an analysis the stat of the scene and of every uploaded asset is saved
+to ``asset_state.json`` in the workspace. A later analysis of the same scene
+given that workspace reuses its result when the scene, the projects it
+references and the settings are unchanged, and only re-checks the assets
+whose stat differs.
+
+Examples asset_state.json:
+    {
+        "scene": {
+            "path": "E:/copy/muti_layer_test.project",
+            "stat": [1024, 1581234567000000000, 42],
+            "hash": "9a0364b9e99bb480dd25e1f0284c8555"
+        },
+        "settings": {"software_version": "clarisse_ifx_4.0_sp3"},
+        "assets": {
+            "E:/copy/tex/a.exr": {"stat": [2048, 1581234567000000000, 43]}
+        }
+    }
+
+"""
+
+# Import built-in models
+import os
+import shutil
+
+from rayvision_clarisse.fingerprint import file_stat_key
+from rayvision_clarisse.json_stream import JsonStreamWriter
+from rayvision_clarisse.project_parser import reference_kind
+from rayvision_clarisse.result_cache import RESULT_FILES
+from rayvision_clarisse import utils
+
+STATE_FILE = "asset_state.json"
+
+DELTA_FILE = "delta.json"
+
+
+def load_state(workspace):
+    """Load the asset state of a workspace.
+
+    Args:
+        workspace (str): Workspace of a previous analysis.
+
+    Returns:
+        dict: The state, None if the workspace has no state.
+
+    """
+    state_path = os.path.join(workspace, STATE_FILE)
+    if not os.path.exists(state_path):
+        return None
+    try:
+        return utils.json_load(state_path)
+    except ValueError:
+        return None
+
+
+def save_state(workspace, state):
+    """Save the asset state of a workspace.
+
+    The state is written member by member, ``assets`` may be a dict or an
+    iterable of path and record pairs, e.g. ``iter_asset_records``, so the
+    records of a streamed upload.json are never all in memory.
+
+    Args:
+        workspace (str): Workspace of the analysis.
+        state (dict): ``scene``, ``settings`` and ``assets`` of the state.
+
+    """
+    with JsonStreamWriter(os.path.join(workspace, STATE_FILE)) as writer:
+        for key, value in state.items():
+            if key != "assets":
+                writer.write(key, value)
+        assets = state.get("assets", {})
+        writer.write_items("assets", assets.items()
+                           if isinstance(assets, dict) else assets)
+
+
+def stat_record(file_path, index=None):
+    """Get the stat record of a file, ``{"stat": None}`` if missing.
+
+    Args:
+        file_path (str): File path.
+        index (DirectoryIndex, optional): See ``file_stat_key``.
+
+    """
+    stat_key = file_stat_key(file_path, index)
+    return {"stat": list(stat_key) if stat_key else None}
+
+
+def changed_dependencies(previous_assets, rehash=None):
+    """Find the referenced projects changed since the previous state.
+
+    A referenced project is part of the scene, the result of a scene whose
+    references changed can not be reused. The projects are stat directly,
+    not through a ``DirectoryIndex`` which may hold an older stat.
+
+    Args:
+        previous_assets (dict): ``assets`` of the previous state.
+        rehash (function, optional): Called once with the paths of the
+            projects whose stat changed to get their hash by path, e.g.
+            ``HashEngine.hash_files``. A project with the hash of its
+            previous record is unchanged.
+
+    Returns:
+        list: Paths of the changed or missing projects.
+
+    """
+    changed = []
+    candidates = []
+    for path, previous in previous_assets.items():
+        if reference_kind(path) != "reference":
+            continue
+        record = stat_record(path)
+        if record["stat"] == previous.get("stat"):
+            continue
+        if (record["stat"] is not None and rehash is not None and
+                previous.get("hash")):
+            candidates.append(path)
+        else:
+            changed.append(path)
+    if candidates:
+        hashes = rehash(candidates)
+        changed.extend(path for path in candidates
+                       if hashes.get(path) != previous_assets[path]["hash"])
+    return changed
+
+
+def copy_result(previous_workspace, workspace):
+    """Copy the result files of a previous workspace.
+
+    Returns:
+        bool: False if a result file is missing from the previous workspace.
+
+    """
+    if os.path.abspath(previous_workspace) == os.path.abspath(workspace):
+        # A reused workspace already holds its result.
+        return all(os.path.exists(os.path.join(workspace, name))
+                   for name in RESULT_FILES)
+    for name in RESULT_FILES:
+        if not os.path.exists(os.path.join(previous_workspace, name)):
+            return False
+    for name in RESULT_FILES:
+        shutil.copyfile(os.path.join(previous_workspace, name),
+                        os.path.join(workspace, name))
+    return True
+
+
+def new_delta():
+    """Get an empty delta, see ``update_assets``."""
+    return {"added": [], "changed": [], "removed": [], "missing": [],
+            "unchanged": 0}
+
+
+def iter_asset_records(assets, previous_assets, rehash, delta, index=None,
+                       batch_size=1000):
+    """Compare assets with their previous state, a batch at a time.
+
+    Unchanged assets keep their previous record, the others are stat again
+    and, when they had a hash before, hashed again with one ``rehash`` call
+    per batch. Only a batch of records and the paths seen so far are kept
+    besides ``previous_assets``, ``delta["removed"]`` is filled once the
+    records are all yielded.
+
+    Args:
+        assets (iterable): Local path of each current asset and its hash
+            from this analysis, None if it was not hashed.
+        previous_assets (dict): ``assets`` of the previous state.
+        rehash (function): Called with a list of paths to get their new
+            hash by path, e.g. ``HashEngine.hash_files``.
+        delta (dict): Filled with the changes, see ``update_assets``.
+        index (DirectoryIndex, optional): Index the assets are stat with.
+        batch_size (int): Number of assets compared at once.
+
+    Yields:
+        tuple: Path and record of each asset.
+
+    """
+    seen = set()
+    batch = []
+    stale = []
+    assets = iter(assets)
+    while True:
+        for path, asset_hash in assets:
+            if path in seen:
+                continue
+            seen.add(path)
+            record = stat_record(path, index)
+            previous = previous_assets.get(path)
+            if record["stat"] is None:
+                delta["missing"].append(path)
+            if previous is None:
+                delta["added"].append(path)
+            elif previous.get("stat") != record["stat"]:
+                delta["changed"].append(path)
+                if (previous.get("hash") and record["stat"] is not None and
+                        not asset_hash):
+                    stale.append(path)
+            else:
+                delta["unchanged"] += 1
+                record = dict(previous)
+            if asset_hash:
+                record["hash"] = asset_hash
+            batch.append((path, record))
+            if len(batch) >= batch_size:
+                break
+        if not batch:
+            break
+        hashes = rehash(stale) if stale else {}
+        for path, record in batch:
+            if hashes.get(path):
+                record["hash"] = hashes[path]
+            yield path, record
+        batch = []
+        stale = []
+    delta["removed"] = [path for path in previous_assets
+                        if path not in seen]
+
+
+def update_assets(asset_paths, previous_assets, rehash, index=None):
+    """Compare assets with their previous state.
+
+    Args:
+        asset_paths (iterable): Local paths of the current assets.
+        previous_assets (dict): ``assets`` of the previous state.
+        rehash (function): See ``iter_asset_records``.
+        index (DirectoryIndex, optional): Index the assets are stat with.
+
+    Returns:
+        tuple: The new ``assets`` of the state and the delta, e.g.:
+            {
+                "added": ["E:/copy/tex/b.exr"],
+                "changed": ["E:/copy/tex/a.exr"],
+                "removed": [],
+                "missing": [],
+                "unchanged": 120
+            }
+
+    """
+    delta = new_delta()
+    assets = dict(iter_asset_records(((path, None) for path in asset_paths),
+                                     previous_assets, rehash, delta, index))
+    return assets, delta
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""Read and write the json documents of an analysis one item at a time.
+
+asset.json and upload.json are objects of lists, e.g. ``{"asset": [...]}``.
+For scenes with millions of files those lists do not fit comfortably in
+memory, ``iter_json_items`` reads them in chunks and yields their items one
+by one, ``JsonStreamWriter`` writes them item by item, or the members of an
+object, like the assets of ``asset_state.json``, pair by pair.
+
+"""
+
+# Import built-in models
+import io
+import json
+import os
+import threading
+
+from rayvision_clarisse.utils import json_default
+
+# Characters read from the file at once.
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\r\n"
+
+
+class _ChunkReader(object):
+    """Decode json values from a file read in chunks."""
+
+    def __init__(self, file_obj, chunk_size):
+        self.file_obj = file_obj
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        """Read the next chunk, dropping the consumed part of the buffer.
+
+        Returns:
+            bool: False at the end of the file.
+
+        """
+        data = self.file_obj.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Get the next character that is not whitespace, "" at the end."""
+        while True:
+            while (self.pos < len(self.buffer) and
+                   self.buffer[self.pos] in _WHITESPACE):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def take(self, expected):
+        """Consume the next character, one of ``expected``."""
+        char = self.peek()
+        if not char or char not in expected:
+            raise ValueError("Expecting one of {!r} at {!r}".format(
+                expected, self.buffer[self.pos:self.pos + 20]))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                # The value goes on in the next chunk.
+                if not self.fill():
+                    raise
+                continue
+            # A number may be cut by the end of the chunk.
+            if end == len(self.buffer) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_items(json_path, keys=None, chunk_size=CHUNK_SIZE,
+                    encoding="utf-8"):
+    """Iterate the items of the lists of a json object file.
+
+    Only one item is held in memory at a time.
+
+    Examples:
+        for _, asset in iter_json_items("upload.json", keys=["asset"]):
+            print(asset["local"])
+
+    Args:
+        json_path (str): Json file holding an object.
+        keys (iterable, optional): Members to read, default is all of them.
+        chunk_size (int): Characters read at once.
+        encoding (str): Encoding, default is ``utf-8``.
+
+    Yields:
+        tuple: The member name and one item of its list, a member that is
+            not a list is yielded once with its value.
+
+    Raises:
+        ValueError: The file is not a json object.
+
+    """
+    keys = set(keys) if keys is not None else None
+    with io.open(json_path, "r", encoding=encoding) as json_f:
+        reader = _ChunkReader(json_f, chunk_size)
+        reader.take("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            reader.take(":")
+            wanted = keys is None or key in keys
+            if reader.peek() == "[":
+                reader.take("[")
+                if reader.peek() == "]":
+                    reader.take("]")
+                else:
+                    while True:
+                        item = reader.value()
+                        if wanted:
+                            yield key, item
+                        if reader.take(",]") == "]":
+                            break
+            else:
+                value = reader.value()
+                if wanted:
+                    yield key, value
+            if reader.take(",}") == "}":
+                return
+
+
+class JsonStreamWriter(object):
+    """Write a json object of lists item by item.
+
+    The file is written to a temporary path and renamed over ``json_path``
+    on ``close``, a failed write leaves the previous file.
+
+    Examples:
+        with JsonStreamWriter("upload.json") as writer:
+            for entry in entries:
+                writer.append("asset", entry)
+            writer.write("scene", [scene_entry])
+
+    """
+
+    def __init__(self, json_path, encoding="utf-8"):
+        """Open the temporary file.
+
+        Args:
+            json_path (str): Target json path.
+            encoding (str): Encoding, default is ``utf-8``.
+
+        """
+        self.json_path = json_path
+        self.tmp_path = "{}.{}.{}.tmp".format(json_path, os.getpid(),
+                                              threading.get_ident())
+        self._file = io.open(self.tmp_path, "w", encoding=encoding)
+        self._file.write(u"{")
+        self._members = set()
+        self._list_key = None
+        self._list_size = 0
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _start_member(self, key):
+        """Write the name of a new member."""
+        if key in self._members:
+            raise Exception("{} is already written.".format(key))
+        self._end_list()
+        self._file.write(u"\n" if not self._members else u",\n")
+        self._file.write(json.dumps(key) + u": ")
+        self._members.add(key)
+
+    def _end_list(self):
+        """Close the list being written."""
+        if self._list_key is not None:
+            self._file.write(u"\n]" if self._list_size else u"]")
+            self._list_key = None
+
+    def write(self, key, value):
+        """Write a whole member."""
+        self._start_member(key)
+        self._file.write(json.dumps(value, ensure_ascii=False,
+                                    default=json_default))
+
+    def extend(self, key, items):
+        """Append items to the list of a member.
+
+        The items of a member must be written one after the other, the list
+        is created even if ``items`` is empty.
+
+        """
+        if self._list_key != key:
+            self._start_member(key)
+            self._file.write(u"[")
+            self._list_key = key
+            self._list_size = 0
+        for item in items:
+            self._file.write(u"\n" if not self._list_size else u",\n")
+            self._file.write(json.dumps(item, ensure_ascii=False,
+                                        default=json_default))
+            self._list_size += 1
+            self.count += 1
+
+    def append(self, key, item):
+        """Append one item to the list of a member."""
+        self.extend(key, (item,))
+
+    def write_items(self, key, items):
+        """Write a member holding an object, one name and value at a time.
+
+        Args:
+            key (str): Member name.
+            items (iterable): Name and value pairs of the object.
+
+        """
+        self._start_member(key)
+        self._file.write(u"{")
+        size = 0
+        for name, value in items:
+            self._file.write(u"\n" if not size else u",\n")
+            self._file.write(json.dumps(name) + u": ")
+            self._file.write(json.dumps(value, ensure_ascii=False,
+                                        default=json_default))
+            size += 1
+        self._file.write(u"\n}" if size else u"}")
+
+    def close(self):
+        """Finish the object and move it to ``json_path``."""
+        self._end_list()
+        self._file.write(u"\n}\n")
+        self._file.close()
+        os.replace(self.tmp_path, self.json_path)
+
+    def abort(self):
+        """Drop the file being written."""
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""Build the asset list of upload.json without duplicates.
+
+Entries are indexed by their normalized local path, so paths differing only
+by slash direction or drive letter case are the same entry. The first added
+entry keeps its place, later duplicates only fill in keys it lacks.
+
+The dict entries added are kept as they are, not copied, and completed in
+place, so a manifest built from the loaded upload.json holds no second copy
+of its entries. Sequence records, see ``sequence``, are expanded when read.
+
+"""
+
+# Import built-in models
+import itertools
+import os
+
+from rayvision_clarisse.asset_table import normalize_local_path
+from rayvision_clarisse.dir_index import DirectoryIndex
+from rayvision_clarisse.json_stream import iter_json_items
+from rayvision_clarisse.json_stream import JsonStreamWriter
+from rayvision_clarisse.sequence import collapse_entries
+from rayvision_clarisse.sequence import is_record
+from rayvision_clarisse.sequence import iter_expanded
+from rayvision_clarisse.utils import PathMapper
+from rayvision_clarisse.validate import validate_files
+from rayvision_clarisse import utils
+
+
+class UploadManifest(object):
+    """Ordered, deduplicated asset entries of upload.json."""
+
+    def __init__(self, entries=None, path_mapper=None):
+        """Initialize the manifest.
+
+        Args:
+            entries (list, optional): Entries of upload.json, each a dict
+                with at least ``local``.
+            path_mapper (PathMapper, optional): Converts the local path of
+                an entry without ``server``, default converts like
+                ``convert_path``.
+
+        """
+        self.path_mapper = path_mapper or PathMapper()
+        # Entries by normalized local path, in the order they were added.
+        self._entries = {}
+        for entry in entries or []:
+            self.add_entry(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def __contains__(self, local):
+        return normalize_local_path(local) in self._entries
+
+    def get(self, local):
+        """Get the entry of a local path, None if not in the manifest."""
+        return self._entries.get(normalize_local_path(local))
+
+    def add_entry(self, entry):
+        """Add an upload entry, merging it into an existing one.
+
+        Args:
+            entry (dict): Entry with ``local`` and optional ``server``,
+                ``size`` or any other key. A new dict entry is kept and
+                completed in place.
+
+        Returns:
+            dict: The entry kept in the manifest.
+
+        """
+        local = entry["local"]
+        key = normalize_local_path(local)
+        current = self._entries.get(key)
+        if current is None:
+            if not isinstance(entry, dict):
+                entry = dict(entry.items())
+            if "\\" in local:
+                local = entry["local"] = local.replace("\\", "/")
+            if key == local:
+                # Share the path string with the entry.
+                key = local
+            if not entry.get("server"):
+                entry["server"] = self.path_mapper.to_server(local)
+            self._entries[key] = entry
+            return entry
+        for name, value in entry.items():
+            if current.get(name) in (None, "") and value not in (None, ""):
+                current[name] = value
+        return current
+
+    def add(self, local, server=None, size=None):
+        """Add a local file.
+
+        Args:
+            local (str): Local path.
+            server (str, optional): Server path, default is converted from
+                the local path.
+            size (int, optional): File size in bytes.
+
+        Returns:
+            dict: The entry kept in the manifest.
+
+        """
+        entry = {"local": local, "server": server}
+        if size is not None:
+            entry["size"] = size
+        return self.add_entry(entry)
+
+    def remap_servers(self):
+        """Set the server path of every entry from the path mapper."""
+        servers = self.path_mapper.to_server_list(
+            entry["local"] for entry in self)
+        for entry, server in zip(self, servers):
+            entry["server"] = server
+
+    def fill_sizes(self, max_workers=16, index=None, chunk_size=10000):
+        """Set ``size`` on the entries lacking it, for existing files.
+
+        The files are checked ``chunk_size`` at a time, the index is shared
+        by the chunks so a folder is listed once.
+
+        Args:
+            max_workers (int): Number of folders listed at the same time.
+            index (DirectoryIndex, optional): See ``validate_files``.
+            chunk_size (int): Number of files checked at once.
+
+        """
+        index = index or DirectoryIndex()
+        entries = (entry for entry in self if entry.get("size") is None)
+        while True:
+            chunk = list(itertools.islice(entries, chunk_size))
+            if not chunk:
+                break
+            sizes = validate_files([entry["local"] for entry in chunk],
+                                   max_workers, index).sizes
+            for entry in chunk:
+                size = sizes.get(entry["local"])
+                if size is not None:
+                    entry["size"] = size
+
+    def to_list(self):
+        """Get the entries as the ``asset`` list of upload.json."""
+        return list(self._entries.values())
+
+
+def _add_hash_stats(total, stats):
+    """Add the throughput of one ``HashEngine`` run to a total."""
+    for name in ("files", "cached_files", "bytes", "seconds"):
+        total[name] = total.get(name, 0) + stats[name]
+    total["algorithm"] = stats["algorithm"]
+    total["mb_per_second"] = (total["bytes"] / 1024.0 / 1024.0 /
+                              total["seconds"] if total["seconds"] else 0.0)
+
+
+def stream_upload(source_path, target_path, path_mapper=None,
+                  extra_paths=(), scene_entries=None, hash_engine=None,
+                  chunk_size=10000, max_workers=16, index=None,
+                  collapse=False):
+    """Gather upload.json one chunk of entries at a time.
+
+    Same result as ``UploadManifest`` for the ``asset`` list, but only one
+    chunk of entries and the normalized paths seen so far are in memory. A
+    later duplicate of an entry is dropped instead of merged.
+
+    Args:
+        source_path (str): upload.json written by the analyzer, may be
+            missing.
+        target_path (str): upload.json to write, may be ``source_path``.
+        path_mapper (PathMapper, optional): See ``UploadManifest``.
+        extra_paths (iterable): Local paths added after the analyzer ones.
+        scene_entries (list, optional): ``scene`` list of upload.json.
+        hash_engine (HashEngine, optional): Hash every entry.
+        chunk_size (int): Number of entries processed at once.
+        max_workers (int): Number of folders listed at the same time.
+        index (DirectoryIndex, optional): See ``validate_files``, shared by
+            the chunks so a folder is listed once.
+        collapse (bool): Write the sequences of each chunk as records, see
+            ``sequence.collapse_entries``, default is False.
+
+    Returns:
+        tuple: Number of asset entries or records written and the hash
+            throughput, empty without ``hash_engine``, see
+            ``HashEngine.hash_files``.
+
+    """
+    path_mapper = path_mapper or PathMapper()
+    entries = itertools.chain(
+        iter_expanded(entry for _, entry in iter_json_items(
+            source_path, keys=["asset"]))
+        if os.path.exists(source_path) else (),
+        ({"local": path} for path in extra_paths))
+    seen = set()
+    hash_stats = {}
+    index = index or DirectoryIndex()
+
+    def write_chunk(chunk):
+        if path_mapper.rules:
+            chunk.remap_servers()
+        chunk.fill_sizes(max_workers, index)
+        if hash_engine:
+            _add_hash_stats(hash_stats, hash_engine.hash_manifest(chunk))
+        writer.extend("asset", collapse_entries(chunk) if collapse
+                      else chunk)
+
+    with JsonStreamWriter(target_path) as writer:
+        writer.extend("asset", ())
+        chunk = UploadManifest(path_mapper=path_mapper)
+        for entry in entries:
+            key = normalize_local_path(entry["local"])
+            if key in seen:
+                continue
+            seen.add(key)
+            chunk.add_entry(entry)
+            if len(chunk) >= chunk_size:
+                write_chunk(chunk)
+                chunk = UploadManifest(path_mapper=path_mapper)
+        write_chunk(chunk)
+        if scene_entries is not None:
+            writer.write("scene", scene_entries)
+    return writer.count, hash_stats
+
+
+def append_to_upload(files_paths, upload_path):
+    """Add files to upload.json, skipping the ones already listed.
+
+    Drop-in replacement of ``rayvision_api.utils.append_to_upload`` going
+    through ``UploadManifest``.
+
+    Args:
+        files_paths (str or list): Paths of the files to upload.
+        upload_path (str): Upload json path.
+
+    """
+    if not os.path.exists(upload_path):
+        raise Exception("{} is not found".format(upload_path))
+    try:
+        upload_info = utils.json_load(upload_path)
+    except ValueError:
+        # Reset a broken upload.json.
+        upload_info = {"asset": []}
+    if not isinstance(files_paths, list):
+        files_paths = [files_paths]
+    entries = upload_info.get("asset", [])
+    collapse = any(is_record(entry) for entry in entries)
+    manifest = UploadManifest(iter_expanded(entries))
+    for files_path in files_paths:
+        if not os.path.exists(files_path):
+            raise Exception("{} is not found".format(files_path))
+        manifest.add(files_path)
+    upload_info["asset"] = (collapse_entries(manifest) if collapse
+                            else manifest.to_list())
+    utils.json_save(upload_path, upload_info)
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""Measure the time and resources used by the phases of an analysis.
+
+Each phase records its wall time and the cpu time of the thread running
+it, so the phases of analyses run in other threads of the process, e.g.
+``analyse_batch``, are not counted in it. The counters only the whole
+process has, its cpu time, the bytes read and written and the peak memory,
+are recorded once for the whole analysis, under ``process`` in ``total``,
+and include the work of the other threads. The cpu time and peak memory of
+the analyzer are the ones of its own process, read when it exits::
+
+    {
+        "phases": {
+            "write_task_json": {"wall": 0.002, "cpu": 0.002, ...},
+            "analyze": {"wall": 12.4, "cpu": 0.3, "analyzer_cpu": 11.8,
+                        ...}
+        },
+        "total": {"wall": 14.1, "analyzer_cpu": 11.8, ...,
+                  "process": {"cpu": 2.1, "read_bytes": 40960,
+                              "write_bytes": 1024, "peak_rss": 52428800}}
+    }
+
+Phases can be nested, e.g. ``load_json`` is counted in the phase loading a
+document too. The byte counters come from ``/proc/self/io`` or ``psutil``
+and the memory from ``resource`` or ``psutil``, a value that cannot be
+measured on the platform, or the analyzer usage of an analysis run in a
+worker, is None.
+
+"""
+
+# Import built-in models
+import collections
+import contextlib
+import logging
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Windows.
+    resource = None
+
+# File of the metrics of the last analysis in the workspace.
+STATS_FILE = "stats.json"
+
+# Bytes of a unit of ``ru_maxrss``.
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+Sample = collections.namedtuple("Sample", ["wall", "cpu"])
+
+ProcessSample = collections.namedtuple("ProcessSample", [
+    "cpu", "read_bytes", "write_bytes", "peak_rss"])
+
+
+def _psutil_process():
+    """Get the ``psutil.Process`` of this process, None if not installed."""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process()
+
+
+def read_io_counters():
+    """Get the bytes read and written by the process so far.
+
+    Returns:
+        tuple: Bytes read and bytes written, None when unknown.
+
+    """
+    try:
+        with open("/proc/self/io", "rb") as io_f:
+            counters = dict(line.split(b":", 1) for line in io_f
+                            if b":" in line)
+        return int(counters[b"rchar"]), int(counters[b"wchar"])
+    except (IOError, OSError, KeyError, ValueError):
+        pass
+    process = _psutil_process()
+    try:
+        counters = process.io_counters()
+    except Exception:  # pylint: disable=broad-except
+        # Not installed or not supported by the platform.
+        return None, None
+    return counters.read_bytes, counters.write_bytes
+
+
+def read_peak_rss():
+    """Get the peak resident memory of the process since it started.
+
+    Returns:
+        int: Bytes, None when unknown.
+
+    """
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+    process = _psutil_process()
+    try:
+        return process.memory_info().peak_wset
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def child_usage(rusage):
+    """Get the usage of one ended child process from its ``rusage``.
+
+    Args:
+        rusage (resource.struct_rusage): Usage returned by ``os.wait4``.
+
+    Returns:
+        dict: ``cpu`` seconds and ``peak_rss`` bytes of the child and of the
+            processes it waited for.
+
+    """
+    return {"cpu": rusage.ru_utime + rusage.ru_stime,
+            "peak_rss": rusage.ru_maxrss * _RSS_UNIT}
+
+
+def sample():
+    """Read the clock and the cpu time of the calling thread.
+
+    Returns:
+        Sample: Current values of the counters.
+
+    """
+    return Sample(time.perf_counter(), time.thread_time())
+
+
+def sample_process():
+    """Read the counters of the whole process.
+
+    Returns:
+        ProcessSample: Current values of the counters.
+
+    """
+    read_bytes, write_bytes = read_io_counters()
+    return ProcessSample(time.process_time(), read_bytes, write_bytes,
+                         read_peak_rss())
+
+
+def _delta(start, end):
+    """Get ``end - start``, None if one is unknown."""
+    if start is None or end is None:
+        return None
+    return end - start
+
+
+def make_record(start, end, analyzer=None):
+    """Get the record of a phase from the samples around it.
+
+    Args:
+        start (Sample): Counters at the start of the phase.
+        end (Sample): Counters at the end of the phase.
+        analyzer (dict, optional): Usage of the analyzer runs ended during
+            the phase, see ``child_usage``.
+
+    Returns:
+        dict: Seconds and memory used by the phase, see the module
+            documentation.
+
+    """
+    analyzer = analyzer or {}
+    return {
+        "wall": end.wall - start.wall,
+        "cpu": end.cpu - start.cpu,
+        "analyzer_cpu": analyzer.get("cpu"),
+        "analyzer_peak_rss": analyzer.get("peak_rss"),
+        "calls": 1,
+    }
+
+
+def make_process_record(start, end):
+    """Get what the whole process used between two samples.
+
+    Args:
+        start (ProcessSample): Counters at the start.
+        end (ProcessSample): Counters at the end.
+
+    Returns:
+        dict: ``cpu`` seconds, ``read_bytes`` and ``write_bytes`` of the
+            process meanwhile and its ``peak_rss`` since it started.
+
+    """
+    return {
+        "cpu": end.cpu - start.cpu,
+        "read_bytes": _delta(start.read_bytes, end.read_bytes),
+        "write_bytes": _delta(start.write_bytes, end.write_bytes),
+        "peak_rss": end.peak_rss,
+    }
+
+
+def merge_record(record, other):
+    """Add the record of another run of a phase to a record."""
+    for key in ("wall", "cpu", "analyzer_cpu", "calls"):
+        if record[key] is None or other[key] is None:
+            record[key] = record[key] if other[key] is None else other[key]
+        else:
+            record[key] += other[key]
+    record["analyzer_peak_rss"] = max(
+        value for value in (record["analyzer_peak_rss"],
+                            other["analyzer_peak_rss"], 0)
+        if value is not None) or None
+    return record
+
+
+def _add_usage(total, usage):
+    """Add the usage of a child to the usage of a phase."""
+    total["cpu"] = total.get("cpu", 0.0) + usage["cpu"]
+    total["peak_rss"] = max(total.get("peak_rss", 0), usage["peak_rss"])
+
+
+class PhaseMetrics(object):
+    """Record the resources used by the phases of an analysis.
+
+    Examples:
+        recorder = PhaseMetrics(hook=lambda phase, record: print(phase))
+        with recorder.total():
+            with recorder.phase("analyze"):
+                run_analyzer()
+        recorder.metrics["phases"]["analyze"]["wall"]
+
+    """
+
+    def __init__(self, hook=None):
+        """Initialize the recorder.
+
+        Args:
+            hook (function, optional): Called as ``hook(phase, record)``
+                after each phase with the record of that run, and as
+                ``hook("total", record)`` at the end of ``total``, e.g. to
+                push them to a metrics backend.
+
+        """
+        self.hook = hook
+        self.metrics = {}
+        # Analyzer usage of each phase being measured, innermost last.
+        self._open = []
+        self.reset()
+
+    def reset(self):
+        """Drop the recorded phases."""
+        self.metrics.clear()
+        self.metrics.update({"phases": collections.OrderedDict(),
+                             "total": None})
+
+    def _call_hook(self, name, record):
+        """Pass a record to the hook, a failing hook is only logged."""
+        if not self.hook:
+            return
+        try:
+            self.hook(name, record)
+        except Exception:  # pylint: disable=broad-except
+            logging.getLogger(__name__).warning(
+                "metrics hook failed on %s", name, exc_info=True)
+
+    def _close(self, analyzer):
+        """Stop adding analyzer usage to a phase that ended."""
+        self._open = [item for item in self._open if item is not analyzer]
+
+    def add_analyzer_usage(self, usage):
+        """Add the usage of an ended analyzer to the phases being measured.
+
+        Args:
+            usage (dict): See ``child_usage``.
+
+        """
+        for analyzer in self._open:
+            _add_usage(analyzer, usage)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Measure a phase, the runs of a phase are added up.
+
+        The phase must start and end in the same thread, its cpu time is the
+        one of that thread.
+
+        Args:
+            name (str): Name of the phase.
+
+        """
+        analyzer = {}
+        self._open.append(analyzer)
+        start = sample()
+        try:
+            yield
+        finally:
+            self._close(analyzer)
+            record = make_record(start, sample(), analyzer)
+            phases = self.metrics["phases"]
+            if name in phases:
+                merge_record(phases[name], dict(record))
+            else:
+                phases[name] = dict(record)
+            self._call_hook(name, record)
+
+    @contextlib.contextmanager
+    def total(self):
+        """Measure the whole analysis into ``metrics["total"]``.
+
+        The phases may run in other threads, the cpu time of the analysis
+        is only recorded as the one of the whole process, in ``process``.
+
+        """
+        analyzer = {}
+        self._open.append(analyzer)
+        start = sample()
+        start_process = sample_process()
+        try:
+            yield
+        finally:
+            self._close(analyzer)
+            record = make_record(start, sample(), analyzer)
+            del record["cpu"]
+            record["process"] = make_process_record(start_process,
+                                                    sample_process())
+            self.metrics["total"] = record
+            self._call_hook("total", record)
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""Extract the files referenced by a Clarisse project without Clarisse.
+
+A Clarisse ``.project`` file is text made of nested blocks and attribute
+lines, e.g.::
+
+    #Isotropix_Serial_Version 1.2
+    Context "scene" {
+        TextureMapFile "diffuse" {
+            filename "$PDIR/textures/diffuse.<UDIM>.tx"
+        }
+        GeometryBundleAlembic "character" {
+            filename "D:/cache/character.abc"
+        }
+    }
+
+The file is read line by line, only the stack of open blocks is kept in
+memory, so the size of the project does not matter.
+
+"""
+
+# Import built-in models
+import codecs
+import collections
+import glob
+import os
+import re
+
+from rayvision_clarisse.constants import ASSET_EXTENSIONS
+from rayvision_clarisse.constants import CACHE_EXTENSIONS
+from rayvision_clarisse.constants import PROJECT_EXTENSIONS
+from rayvision_clarisse.constants import PROJECT_PATH_ATTRIBUTES
+
+AssetReference = collections.namedtuple(
+    "AssetReference",
+    ["path", "kind", "attribute", "object_type", "object_name", "project",
+     "line_no"])
+
+_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|([{}])|([^\s{}"]+)')
+_ESCAPE_RE = re.compile(r'\\(.)')
+_SEQUENCE_TOKEN_RE = re.compile(r"<UDIM>|<UVTILE>|%0?(\d*)d|#+")
+
+
+def tokenize_line(line):
+    """Split a project line into tokens.
+
+    Args:
+        line (str): One line of the project.
+
+    Returns:
+        list: ``(value, is_string)`` tuples, braces are not strings.
+
+    """
+    if line.lstrip().startswith("#"):
+        return []
+    tokens = []
+    for string, brace, word in _TOKEN_RE.findall(line):
+        if brace:
+            tokens.append((brace, False))
+        elif word:
+            tokens.append((word, False))
+        else:
+            tokens.append((_ESCAPE_RE.sub(r"\1", string), True))
+    return tokens
+
+
+def reference_kind(path):
+    """Get the kind of a referenced file from its extension.
+
+    Returns:
+        str: "reference", "cache" or "texture".
+
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PROJECT_EXTENSIONS:
+        return "reference"
+    if extension in CACHE_EXTENSIONS:
+        return "cache"
+    return "texture"
+
+
+def resolve_path(value, project_dir):
+    """Resolve a path value of a project to a local path.
+
+    ``$PDIR`` is the folder of the project, other variables come from the
+    environment, relative paths are relative to the project.
+
+    Args:
+        value (str): Path value of an attribute.
+        project_dir (str): Folder of the project holding the value.
+
+    Returns:
+        str: Local path with forward slashes.
+
+    """
+    path = value.replace("$PDIR", project_dir.replace("\\", "/"))
+    path = os.path.expandvars(path).replace("\\", "/")
+    if not (re.match(r"^[a-zA-Z]:/", path) or path.startswith("/")):
+        path = os.path.join(project_dir, path).replace("\\", "/")
+    return path
+
+
+def _sequence_token_regex(match):
+    """Get the regex of the numbers a sequence token stands for."""
+    token = match.group(0)
+    if token == "<UDIM>":
+        return r"\d{4}"
+    if token == "<UVTILE>":
+        return r"u\d+_v\d+"
+    if token.startswith("%"):
+        return r"-?\d{%d,}" % int(match.group(1) or 1)
+    return r"-?\d{%d,}" % len(token)
+
+
+def is_sequence_path(path):
+    """Tell whether a path stands for a sequence of numbered files."""
+    return _SEQUENCE_TOKEN_RE.search(path) is not None
+
+
+def _sequence_patterns(path):
+    """Get the glob pattern and the regex of the files of a sequence path.
+
+    Returns:
+        tuple: Glob pattern and compiled regex, None if ``path`` is not a
+            sequence.
+
+    """
+    glob_parts = []
+    regex_parts = []
+    last = 0
+    for match in _SEQUENCE_TOKEN_RE.finditer(path):
+        literal = path[last:match.start()]
+        glob_parts.extend([glob.escape(literal), "*"])
+        regex_parts.extend([re.escape(literal), _sequence_token_regex(match)])
+        last = match.end()
+    if not regex_parts:
+        return None
+    glob_parts.append(glob.escape(path[last:]))
+    regex_parts.append(re.escape(path[last:]) + "$")
+    return "".join(glob_parts), re.compile("".join(regex_parts))
+
+
+def expand_sequence(path, index=None):
+    """Get the files matching a path that may be a sequence.
+
+    ``<UDIM>``, ``<UVTILE>``, ``#`` runs and printf style ``%04d`` stand for
+    numbers.
+
+    Args:
+        path (str): Local path.
+        index (DirectoryIndex, optional): Index listing the folder of the
+            sequence, the sequences of a folder share one listing.
+
+    Returns:
+        list: Existing files, sorted.
+
+    """
+    patterns = _sequence_patterns(path)
+    if patterns is None:
+        is_file = index.isfile if index is not None else os.path.isfile
+        return [path] if is_file(path) else []
+    folder, name = os.path.split(path)
+    if index is None or is_sequence_path(folder):
+        glob_pattern, number_re = patterns
+        matches = (match.replace("\\", "/")
+                   for match in glob.glob(glob_pattern))
+        return sorted(match for match in matches if number_re.match(match))
+    name_re = _sequence_patterns(name)[1]
+    try:
+        entries = index.list_folder(folder)
+    except OSError:
+        return []
+    return sorted(os.path.join(folder, entry.name).replace("\\", "/")
+                  for entry in entries.values()
+                  # Like glob, a leading ``*`` skips hidden files.
+                  if name_re.match(entry.name) and not (
+                      entry.name.startswith(".") and
+                      not name.startswith(".")))
+
+
+def _is_asset_value(attribute, value):
+    """Tell whether an attribute value is a referenced file."""
+    if not value or value.startswith("project:/"):
+        return False
+    if attribute in PROJECT_PATH_ATTRIBUTES:
+        return True
+    return os.path.splitext(value)[1].lower() in ASSET_EXTENSIONS
+
+
+def iter_project_references(project_path, encoding="utf-8"):
+    """Iterate the files referenced by one project file.
+
+    Args:
+        project_path (str): Path of the ``.project`` file.
+        encoding (str): Encoding of the project, default is utf-8.
+
+    Yields:
+        AssetReference: One referenced file.
+
+    """
+    project_dir = os.path.dirname(os.path.abspath(project_path))
+    # Open blocks, (type, name).
+    stack = []
+    with codecs.open(project_path, "r", encoding=encoding,
+                     errors="replace") as project_f:
+        for line_no, line in enumerate(project_f, 1):
+            tokens = tokenize_line(line)
+            if not tokens:
+                continue
+            attribute = None
+            # Strings before a brace name the block, they are not values.
+            header_end = next((index for index, token in enumerate(tokens)
+                               if token == ("{", False)), -1)
+            for index, (value, is_string) in enumerate(tokens):
+                if not is_string and value == "{":
+                    words = [token for token, _ in tokens[:index]]
+                    stack.append((words[0] if words else None,
+                                  words[1] if len(words) > 1 else None))
+                    attribute = None
+                elif not is_string and value == "}":
+                    if stack:
+                        stack.pop()
+                elif index == 0 and not is_string:
+                    attribute = value
+                elif is_string and index > header_end:
+                    # A bare value inside a list block belongs to the block.
+                    name = attribute or (stack[-1][0] if stack else None)
+                    if not _is_asset_value(name, value):
+                        continue
+                    path = resolve_path(value, project_dir)
+                    object_type, object_name = (stack[-1] if stack
+                                                else (None, None))
+                    yield AssetReference(path, reference_kind(path), name,
+                                         object_type, object_name,
+                                         project_path, line_no)
+
+
+def iter_references(project_path, follow_references=True,
+                    encoding="utf-8", index=None):
+    """Iterate the files referenced by a project and its references.
+
+    Args:
+        project_path (str): Path of the ``.project`` file.
+        follow_references (bool): Parse referenced projects too, default is
+            True.
+        encoding (str): Encoding of the projects, default is utf-8.
+        index (DirectoryIndex, optional): Index telling whether the
+            referenced projects exist.
+
+    Yields:
+        AssetReference: One referenced file, each path is yielded once.
+
+    """
+    is_file = index.isfile if index is not None else os.path.isfile
+    seen = set()
+    pending = [project_path]
+    parsed = set([os.path.normcase(os.path.abspath(project_path))])
+    while pending:
+        current = pending.pop(0)
+        for reference in iter_project_references(current, encoding):
+            key = os.path.normcase(reference.path)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield reference
+            if (follow_references and reference.kind == "reference" and
+                    is_file(reference.path)):
+                project_key = os.path.normcase(
+                    os.path.abspath(reference.path))
+                if project_key not in parsed:
+                    parsed.add(project_key)
+                    pending.append(reference.path)
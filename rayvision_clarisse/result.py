@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""In-memory model of the json files of an analysis.
+
+``task.json``, ``asset.json``, ``tips.json`` and ``upload.json`` are loaded
+once, on first access, and changed in memory. ``flush`` writes only the
+documents changed since they were loaded, each to a temporary file renamed
+over the target, so a reader never sees a half written file.
+
+``orjson`` or ``ujson`` is used to encode and decode when installed.
+
+"""
+
+# Import built-in models
+import json
+import os
+import threading
+
+from rayvision_clarisse.utils import json_default
+
+# Documents of an analysis, saved as ``<name>.json`` in the workspace.
+DOCUMENTS = ("task", "asset", "tips", "upload")
+
+_backend = None
+
+
+def json_backend():
+    """Get the fastest json module installed.
+
+    Returns:
+        tuple: Name of the module, its ``dumps`` to bytes and its ``loads``.
+
+    """
+    global _backend  # pylint: disable=global-statement
+    if _backend is not None:
+        return _backend
+    try:
+        import orjson
+        _backend = ("orjson",
+                    lambda data: orjson.dumps(data, default=json_default,
+                                              option=orjson.OPT_INDENT_2),
+                    orjson.loads)
+    except ImportError:
+        try:
+            import ujson
+            _backend = ("ujson",
+                        lambda data: ujson.dumps(
+                            data, ensure_ascii=False, indent=2,
+                            default=json_default).encode("utf-8"),
+                        ujson.loads)
+        except ImportError:
+            _backend = ("json",
+                        lambda data: json.dumps(
+                            data, ensure_ascii=False, indent=2,
+                            default=json_default).encode("utf-8"),
+                        lambda data: json.loads(data.decode("utf-8")))
+    return _backend
+
+
+def atomic_write(file_path, data):
+    """Write bytes to a file through a temporary file and a rename.
+
+    Args:
+        file_path (str): Target path.
+        data (bytes): Content of the file.
+
+    """
+    tmp_path = "{}.{}.{}.tmp".format(file_path, os.getpid(),
+                                     threading.get_ident())
+    try:
+        with open(tmp_path, "wb") as tmp_f:
+            tmp_f.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def json_dump_atomic(file_path, data):
+    """Save data to a json file atomically."""
+    atomic_write(file_path, json_backend()[1](data))
+
+
+def json_load_bytes(file_path):
+    """Load a json file with the fastest json module installed."""
+    with open(file_path, "rb") as json_f:
+        return json_backend()[2](json_f.read())
+
+
+class AnalysisResult(object):
+    """Task, asset, tips and upload documents of an analysis workspace."""
+
+    def __init__(self, workspace):
+        """Initialize the model, nothing is read before first access.
+
+        Args:
+            workspace (str): Workspace holding the json files.
+
+        """
+        self.workspace = workspace
+        self._documents = {}
+        self._dirty = set()
+        # PhaseMetrics measuring the loads as ``load_json``, optional.
+        self.recorder = None
+
+    def path(self, name):
+        """Get the path of a document, e.g. ``<workspace>/task.json``."""
+        return os.path.join(self.workspace, name + ".json")
+
+    def _read(self, name):
+        """Read a document from disk, empty if the file does not exist."""
+        file_path = self.path(name)
+        if not os.path.exists(file_path):
+            return {}
+        return json_load_bytes(file_path)
+
+    def get(self, name):
+        """Get a document, loading it on first access.
+
+        Args:
+            name (str): "task", "asset", "tips" or "upload".
+
+        Returns:
+            dict: The document, changes to it must be followed by
+                ``mark_dirty``.
+
+        """
+        document = self._documents.get(name)
+        if document is None:
+            if self.recorder is not None:
+                with self.recorder.phase("load_json"):
+                    document = self._read(name)
+            else:
+                document = self._read(name)
+            self._documents[name] = document
+        return document
+
+    def is_loaded(self, name):
+        """Tell whether a document is in memory."""
+        return name in self._documents
+
+    def set(self, name, document):
+        """Replace a document and mark it changed."""
+        self._documents[name] = document
+        self._dirty.add(name)
+
+    def mark_dirty(self, name):
+        """Mark a document changed in memory."""
+        self.get(name)
+        self._dirty.add(name)
+
+    def is_dirty(self, name):
+        """Tell whether a document has changes not flushed yet."""
+        return name in self._dirty
+
+    def sync_from_disk(self, names=DOCUMENTS):
+        """Take in the files written by another process, the analyzer.
+
+        Unchanged documents are dropped and read again on next access. A
+        changed document is merged into the file content key by key, the
+        in-memory values winning.
+
+        Args:
+            names (iterable): Documents to sync, default is all of them.
+
+        """
+        for name in names:
+            if name in self._dirty:
+                document = self._read(name)
+                document.update(self._documents[name])
+                self._documents[name] = document
+            else:
+                self._documents.pop(name, None)
+
+    def flush(self, names=DOCUMENTS):
+        """Write the changed documents.
+
+        Args:
+            names (iterable): Documents to write if changed, default is all
+                of them.
+
+        Returns:
+            list: Names of the written documents.
+
+        """
+        written = []
+        for name in names:
+            if name not in self._dirty:
+                continue
+            if not os.path.exists(self.workspace):
+                os.makedirs(self.workspace)
+            json_dump_atomic(self.path(name), self._documents[name])
+            self._dirty.discard(name)
+            written.append(name)
+        return written
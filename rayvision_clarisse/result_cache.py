@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""Content addressed cache of analysis results.
+
+An entry holds the task.json, asset.json, tips.json and, when the analyzer
+wrote it, upload.json of one scene. The key is derived from the content of the
+scene and of the analyzer binary plus the analysis settings, so any change
+of those gives a new key. The assets referenced by the scene are recorded
+with their stat when the entry is stored, an entry whose assets changed
+since is treated as a miss.
+
+Layout of the cache folder::
+
+    <cache_dir>/<key[:2]>/<key>/task.json
+                               /asset.json
+                               /tips.json
+                               /upload.json
+                               /meta.json
+
+"""
+
+# Import built-in models
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+from rayvision_clarisse.fingerprint import file_stat_key
+from rayvision_clarisse.sequence import iter_expanded
+from rayvision_clarisse import utils
+
+# Files of a workspace kept in a cache entry.
+RESULT_FILES = ("task.json", "asset.json", "tips.json", "upload.json")
+
+# Result files an entry may lack.
+OPTIONAL_FILES = ("upload.json",)
+
+META_FILE = "meta.json"
+
+_ABS_PATH_RE = re.compile(r"^(?:[a-zA-Z]:[\\/]|[\\/])[^\n]+\.[\w#<>%$]+$")
+
+
+def iter_referenced_paths(asset_info, upload_info):
+    """Iterate the local asset paths referenced by an analysis result.
+
+    Args:
+        asset_info (dict): Content of asset.json, every string value that is
+            an absolute file path is taken.
+        upload_info (dict): Content of upload.json, the ``local`` value of
+            every ``asset`` entry is taken, sequence records are expanded.
+
+    Yields:
+        str: Asset path, without duplicates.
+
+    """
+    seen = set()
+    for entry in iter_expanded((upload_info or {}).get("asset", [])):
+        local = entry.get("local")
+        if local and local not in seen:
+            seen.add(local)
+            yield local
+    stack = [asset_info]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif (isinstance(value, str) and value not in seen and
+              _ABS_PATH_RE.match(value)):
+            seen.add(value)
+            yield value
+
+
+class ResultCache(object):
+    """Store analysis results keyed by scene, analyzer and settings."""
+
+    def __init__(self, cache_dir, max_entries=1000):
+        """Initialize the cache.
+
+        Args:
+            cache_dir (str): Folder of the cache, created on first store.
+            max_entries (int): Number of entries kept, the least recently
+                used are removed first.
+
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(scene_digest, analyzer_digest, software_version,
+                 plugin_config, **settings):
+        """Make the key of an analysis.
+
+        Args:
+            scene_digest (str): Digest of the scene file.
+            analyzer_digest (str): Digest of the analyzer binary.
+            software_version (str): Software version.
+            plugin_config (dict): Plugin information.
+            **settings: Any other value the result depends on.
+
+        Returns:
+            str: Hex key.
+
+        """
+        key_info = {
+            "scene": scene_digest,
+            "analyzer": analyzer_digest,
+            "software_version": software_version,
+            "plugin_config": plugin_config,
+            "settings": settings,
+        }
+        key_data = json.dumps(key_info, sort_keys=True).encode("utf-8")
+        return hashlib.sha1(key_data).hexdigest()
+
+    def entry_path(self, key):
+        """Get the folder of an entry."""
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def lookup(self, key):
+        """Find a valid entry.
+
+        Args:
+            key (str): Key of the analysis.
+
+        Returns:
+            str: Folder of the entry, None if missing or its assets changed.
+
+        """
+        entry = self.entry_path(key)
+        meta_path = os.path.join(entry, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            meta = utils.json_load(meta_path)
+        except ValueError:
+            return None
+        for path, stat_key in meta.get("assets", {}).items():
+            current = file_stat_key(path)
+            if (list(current) if current else None) != stat_key:
+                return None
+        return entry
+
+    def restore(self, key, workspace):
+        """Copy the result files of an entry into a workspace.
+
+        Args:
+            key (str): Key of the analysis.
+            workspace (str): Workspace of the analysis.
+
+        Returns:
+            bool: True on a cache hit.
+
+        """
+        entry = self.lookup(key)
+        if entry is None:
+            return False
+        try:
+            for name in RESULT_FILES:
+                source = os.path.join(entry, name)
+                target = os.path.join(workspace, name)
+                if os.path.exists(source):
+                    shutil.copyfile(source, target)
+                elif os.path.exists(target):
+                    os.remove(target)
+            os.utime(entry, None)
+        except (IOError, OSError):
+            # The entry was replaced by another store meanwhile.
+            return False
+        return True
+
+    def store(self, key, workspace):
+        """Save the result files of a workspace.
+
+        Args:
+            key (str): Key of the analysis.
+            workspace (str): Workspace holding the analyzer output.
+
+        """
+        entry = self.entry_path(key)
+        parent = os.path.dirname(entry)
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        # Fill a private folder, then rename it, so readers never see a
+        # half written entry.
+        tmp_entry = os.path.join(parent, ".%s.%s" % (key, uuid.uuid4().hex))
+        os.makedirs(tmp_entry)
+        for name in RESULT_FILES:
+            source = os.path.join(workspace, name)
+            if name in OPTIONAL_FILES and not os.path.exists(source):
+                continue
+            shutil.copyfile(source, os.path.join(tmp_entry, name))
+        asset_info = utils.json_load(os.path.join(workspace, "asset.json"))
+        upload_path = os.path.join(tmp_entry, "upload.json")
+        upload_info = (utils.json_load(upload_path)
+                       if os.path.exists(upload_path) else None)
+        assets = {}
+        for path in iter_referenced_paths(asset_info, upload_info):
+            stat_key = file_stat_key(path)
+            assets[path] = list(stat_key) if stat_key else None
+        utils.json_save(os.path.join(tmp_entry, META_FILE),
+                        {"created": time.time(), "assets": assets})
+        old_entry = None
+        if os.path.exists(entry):
+            # Moved aside, not removed in place, a restore copying from it
+            # fails as a miss rather than reading a half removed entry.
+            old_entry = os.path.join(parent, ".%s.%s" % (key,
+                                                          uuid.uuid4().hex))
+            try:
+                os.rename(entry, old_entry)
+            except OSError:
+                old_entry = None
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:
+            # Another process stored the same key meanwhile.
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        if old_entry:
+            shutil.rmtree(old_entry, ignore_errors=True)
+        self.prune()
+
+    def prune(self):
+        """Remove the least recently used entries beyond max_entries."""
+        entries = []
+        for prefix in os.listdir(self.cache_dir):
+            prefix_path = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+            for name in os.listdir(prefix_path):
+                if name.startswith("."):
+                    continue
+                path = os.path.join(prefix_path, name)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    pass
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            shutil.rmtree(path, ignore_errors=True)
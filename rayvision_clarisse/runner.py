@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Run the analyzer and handle its output line by line."""
+
+# Import built-in models
+import logging
+import os
+import re
+import signal
+import subprocess
+import sys
+
+from rayvision_clarisse.constants import ANALYZE_OUTPUT_RULES
+from rayvision_clarisse.constants import ANALYZE_PROGRESS_PATTERN
+from rayvision_clarisse.metrics import child_usage
+from rayvision_clarisse.utils import StreamDecoder
+
+# Size of each read of the process output.
+READ_SIZE = 65536
+
+
+class AnalyzeOutputParser(object):
+    """Collect tips and progress from analyzer output lines."""
+
+    def __init__(self, on_tip, progress_callback=None, line_hook=None,
+                 fail_fast=False, rules=None,
+                 progress_pattern=ANALYZE_PROGRESS_PATTERN):
+        """Initialize the parser.
+
+        Args:
+            on_tip (function): Called as ``on_tip(code, info)`` for each line
+                matching a rule, e.g. ``AnalyzeClarisse.writing_error_abort``.
+            progress_callback (function, optional): Called as
+                ``progress_callback(percent, line)`` for each progress line.
+            line_hook (function, optional): Called with every line.
+            fail_fast (bool): Stop at the first fatal line, default is False.
+            rules (list, optional): (regex, tips code, fatal) rules, default
+                is ``constants.ANALYZE_OUTPUT_RULES``. The fatal rules are
+                tried first.
+            progress_pattern (str): Regex of a progress line, the first group
+                is the percent. Only a line matching no rule is a progress
+                line.
+
+        """
+        self.on_tip = on_tip
+        self.progress_callback = progress_callback
+        self.line_hook = line_hook
+        self.fail_fast = fail_fast
+        rules = rules or ANALYZE_OUTPUT_RULES
+        # A fatal line also matching another rule must still stop.
+        self.rules = [(re.compile(pattern, re.I), code, fatal)
+                      for pattern, code, fatal in sorted(
+                          rules, key=lambda rule: not rule[2])]
+        self.progress_re = re.compile(progress_pattern, re.I)
+        self.progress = None
+        self.fatal_line = None
+
+    def feed(self, line):
+        """Handle one output line.
+
+        Args:
+            line (str): Output line without line break.
+
+        Returns:
+            bool: True if the analysis must be stopped.
+
+        """
+        if self.line_hook:
+            self.line_hook(line)
+        for rule_re, code, fatal in self.rules:
+            match = rule_re.search(line)
+            if match:
+                info = match.group(1) if match.groups() else line
+                self.on_tip(code, info.strip())
+                if fatal and self.fail_fast:
+                    self.fatal_line = line
+                    return True
+                return False
+        match = self.progress_re.search(line)
+        if match:
+            self.progress = min(float(match.group(1)), 100.0)
+            if self.progress_callback:
+                self.progress_callback(self.progress, line)
+        return False
+
+    __call__ = feed
+
+
+def popen_kwargs():
+    """Get Popen arguments putting the child in its own process group.
+
+    Returns:
+        dict: Keyword arguments for ``subprocess.Popen`` and
+            ``asyncio.create_subprocess_exec``.
+
+    """
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    if sys.version_info < (3, 2):
+        # ``start_new_session`` is missing.
+        return {"preexec_fn": os.setsid}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(pid):
+    """Kill a process started with ``popen_kwargs`` and its children.
+
+    Args:
+        pid (int): Process id.
+
+    """
+    try:
+        if os.name == "nt":
+            subprocess.call(["taskkill", "/F", "/T", "/PID", str(pid)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        else:
+            os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        # Already gone.
+        pass
+
+
+def handle_output_lines(lines, line_callback=None, logger=None):
+    """Log a batch of output lines and pass them to the callback.
+
+    The batch is logged with one call instead of one per line.
+
+    Args:
+        lines (list): Decoded output lines.
+        line_callback (function, optional): Called with every line,
+            returning True stops the handling.
+        logger (logging.Logger, optional): Logger of the output lines.
+
+    Returns:
+        bool: True if the callback asked to terminate the command.
+
+    """
+    lines = [line for line in lines if line]
+    if logger and lines:
+        logger.info("\n".join(lines))
+    if line_callback:
+        for line in lines:
+            if line_callback(line):
+                return True
+    return False
+
+
+def wait_process(process):
+    """Wait for a process to end and read its resource usage.
+
+    Args:
+        process (subprocess.Popen): Process started by this process.
+
+    Returns:
+        tuple: Return code and usage of the process, see
+            ``metrics.child_usage``, None where ``os.wait4`` is missing.
+
+    """
+    if not hasattr(os, "wait4") or process.returncode is not None:
+        return process.wait(), None
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Reaped by someone else, e.g. a SIGCHLD handler.
+        return process.wait(), None
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    return process.returncode, child_usage(rusage)
+
+
+def run_streaming(cmd, line_callback=None, shell=False, logger=None,
+                  usage_callback=None):
+    """Run a command and handle its output while it is produced.
+
+    Stderr is merged into stdout so the lines keep their order.
+
+    Args:
+        cmd (list or str): Command to run.
+        line_callback (function, optional): Called with every decoded line,
+            returning True terminates the command.
+        shell (bool): Run the command through the shell, default is False.
+        logger (logging.Logger, optional): Logger of the output lines.
+        usage_callback (function, optional): Called with the cpu time and
+            peak memory of the command once it ended, see ``wait_process``.
+
+    Returns:
+        tuple: Return code and whether the command was terminated by the
+            callback.
+
+    """
+    logger = logger or logging.getLogger(__name__)
+    logger.info("run command:\n%s", cmd)
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, shell=shell,
+                               **popen_kwargs())
+    aborted = False
+    decoder = StreamDecoder()
+    # Python 2 files have no ``read1``, read line by line there.
+    read = getattr(process.stdout, "read1", None) or process.stdout.readline
+    try:
+        while not aborted:
+            chunk = read(READ_SIZE)
+            lines = decoder.feed(chunk) if chunk else decoder.flush()
+            aborted = handle_output_lines(lines, line_callback, logger)
+            if not chunk:
+                break
+    except BaseException:
+        kill_process_tree(process.pid)
+        raise
+    finally:
+        if aborted:
+            kill_process_tree(process.pid)
+        process.stdout.close()
+        code, usage = wait_process(process)
+    if usage is not None and usage_callback:
+        usage_callback(usage)
+    return code, aborted
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""Collapse frame sequences and UDIM sets into pattern records.
+
+Caches and texture sets are made of files differing only by a number, listed
+one by one they make most of upload.json. Such files are collapsed into one
+record holding the pattern of their paths and their numbers::
+
+    {"local": "D:/cache/sim.####.vdb", "server": "/D/cache/sim.####.vdb",
+     "frames": "1-240,250", "sizes": [1024, ...]}
+    {"local": "D:/tex/diffuse.<UDIM>.exr",
+     "server": "/D/tex/diffuse.<UDIM>.exr", "tiles": [1001, 1002, 1011]}
+
+``sizes`` and ``hashes`` are kept, in the order of the numbers, when every
+file had one. ``iter_expanded`` gives the entries of the files back one by
+one. In asset.json a sequence is replaced by its pattern, like the ones
+written by the fast analysis.
+
+"""
+
+# Import built-in models
+import collections
+import re
+
+from rayvision_clarisse.constants import CACHE_EXTENSIONS
+from rayvision_clarisse.project_parser import is_sequence_path
+
+# Keys of the entries that can be collapsed, the other entries are kept.
+COLLAPSIBLE_KEYS = frozenset(["local", "server", "size", "hash"])
+
+# Keys of a record listing the numbers of its files.
+RECORD_KEYS = ("frames", "tiles")
+
+# Fewest files collapsed into a record.
+MIN_FILES = 3
+
+UDIM_TOKEN = "<UDIM>"
+
+# Last number of a file name, with the separator before it.
+_NUMBER_RE = re.compile(r"^(.*?)([._-]?)(\d+)(\D*)$")
+
+_TOKEN_RE = re.compile(r"<UDIM>|#+")
+
+
+def format_frames(frames):
+    """Format sorted numbers as ranges, e.g. ``"1-3,5"``."""
+    ranges = []
+    for frame in frames:
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+    return ",".join(str(start) if start == end else
+                    "{}-{}".format(start, end) for start, end in ranges)
+
+
+def parse_frames(frames):
+    """Parse ranges such as ``"1-3,5"``.
+
+    Yields:
+        int: The numbers, in the order of the ranges.
+
+    """
+    for part in frames.split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        for frame in range(int(start), int(end or start) + 1):
+            yield frame
+
+
+def split_number(name):
+    """Split a file name around its last number.
+
+    Returns:
+        tuple: Text before the number, the number digits and the text after,
+            None if the name has no number.
+
+    """
+    match = _NUMBER_RE.match(name)
+    if match is None:
+        return None
+    return match.group(1) + match.group(2), match.group(3), match.group(4)
+
+
+def _is_udim(prefix, suffix, width, numbers):
+    """Tell whether numbered files are the tiles of a UDIM texture."""
+    return (width == 4 and prefix.endswith((".", "_")) and
+            not suffix.lower().endswith(CACHE_EXTENSIONS) and
+            all(1001 <= number <= 1999 for number in numbers))
+
+
+def _group_key(entry):
+    """Get the group of an entry and its number, None if not collapsible.
+
+    Returns:
+        tuple: Key shared by the files of a sequence, and the number.
+
+    """
+    if not isinstance(entry, dict) or not COLLAPSIBLE_KEYS.issuperset(entry):
+        return None
+    local = entry.get("local")
+    if not isinstance(local, str):
+        return None
+    slash = local.rfind("/") + 1
+    folder, name = local[:slash], local[slash:]
+    parts = split_number(name)
+    if parts is None:
+        return None
+    server_folder = None
+    if "server" in entry:
+        server = entry["server"]
+        if not isinstance(server, str) or not server.endswith(name):
+            return None
+        server_folder = server[:len(server) - len(name)]
+    prefix, digits, suffix = parts
+    if is_sequence_path(folder + prefix + suffix):
+        # A literal token could not be told apart from the number.
+        return None
+    return ((folder, prefix, len(digits), suffix, server_folder,
+             tuple(sorted(entry))), int(digits))
+
+
+def _make_record(key, members):
+    """Build the record of the files of a sequence."""
+    folder, prefix, width, suffix, server_folder, keys = key
+    members = sorted(members, key=lambda member: member[0])
+    numbers = [number for number, _ in members]
+    if _is_udim(prefix, suffix, width, numbers):
+        token = UDIM_TOKEN
+        record = {"tiles": numbers}
+    else:
+        token = "#" * width
+        record = {"frames": format_frames(numbers)}
+    record["local"] = folder + prefix + token + suffix
+    if "server" in keys:
+        record["server"] = server_folder + prefix + token + suffix
+    for key_name, list_name in (("size", "sizes"), ("hash", "hashes")):
+        if key_name in keys:
+            record[list_name] = [entry[key_name] for _, entry in members]
+    return record
+
+
+def collapse_entries(entries, min_files=MIN_FILES):
+    """Collapse the sequences of upload entries into records.
+
+    A record takes the place of the first file of its sequence, the other
+    entries are kept as they are.
+
+    Args:
+        entries (iterable): Entries of upload.json, e.g. an ``UploadManifest``.
+        min_files (int): Fewest files collapsed into a record.
+
+    Returns:
+        list: Entries and records.
+
+    """
+    groups = collections.OrderedDict()
+    # Entries, or the key of a group at the place of its first file.
+    order = []
+    for entry in entries:
+        if not isinstance(entry, dict) and hasattr(entry, "items"):
+            # AssetRecord of an AssetTable.
+            entry = dict(entry.items())
+        grouped = _group_key(entry)
+        if grouped is None:
+            order.append(entry)
+            continue
+        key, number = grouped
+        if key not in groups:
+            groups[key] = {}
+            order.append(key)
+        members = groups[key]
+        if number in members:
+            # Duplicate file, kept as it is.
+            order.append(entry)
+        else:
+            members[number] = entry
+    collapsed = []
+    for item in order:
+        if not isinstance(item, tuple):
+            collapsed.append(item)
+            continue
+        members = groups[item]
+        if len(members) < min_files:
+            collapsed.extend(members.values())
+        else:
+            collapsed.append(_make_record(item, members.items()))
+    return collapsed
+
+
+def collapse_paths(paths, min_files=MIN_FILES):
+    """Replace the files of sequences by their pattern.
+
+    Args:
+        paths (iterable): Paths, e.g. a list of asset.json.
+        min_files (int): Fewest files replaced by a pattern.
+
+    Returns:
+        list: Paths and patterns, a pattern at the place of its first file.
+
+    """
+    collapsed = []
+    for entry in collapse_entries(({"local": path} for path in paths),
+                                  min_files):
+        collapsed.append(entry["local"])
+    return collapsed
+
+
+def collapse_asset_info(asset_info, min_files=MIN_FILES):
+    """Collapse the lists of paths of asset.json, in place.
+
+    Returns:
+        dict: ``asset_info``.
+
+    """
+    for name, value in asset_info.items():
+        if isinstance(value, list) and all(isinstance(path, str)
+                                           for path in value):
+            asset_info[name] = collapse_paths(value, min_files)
+    return asset_info
+
+
+def is_record(entry):
+    """Tell whether an upload entry is a sequence record."""
+    return isinstance(entry, dict) and any(name in entry
+                                           for name in RECORD_KEYS)
+
+
+def _substitute(pattern, number):
+    """Put a number in place of the token of a pattern."""
+    def replace(match):
+        token = match.group(0)
+        width = 4 if token == UDIM_TOKEN else len(token)
+        return "%0*d" % (width, number)
+    return _TOKEN_RE.sub(replace, pattern, count=1)
+
+
+def expand_record(record):
+    """Iterate the entries of the files of a record.
+
+    Yields:
+        dict: Entry of one file, with its ``size`` and ``hash`` if known.
+
+    """
+    if "tiles" in record:
+        numbers = record["tiles"]
+    else:
+        numbers = parse_frames(record["frames"])
+    sizes = record.get("sizes")
+    hashes = record.get("hashes")
+    server = record.get("server")
+    for index, number in enumerate(numbers):
+        entry = {"local": _substitute(record["local"], number)}
+        if server is not None:
+            entry["server"] = _substitute(server, number)
+        if sizes is not None:
+            entry["size"] = sizes[index]
+        if hashes is not None:
+            entry["hash"] = hashes[index]
+        yield entry
+
+
+def iter_expanded(entries):
+    """Iterate upload entries with the records expanded, lazily.
+
+    Args:
+        entries (iterable): Entries and records of upload.json.
+
+    Yields:
+        dict: Entry of one file.
+
+    """
+    for entry in entries:
+        if is_record(entry):
+            for file_entry in expand_record(entry):
+                yield file_entry
+        else:
+            yield entry
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""Split the asset list of upload.json into shards of the same weight.
+
+Parallel uploaders given consecutive slices of upload.json end up unbalanced,
+one gets the 40 GB cache while the others sit idle. The planner weighs every
+entry by its size plus a fixed cost per file, standing for the round trips
+of each upload, and deals the entries largest first to the lightest shard
+(LPT). The heaviest shard is then at most 4/3 of the best split, so the
+upload takes about the total weight divided by the number of uploaders
+instead of the time of the largest slice.
+
+``stream_shards`` plans from two passes over the entries, e.g. read one by
+one from upload.json, so they are never all in memory: the first one keeps
+only the size of each entry, the second one writes each entry to its shard.
+
+Each shard is written as ``upload_shard_<k>.json``, in the format of
+upload.json, and ``upload_shards.json`` sums them up::
+
+    {"shards": [{"path": "upload_shard_0.json", "files": 120,
+                 "bytes": 1073741824}, ...],
+     "files": 240, "bytes": 2147483648, "imbalance": 1.01}
+
+"""
+
+# Import built-in models
+import array
+import contextlib
+import heapq
+import itertools
+import os
+
+from rayvision_clarisse.dir_index import DirectoryIndex
+from rayvision_clarisse.json_stream import JsonStreamWriter
+from rayvision_clarisse.sequence import iter_expanded
+from rayvision_clarisse.validate import validate_files
+from rayvision_clarisse import utils
+
+SHARD_NAME = "upload_shard_{}.json"
+SUMMARY_NAME = "upload_shards.json"
+
+# Weight of a file in bytes on top of its size, about what a 100 MB/s link
+# sends during the round trips of one upload.
+FILE_COST = 1024 * 1024
+
+
+def measure_entries(entries, max_workers=16, index=None, chunk_size=10000):
+    """Get the size of each upload entry.
+
+    Entries lacking ``size`` are stat ``chunk_size`` at a time, the index is
+    shared by the chunks so a folder is listed once.
+
+    Args:
+        entries (iterable): Entries of upload.json, sequence records are not
+            expanded.
+        max_workers (int): Number of folders listed at the same time.
+        index (DirectoryIndex, optional): See ``validate_files``.
+        chunk_size (int): Number of entries checked at once.
+
+    Returns:
+        array.array: Size of each entry in order, -1 for a missing file.
+
+    """
+    index = index or DirectoryIndex()
+    entries = iter(entries)
+    sizes = array.array("q")
+    while True:
+        chunk = list(itertools.islice(entries, chunk_size))
+        if not chunk:
+            return sizes
+        paths = [entry["local"] for entry in chunk
+                 if entry.get("size") is None]
+        found = (validate_files(paths, max_workers, index).sizes
+                 if paths else {})
+        for entry in chunk:
+            size = entry.get("size")
+            if size is None:
+                size = found.get(entry["local"], -1)
+            sizes.append(size)
+
+
+def assign_shards(sizes, count, file_cost=FILE_COST):
+    """Deal entries of the given sizes into shards of about the same weight.
+
+    Args:
+        sizes (sequence): Size of each entry, -1 for a missing file, see
+            ``measure_entries``.
+        count (int): Number of shards, at least 1.
+        file_cost (int): Weight of a file in bytes on top of its size.
+
+    Returns:
+        array.array: Number of the shard of each entry.
+
+    """
+    if count < 1:
+        raise Exception("The number of shards must be at least 1.")
+    # Largest first, the sort is stable so equal entries keep their order.
+    order = sorted(range(len(sizes)),
+                   key=lambda position: -max(sizes[position], 0))
+    # Weight, number of files and number of each shard, lightest first.
+    loads = [(0, 0, number) for number in range(count)]
+    numbers = array.array("I", [0]) * len(sizes)
+    for position in order:
+        load, files, number = loads[0]
+        numbers[position] = number
+        heapq.heapreplace(loads, (load + max(sizes[position], 0) + file_cost,
+                                  files + 1, number))
+    return numbers
+
+
+def _sized(entry, size):
+    """Get a copy of an entry with its size, if the file exists."""
+    # Also turns an AssetRecord into a dict.
+    entry = dict(entry.items())
+    if size >= 0:
+        entry["size"] = size
+    return entry
+
+
+def plan_shards(entries, count, file_cost=FILE_COST, max_workers=16,
+                index=None):
+    """Deal upload entries into shards of about the same weight.
+
+    Entries lacking ``size`` are stat and given it, a missing file weighs
+    ``file_cost`` only. Sequence records are expanded so their files can go
+    to different shards. Every entry is copied in memory, see
+    ``stream_shards`` for the entries of a large upload.json.
+
+    Args:
+        entries (iterable): Entries of upload.json, e.g. an ``UploadManifest``.
+        count (int): Number of shards, at least 1.
+        file_cost (int): Weight of a file in bytes on top of its size.
+        max_workers (int): Number of folders listed at the same time.
+        index (DirectoryIndex, optional): See ``validate_files``.
+
+    Returns:
+        list: ``count`` lists of entries, in the order of ``entries``
+            within a shard, a shard may be empty.
+
+    """
+    items = list(iter_expanded(entries))
+    sizes = measure_entries(items, max_workers, index)
+    numbers = assign_shards(sizes, count, file_cost)
+    shards = [[] for _ in range(count)]
+    for entry, size, number in zip(items, sizes, numbers):
+        shards[number].append(_sized(entry, size))
+    return shards
+
+
+def stream_shards(entries, count, folder, scene_entries=None,
+                  file_cost=FILE_COST, max_workers=16, index=None):
+    """Plan and write the shards of entries read twice, one at a time.
+
+    Same shards as ``plan_shards`` followed by ``write_shards``, but only
+    the size and the shard number of each entry are kept in memory.
+
+    Args:
+        entries (function): Called without arguments for a new iterator of
+            the entries of upload.json, once per pass, e.g.
+            ``AnalyzeClarisse.iter_upload_assets``.
+        count (int): Number of shards, at least 1.
+        folder (str): Folder of the files, e.g. the workspace.
+        scene_entries (list, optional): See ``write_shards``.
+        file_cost (int): Weight of a file in bytes on top of its size.
+        max_workers (int): Number of folders listed at the same time.
+        index (DirectoryIndex, optional): See ``validate_files``.
+
+    Returns:
+        dict: The summary, see the module documentation.
+
+    """
+    sizes = measure_entries(iter_expanded(entries()), max_workers, index)
+    numbers = assign_shards(sizes, count, file_cost)
+    pairs = ((number, _sized(entry, size)) for entry, size, number in zip(
+        iter_expanded(entries()), sizes, numbers))
+    return _write_numbered(pairs, count, folder, scene_entries)
+
+
+def _entry_size(entry):
+    """Get the size of an entry, 0 if unknown."""
+    return entry.get("size") or 0
+
+
+def write_shards(shards, folder, scene_entries=None):
+    """Write the shards and their summary.
+
+    Args:
+        shards (list): Lists of entries, see ``plan_shards``.
+        folder (str): Folder of the files, e.g. the workspace.
+        scene_entries (list, optional): ``scene`` list of upload.json,
+            written into the first shard and the summary.
+
+    Returns:
+        dict: The summary, see the module documentation.
+
+    """
+    pairs = ((number, entry) for number, entries in enumerate(shards)
+             for entry in entries)
+    return _write_numbered(pairs, len(shards), folder, scene_entries)
+
+
+def _write_numbered(pairs, count, folder, scene_entries):
+    """Write entries to the shard of their number, then the summary.
+
+    Args:
+        pairs (iterable): Shard number and entry pairs.
+        count (int): Number of shards.
+        folder (str): Folder of the files.
+        scene_entries (list): See ``write_shards``.
+
+    Returns:
+        dict: The summary, see the module documentation.
+
+    """
+    summary = {"shards": [{"path": SHARD_NAME.format(number), "files": 0,
+                           "bytes": 0} for number in range(count)],
+               "files": 0, "bytes": 0}
+    with contextlib.ExitStack() as stack:
+        writers = []
+        for shard in summary["shards"]:
+            writer = stack.enter_context(
+                JsonStreamWriter(os.path.join(folder, shard["path"])))
+            # The list is written even if the shard stays empty.
+            writer.extend("asset", ())
+            writers.append(writer)
+        for number, entry in pairs:
+            writers[number].append("asset", entry)
+            shard = summary["shards"][number]
+            shard["files"] += 1
+            shard["bytes"] += _entry_size(entry)
+        if writers and scene_entries is not None:
+            writers[0].write("scene", scene_entries)
+    for shard in summary["shards"]:
+        summary["files"] += shard["files"]
+        summary["bytes"] += shard["bytes"]
+    mean = float(summary["bytes"]) / count if count else 0
+    summary["imbalance"] = (
+        max(shard["bytes"] for shard in summary["shards"]) / mean
+        if mean else 1.0)
+    if scene_entries is not None:
+        summary["scene"] = scene_entries
+    utils.json_save(os.path.join(folder, SUMMARY_NAME), summary)
+    return summary
+
+
+def remove_shards(folder):
+    """Remove the shards and the summary written in a folder before."""
+    for name in os.listdir(folder):
+        if name == SUMMARY_NAME or (name.startswith("upload_shard_") and
+                                    name.endswith(".json")):
+            os.remove(os.path.join(folder, name))
@@ -64,3 +64,36 @@ def clarisse(tmpdir):
     else:
         os.environ["HOME"] = str(tmpdir)
     return AnalyzeClarisse(str(tmpdir), "clarisse_ifx_4.0_sp3")
+
+
+@pytest.fixture()
+def fake_analyzer(monkeypatch):
+    """Replace the analyzer by one writing a fixed result.
+
+    Returns:
+        function: Called as ``fake_analyzer(assets, asset_info)`` to set the
+            result, ``assets`` are the local paths of the ``asset`` list of
+            upload.json and ``asset_info`` the content of asset.json, or a
+            function of the analysis returning it. Gets the list the
+            workspace of each run of the analyzer is appended to.
+
+    """
+    from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+    from rayvision_utils import utils
+
+    def install(assets=(), asset_info=None):
+        calls = []
+
+        def fake_analyse_cg_file(self):
+            calls.append(self.workspace)
+            info = asset_info(self) if callable(asset_info) else asset_info
+            utils.json_save(self.tips_json, {})
+            utils.json_save(self.asset_json, info or {})
+            utils.json_save(self.upload_json, {"asset": [
+                {"local": path, "server": path} for path in assets]})
+
+        monkeypatch.setattr(AnalyzeClarisse, "analyse_cg_file",
+                            fake_analyse_cg_file)
+        return calls
+
+    return install
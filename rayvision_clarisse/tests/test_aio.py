@@ -0,0 +1,127 @@
+"""Test rayvision_clarisse.aio model."""
+
+# pylint: disable=import-error
+import asyncio
+import os
+import stat
+import sys
+
+import pytest
+
+from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+
+STUB_ANALYZER = """#!{python}
+import json
+import os
+import sys
+import time
+
+task_json = sys.argv[sys.argv.index("-tj") + 1]
+workspace = os.path.dirname(task_json)
+with open(os.path.join(workspace, "pid.txt"), "w") as pid_f:
+    pid_f.write(str(os.getpid()))
+print("analyse 50%", flush=True)
+time.sleep({sleep})
+for name in ("task.json", "asset.json", "tips.json"):
+    with open(os.path.join(workspace, name), "w") as json_f:
+        json.dump({{}}, json_f)
+with open(os.path.join(workspace, "upload.json"), "w") as json_f:
+    json.dump({{"asset": []}}, json_f)
+"""
+
+
+def _make_analyze_obj(tmpdir, sleep, **kwargs):
+    """Create an AnalyzeClarisse running a stub analyzer."""
+    analyzer = tmpdir.join("analyzer.py")
+    analyzer.write(STUB_ANALYZER.format(python=sys.executable, sleep=sleep))
+    os.chmod(str(analyzer), stat.S_IRWXU)
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    return AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3",
+                           workspace=str(tmpdir),
+                           custom_exe_path=str(analyzer), **kwargs)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="stub analyzer needs a shebang")
+def test_analyse_async(tmpdir):
+    """Test the async pipeline produces the result files."""
+    progress = []
+    analyze_obj = _make_analyze_obj(tmpdir, 0)
+    analyze_obj.progress_callback = lambda percent, _: progress.append(
+        percent)
+
+    asyncio.run(analyze_obj.analyse_async(timeout=60))
+
+    assert progress == [50.0]
+    assert analyze_obj.upload_info["scene"][0]["hash"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="stub analyzer needs a shebang")
+def test_analyse_async_timeout_kills_analyzer(tmpdir):
+    """Test a timeout kills the analyzer and removes the workspace."""
+    analyze_obj = _make_analyze_obj(tmpdir, 60)
+    pid_path = os.path.join(analyze_obj.workspace, "pid.txt")
+    pids = []
+
+    async def analyse():
+        task = asyncio.ensure_future(analyze_obj.analyse_async(timeout=2))
+        while not os.path.exists(pid_path):
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.1)
+        with open(pid_path) as pid_f:
+            pids.append(int(pid_f.read()))
+        await task
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(analyse())
+
+    assert not os.path.exists(analyze_obj.workspace)
+    with pytest.raises(OSError):
+        os.kill(pids[0], 0)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="stub analyzer needs a shebang")
+def test_analyse_async_timeout_keeps_reused_workspace(tmpdir):
+    """Test a workspace this run did not create is not removed."""
+    analyze_obj = _make_analyze_obj(tmpdir, 60, reuse_workspace=True)
+    os.makedirs(analyze_obj.workspace)
+    keep = os.path.join(analyze_obj.workspace, "keep.txt")
+    with open(keep, "w") as keep_f:
+        keep_f.write("keep")
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(analyze_obj.analyse_async(timeout=1))
+
+    assert os.path.exists(keep)
+
+
+def test_analyse_async_checks_mode(tmpdir):
+    """Test an unknown mode is refused before the analysis starts."""
+    analyze_obj = _make_analyze_obj(tmpdir, 0)
+
+    with pytest.raises(Exception):
+        analyze_obj.analyse_async(mode="quick")
+    assert analyze_obj.metrics["total"] is None
+
+
+def test_analyse_async_timeout_waits_for_running_step(tmpdir):
+    """Test the workspace is removed after the running step returned."""
+    import time
+
+    analyze_obj = _make_analyze_obj(tmpdir, 0)
+
+    def slow_step():
+        time.sleep(1)
+        # Like ``AnalysisResult.flush`` writing into the workspace.
+        os.makedirs(analyze_obj.workspace, exist_ok=True)
+        with open(os.path.join(analyze_obj.workspace, "late.txt"),
+                  "w") as late_f:
+            late_f.write("late")
+
+    analyze_obj.analyse_fast_cg_file = slow_step
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(analyze_obj.analyse_async(timeout=0.3, mode="fast"))
+
+    assert analyze_obj.workspace_created
+    assert not os.path.exists(analyze_obj.workspace)
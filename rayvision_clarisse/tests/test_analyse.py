@@ -5,3 +5,114 @@ def test_print_info(clarisse):
     """Test print_info this interface."""
     info = "test print info"
     assert bool(clarisse.print_info(info)) is False
+
+
+def test_analyse_batch_isolates_failures(tmpdir, fake_analyzer):
+    """Test analyse_batch keeps going when one scene fails."""
+    from rayvision_clarisse import analyse_clarisse
+
+    fake_analyzer()
+    good_file = tmpdir.join("good.project")
+    good_file.write("scene")
+    missing_file = str(tmpdir.join("missing.project"))
+
+    results = analyse_clarisse.analyse_batch(
+        [str(good_file), missing_file], executor="thread",
+        software_version="clarisse_ifx_4.0_sp3", workspace=str(tmpdir))
+
+    assert [res["cg_file"] for res in results] == [str(good_file),
+                                                   missing_file]
+    assert results[0]["error"] is None
+    assert results[0]["upload_info"]["scene"][0]["hash"]
+    assert "not found" in results[1]["error"]
+
+
+def test_analyse_batch_threads_do_not_share_task_info(tmpdir, fake_analyzer):
+    """Test analyses running in threads each write their own task.json."""
+    import copy
+    import json
+    import time
+
+    from rayvision_clarisse import analyse_clarisse
+    from rayvision_utils import constants
+
+    template = copy.deepcopy(constants.TASK_INFO)
+
+    def task_assets(analyze_obj):
+        # Let the other threads write their task.json meanwhile.
+        time.sleep(0.01)
+        with open(analyze_obj.task_json) as task_f:
+            task_info = json.load(task_f)["task_info"]
+        return {"scene": [task_info["input_cg_file"]],
+                "project": [task_info["project_name"]]}
+
+    fake_analyzer(asset_info=task_assets)
+    scenes = []
+    for index in range(48):
+        scene = tmpdir.join("scene_{}.project".format(index))
+        scene.write("scene {}".format(index))
+        scenes.append({"cg_file": str(scene),
+                       "project_name": "project_{}".format(index)})
+
+    results = analyse_clarisse.analyse_batch(
+        scenes, max_workers=16, executor="thread",
+        software_version="clarisse_ifx_4.0_sp3", workspace=str(tmpdir))
+
+    assert [res["error"] for res in results] == [None] * len(scenes)
+    for scene, res in zip(scenes, results):
+        assert res["asset_info"] == {
+            "scene": [scene["cg_file"].replace("\\", "/")],
+            "project": [scene["project_name"]]}
+        assert res["task_info"]["task_info"]["project_name"] == (
+            scene["project_name"])
+    assert constants.TASK_INFO == template
+
+
+def test_analyse_batch_jobs_of_a_worker_get_own_workspace(tmpdir,
+                                                          fake_analyzer):
+    """Test the jobs run one after the other by a worker keep their result."""
+    import json
+    import multiprocessing
+    import os
+
+    from rayvision_clarisse import analyse_clarisse
+
+    fake_analyzer(asset_info=lambda analyze_obj: {
+        "scene": [analyze_obj.cg_file]})
+    scenes = []
+    for index in range(3):
+        scene = tmpdir.join("s{}.project".format(index))
+        scene.write("scene {}".format(index))
+        scenes.append(str(scene))
+
+    executors = ["thread"]
+    if multiprocessing.get_start_method() == "fork":
+        # The patched analyzer only reaches forked workers.
+        executors.append("process")
+    for executor in executors:
+        results = analyse_clarisse.analyse_batch(
+            scenes, max_workers=1, executor=executor,
+            software_version="clarisse_ifx_4.0_sp3",
+            workspace=str(tmpdir.mkdir(executor)))
+
+        assert len({res["workspace"] for res in results}) == len(scenes)
+        for scene, res in zip(scenes, results):
+            assert res["error"] is None
+            with open(os.path.join(res["workspace"], "asset.json")) as asset_f:
+                assert json.load(asset_f) == {"scene": [scene]}
+
+
+def test_analyse_batch_process_refuses_unpicklable_kwargs(tmpdir):
+    """Test a process pool refuses what can not be sent to its workers."""
+    import pytest
+
+    from rayvision_clarisse import analyse_clarisse
+
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    with pytest.raises(Exception) as err:
+        analyse_clarisse.analyse_batch(
+            [str(scene)], executor="process",
+            software_version="clarisse_ifx_4.0_sp3",
+            workspace=str(tmpdir), progress_callback=lambda *args: None)
+    assert "progress_callback" in str(err.value)
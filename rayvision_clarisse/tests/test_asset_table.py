@@ -0,0 +1,69 @@
+# -*- coding:utf-8 -*-
+"""Test rayvision_clarisse.asset_table model."""
+
+# pylint: disable=import-error
+import pickle
+
+from rayvision_clarisse.asset_table import AssetTable
+from rayvision_clarisse import utils
+
+ENTRIES = [
+    {"local": "D:/cache/sim.0001.vdb", "server": "/D/cache/sim.0001.vdb",
+     "size": 10},
+    {"local": "D:/cache/sim.0002.vdb", "server": "/D/cache/sim.0002.vdb",
+     "hash": "9a0364b9e99bb480dd25e1f0284c8555"},
+    {"local": "D:/tex/a.exr", "server": "/renamed/b.exr", "size": 1.5,
+     "note": u"贴图"},
+    {"local": "relative.exr", "server": None},
+]
+
+
+def test_table_round_trip(tmpdir):
+    """Test entries come back as the dicts they were made of."""
+    table = AssetTable(ENTRIES)
+    upload_json = str(tmpdir.join("upload.json"))
+    utils.json_save(upload_json, {"asset": table})
+
+    assert table == ENTRIES
+    assert [dict(record) for record in table] == ENTRIES
+    assert table.to_list() == ENTRIES
+    assert utils.json_load(upload_json) == {"asset": ENTRIES}
+    assert pickle.loads(pickle.dumps(table)) == ENTRIES
+    # D:/cache/, /D/cache/, D:/tex/ and "", the renamed server is kept whole.
+    assert len(table._folders) == 4  # pylint: disable=protected-access
+
+
+def test_record_is_mutable_mapping():
+    """Test records are updated in place like dicts."""
+    table = AssetTable(ENTRIES)
+    record = table[0]
+    record["hash"] = "h"
+    record["size"] = 11
+    del record["server"]
+    record["local"] = "E:\\cache\\sim.0001.vdb"
+
+    assert table[0] == {"local": "E:\\cache\\sim.0001.vdb", "size": 11,
+                        "hash": "h"}
+    assert record.get("server") is None
+    assert table.find("e:/cache//sim.0001.vdb") == 0
+    assert table.find("D:/cache/sim.0001.vdb") is None
+    assert table.find("d:\\cache\\sim.0002.vdb") == 1
+
+
+def test_upload_info_assets_are_a_list(tmpdir):
+    """Test the gathered upload_info keeps its asset list of dicts."""
+    import json
+
+    from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+
+    tmpdir.join("a.exr").write("a")
+    scene = tmpdir.join("scene.project")
+    scene.write('TextureMapFile "a" { filename "a.exr" }\n')
+    analyze_obj = AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3",
+                                  workspace=str(tmpdir))
+    analyze_obj.analyse(mode="fast")
+
+    assets = analyze_obj.upload_info["asset"]
+    assert isinstance(assets, list)
+    assert all(isinstance(entry, dict) for entry in assets[:1])
+    assert json.loads(json.dumps(analyze_obj.upload_info))["asset"] == assets
@@ -0,0 +1,156 @@
+"""Test rayvision_clarisse.delta model."""
+
+# pylint: disable=import-error
+import os
+
+import pytest
+
+from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+from rayvision_clarisse.delta import is_unchanged
+from rayvision_clarisse.delta import load_fingerprints
+from rayvision_clarisse.delta import merge_unchanged
+from rayvision_clarisse.delta import UNCHANGED_NAME
+from rayvision_clarisse.delta import write_delta
+from rayvision_clarisse.hashing import HashEngine
+from rayvision_clarisse import utils
+
+PREVIOUS = {"asset": [
+    {"local": "D:/tex/a.exr", "server": "/D/tex/a.exr", "hash": "1",
+     "size": 10},
+    {"local": "D:/tex/b.exr", "server": "/D/tex/b.exr", "hash": "2"},
+    {"local": "D:/tex/c.exr", "hash": "3"},
+    {"local": "D:/tex/d.exr", "server": "/D/tex/d.exr"},
+]}
+
+
+@pytest.mark.parametrize("entry, expected", [
+    ({"local": "D:/tex/a.exr", "server": "/D/tex/a.exr", "hash": "1",
+      "size": 10}, True),
+    # Changed content.
+    ({"local": "D:/tex/a.exr", "server": "/D/tex/a.exr", "hash": "9"},
+     False),
+    # Same hash but another size.
+    ({"local": "D:/tex/a.exr", "server": "/D/tex/a.exr", "hash": "1",
+      "size": 11}, False),
+    # Uploaded to another server path.
+    ({"local": "D:/tex/b.exr", "server": "/projects/b.exr", "hash": "2"},
+     False),
+    # Matched by normalized local path without a server path.
+    ({"local": "d:\\tex\\c.exr", "hash": "3"}, True),
+    # No hash on one side or the other.
+    ({"local": "D:/tex/b.exr", "server": "/D/tex/b.exr"}, False),
+    ({"local": "D:/tex/d.exr", "server": "/D/tex/d.exr", "hash": "4"},
+     False),
+    ({"local": "D:/tex/new.exr", "server": "/D/tex/new.exr", "hash": "5"},
+     False),
+])
+def test_is_unchanged(entry, expected):
+    """Test entries are matched with the previous submission."""
+    assert is_unchanged(entry, load_fingerprints(PREVIOUS)) is expected
+
+
+def test_write_and_merge_delta(tmpdir):
+    """Test upload.json is split and merged back without loss."""
+    upload_path = str(tmpdir.join("upload.json"))
+    unchanged_path = str(tmpdir.join(UNCHANGED_NAME))
+    scene = [{"local": "D:/scene.project", "server": "/D/scene.project"}]
+    assets = [dict(entry, hash=entry.get("hash", "x"))
+              for entry in PREVIOUS["asset"]]
+    assets.append({"local": "D:/tex/e.exr", "server": "/D/tex/e.exr",
+                   "hash": "6"})
+    utils.json_save(upload_path, {"asset": assets, "scene": scene})
+
+    stats = write_delta(upload_path, upload_path, unchanged_path,
+                        load_fingerprints(PREVIOUS), chunk_size=1)
+
+    assert stats == {"changed": 2, "unchanged": 3, "unchanged_bytes": 10}
+    upload_info = utils.json_load(upload_path)
+    assert upload_info["asset"] == assets[3:]
+    assert upload_info["scene"] == scene
+    assert utils.json_load(unchanged_path) == {"asset": assets[:3]}
+
+    assert merge_unchanged(upload_path, unchanged_path)
+    upload_info = utils.json_load(upload_path)
+    assert upload_info["asset"] == assets[3:] + assets[:3]
+    assert upload_info["scene"] == scene
+
+
+def test_missing_file_is_never_unchanged(tmpdir):
+    """Test a file missing in both submissions is not taken as unchanged."""
+    missing = str(tmpdir.join("missing.exr")).replace("\\", "/")
+    previous = {"asset": [{"local": missing}]}
+    HashEngine().hash_manifest(previous["asset"])
+    current = {"local": missing}
+    HashEngine().hash_manifest([current])
+
+    assert not is_unchanged(current, load_fingerprints(previous))
+
+
+def test_fingerprints_of_a_delta_submission(tmpdir):
+    """Test the unchanged list next to a previous upload.json is read."""
+    utils.json_save(str(tmpdir.join("upload.json")), {"asset": [
+        {"local": "D:/tex/a.exr", "hash": "1"}]})
+    utils.json_save(str(tmpdir.join(UNCHANGED_NAME)), {"asset": [
+        {"local": "D:/tex/b.exr", "hash": "2"}]})
+
+    fingerprints = load_fingerprints(str(tmpdir.join("upload.json")))
+
+    assert sorted(fingerprints) == ["D:/tex/a.exr", "D:/tex/b.exr"]
+    with pytest.raises(Exception):
+        load_fingerprints(str(tmpdir.join("missing.json")))
+
+
+@pytest.mark.parametrize("stream_upload", [False, True])
+def test_analyse_previous_upload(tmpdir, stream_upload):
+    """Test a re-submission uploads only the files changed since."""
+    textures = tmpdir.mkdir("textures")
+    for name in ("a", "b", "c"):
+        textures.join(name + ".exr").write(name)
+    scene = tmpdir.join("scene.project")
+    scene.write("".join('TextureMapFile "%s" { filename "textures/%s.exr" }\n'
+                        % (name, name) for name in ("a", "b", "c")))
+    kwargs = dict(hash_assets=True, stream_upload=stream_upload)
+
+    first = AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3",
+                            workspace=str(tmpdir.mkdir("first")), **kwargs)
+    first.analyse(mode="fast")
+    textures.join("b.exr").write("changed")
+    second = AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3",
+                             workspace=str(tmpdir.mkdir("second")),
+                             previous_upload=first.upload_json, **kwargs)
+    second.analyse(mode="fast")
+
+    changed = sorted(os.path.basename(entry["local"])
+                     for entry in second.iter_upload_assets())
+    assert changed == ["b.exr"]
+    assert second.upload_delta["unchanged"] == 3
+    unchanged = utils.json_load(os.path.join(second.workspace,
+                                             UNCHANGED_NAME))["asset"]
+    assert sorted(os.path.basename(entry["local"])
+                  for entry in unchanged) == ["a.exr", "c.exr",
+                                              "scene.project"]
+    assert second.upload_info["scene"][0]["local"] == str(scene).replace(
+        "\\", "/")
+
+
+def test_reused_delta_result_lists_every_file(tmpdir):
+    """Test a reused result of a delta submission lists every file."""
+    tmpdir.join("a.exr").write("a")
+    scene = tmpdir.join("scene.project")
+    scene.write('TextureMapFile "a" { filename "a.exr" }\n')
+    kwargs = dict(workspace=str(tmpdir.mkdir("workspace")),
+                  hash_assets=True, reuse_workspace=True)
+    first = AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3", **kwargs)
+    first.analyse(mode="fast")
+
+    second = AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3",
+                             previous_upload=first.upload_info, **kwargs)
+    second.analyse(mode="fast")
+    assert list(second.iter_upload_assets()) == []
+
+    third = AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3", **kwargs)
+    third.analyse(mode="fast")
+    assert sorted(os.path.basename(entry["local"])
+                  for entry in third.iter_upload_assets()) == [
+                      "a.exr", "scene.project"]
+    assert not os.path.exists(os.path.join(third.workspace, UNCHANGED_NAME))
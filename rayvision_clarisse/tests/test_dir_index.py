@@ -0,0 +1,162 @@
+"""Test rayvision_clarisse.dir_index model."""
+
+# pylint: disable=import-error
+import os
+from concurrent import futures
+
+import pytest
+
+from rayvision_clarisse.dir_index import DirectoryIndex
+from rayvision_clarisse.project_parser import expand_sequence
+from rayvision_clarisse.validate import validate_files
+
+
+@pytest.fixture()
+def textures(tmpdir):
+    """Folder of a few textures."""
+    folder = tmpdir.mkdir("textures")
+    for name in ("a.exr", "b.exr", "diffuse.1001.tx", "diffuse.1002.tx",
+                 "empty.exr"):
+        folder.join(name).write("" if name == "empty.exr" else name)
+    folder.mkdir("sub")
+    return folder
+
+
+def test_lookups_list_each_folder_once(textures):
+    """Test the lookups of a folder are answered from one listing."""
+    index = DirectoryIndex()
+
+    assert index.exists(str(textures.join("a.exr")))
+    assert index.isfile(str(textures.join("b.exr")))
+    assert not index.exists(str(textures.join("missing.exr")))
+    assert index.isdir(str(textures.join("sub")))
+    assert not index.isfile(str(textures.join("sub")))
+    assert index.getsize(str(textures.join("a.exr"))) == 5
+    assert index.stat(str(textures.join("missing.exr"))) is None
+    assert index.stats["listings"] == 1
+    assert index.exists(os.path.abspath(os.sep))
+
+
+def test_stats_counted_across_threads(textures):
+    """Test every lookup of many threads is counted."""
+    index = DirectoryIndex(recheck=3600)
+    path = str(textures.join("a.exr"))
+    index.exists(path)
+
+    with futures.ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: index.exists(path), range(8000)))
+
+    assert index.stats["hits"] == 8000
+    assert index.stats["listings"] == 1
+
+
+def test_missing_folder(tmpdir):
+    """Test the files of a missing folder do not exist."""
+    index = DirectoryIndex()
+    folder = str(tmpdir.join("nowhere"))
+
+    assert not index.exists(os.path.join(folder, "a.exr"))
+    with pytest.raises(OSError):
+        index.list_folder(folder)
+
+
+@pytest.mark.parametrize("recheck, expected", [(0, True), (3600, False)])
+def test_recheck_by_folder_mtime(textures, recheck, expected):
+    """Test a new file is seen once the folder mtime is checked."""
+    index = DirectoryIndex(recheck=recheck)
+    new_path = str(textures.join("new.exr"))
+    assert not index.exists(new_path)
+
+    textures.join("new.exr").write("new")
+    # Make sure the mtime moves on file systems with a coarse clock.
+    stat = os.stat(str(textures))
+    os.utime(str(textures), ns=(stat.st_atime_ns,
+                                stat.st_mtime_ns + 10 ** 9))
+
+    assert index.exists(new_path) is expected
+
+
+def test_ttl_drops_listings(textures):
+    """Test an expired listing sees a file changed in place."""
+    index = DirectoryIndex(ttl=0, recheck=3600)
+    path = str(textures.join("a.exr"))
+    assert index.getsize(path) == 5
+
+    textures.join("a.exr").write("longer content")
+
+    assert index.getsize(path) == 14
+    assert index.stats["listings"] == 2
+
+
+def test_max_folders(tmpdir):
+    """Test the least recently used listings are dropped."""
+    index = DirectoryIndex(max_folders=2)
+    for name in ("a", "b", "c"):
+        tmpdir.mkdir(name).join("file").write(name)
+        assert index.exists(str(tmpdir.join(name, "file")))
+
+    index.invalidate(str(tmpdir.join("b")))
+    assert index.exists(str(tmpdir.join("a", "file")))
+    assert index.stats["listings"] == 4
+
+
+def test_max_entries(tmpdir):
+    """Test listings are dropped once they hold too many entries."""
+    index = DirectoryIndex(max_entries=3)
+    for name, files in (("a", 2), ("b", 1), ("c", 5)):
+        folder = tmpdir.mkdir(name)
+        for number in range(files):
+            folder.join("%d.exr" % number).write(name)
+        assert index.exists(str(folder.join("0.exr")))
+    assert index.stats["listings"] == 3
+
+    # The large listing is kept alone, the others are listed again.
+    assert index.exists(str(tmpdir.join("c", "4.exr")))
+    assert index.exists(str(tmpdir.join("b", "0.exr")))
+    assert index.stats["listings"] == 4
+
+
+@pytest.mark.parametrize("pattern", ["diffuse.<UDIM>.tx", "diffuse.####.tx",
+                                     "a.exr", "missing.####.tx"])
+def test_expand_sequence_with_index(textures, pattern):
+    """Test sequences expanded from a listing match the ones of glob."""
+    path = str(textures.join(pattern)).replace("\\", "/")
+    index = DirectoryIndex()
+
+    assert expand_sequence(path, index) == expand_sequence(path)
+
+
+def test_validate_files_share_an_index(textures):
+    """Test validations sharing an index list a folder once."""
+    index = DirectoryIndex()
+    paths = [str(textures.join(name))
+             for name in ("a.exr", "missing.exr", "empty.exr")]
+
+    for _ in range(3):
+        report = validate_files(paths, index=index)
+
+    assert report.missing == [paths[1]]
+    assert report.empty == [paths[2]]
+    assert index.stats["listings"] == 1
+
+
+def test_single_paths_not_listed(tmpdir, monkeypatch):
+    """Test the scene and workspace checks do not list their folders."""
+    from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+
+    listed = []
+    real_list = DirectoryIndex._list
+
+    def list_folder(self, folder):
+        listed.append(folder)
+        return real_list(self, folder)
+
+    monkeypatch.setattr(DirectoryIndex, "_list", list_folder)
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    previous = tmpdir.mkdir("previous")
+
+    AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3",
+                    workspace=str(tmpdir), previous_workspace=str(previous))
+
+    assert listed == []
@@ -0,0 +1,98 @@
+"""Test rayvision_clarisse.fingerprint model."""
+
+# pylint: disable=import-error
+import hashlib
+import os
+import sqlite3
+
+from rayvision_clarisse import fingerprint
+from rayvision_clarisse.fingerprint import FingerprintCache
+
+
+def test_hash_file_cached_until_changed(tmpdir, monkeypatch):
+    """Test an unchanged file is hashed once and a changed one again."""
+    cache = FingerprintCache(str(tmpdir.join("fingerprint.db")))
+    scene = tmpdir.join("scene.project")
+    scene.write("version 1")
+    calls = []
+    real_hash_file = fingerprint.hash_file
+
+    def counting_hash_file(*args, **kwargs):
+        calls.append(args[0])
+        return real_hash_file(*args, **kwargs)
+
+    monkeypatch.setattr(fingerprint, "hash_file", counting_hash_file)
+    digest = cache.hash_file(str(scene))
+    assert digest == hashlib.md5(b"version 1").hexdigest()
+    assert cache.hash_file(str(scene)) == digest
+    assert len(calls) == 1
+
+    scene.write("version 22")
+    assert cache.hash_file(str(scene)) == hashlib.md5(
+        b"version 22").hexdigest()
+    assert len(calls) == 2
+
+
+def test_cache_evicts_least_recently_used(tmpdir):
+    """Test the cache keeps at most max_entries fingerprints."""
+    cache = FingerprintCache(str(tmpdir.join("fingerprint.db")),
+                             max_entries=2, evict_every=1)
+    paths = []
+    for index in range(3):
+        path = tmpdir.join("file%d.txt" % index)
+        path.write(str(index))
+        paths.append(str(path))
+        cache.hash_file(str(path))
+    assert cache.get(paths[0]) is None
+    assert cache.get(paths[2]) is not None
+
+
+def test_missing_file_is_not_cached(tmpdir):
+    """Test a missing file gets no digest and no entry."""
+    cache = FingerprintCache(str(tmpdir.join("fingerprint.db")))
+    missing = os.path.join(str(tmpdir), "missing.project")
+    assert cache.hash_file(missing) is None
+    assert cache.get(missing) is None
+
+
+def test_open_cache_batches_writes(tmpdir):
+    """Test an open cache shares one connection and writes in batches."""
+    db_path = str(tmpdir.join("fingerprint.db"))
+    cache = FingerprintCache(db_path, max_entries=3, evict_every=2)
+    paths = []
+    for index in range(5):
+        path = tmpdir.join("file%d.txt" % index)
+        path.write(str(index))
+        paths.append(str(path))
+
+    with cache:
+        cache.hash_file(paths[0])
+        # Queued, not written yet.
+        assert FingerprintCache(db_path).get(paths[0]) is None
+        for path in paths[1:]:
+            cache.hash_file(path)
+        assert cache.get(paths[4]) is None
+
+    reader = FingerprintCache(db_path)
+    assert [reader.get(path) is not None for path in paths] == [
+        False, False, True, True, True]
+
+
+def test_fall_back_without_wal(tmpdir, monkeypatch):
+    """Test the default journal is used when WAL can not be enabled."""
+    cache = FingerprintCache(str(tmpdir.join("fingerprint.db")))
+    real_open = cache._open_connection
+
+    def open_connection(wal):
+        if wal:
+            raise sqlite3.OperationalError("disk I/O error")
+        return real_open(wal)
+
+    monkeypatch.setattr(cache, "_open_connection", open_connection)
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+
+    digest = cache.hash_file(str(scene))
+
+    assert cache.get(str(scene)) == digest
+    assert not cache._wal
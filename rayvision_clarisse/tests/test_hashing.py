@@ -0,0 +1,77 @@
+"""Test rayvision_clarisse.hashing model."""
+
+# pylint: disable=import-error
+import hashlib
+
+import pytest
+
+from rayvision_clarisse.fingerprint import FingerprintCache
+from rayvision_clarisse.hashing import hash_file
+from rayvision_clarisse.hashing import HashEngine
+
+
+@pytest.mark.parametrize("algorithm", ["md5", "sha1", "blake2b"])
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_hash_file(tmpdir, algorithm, use_mmap):
+    """Test small buffers and mmap give the hashlib digest."""
+    data = b"0123456789" * 1000
+    file_path = tmpdir.join("a.exr")
+    file_path.write_binary(data)
+    assert hash_file(str(file_path), algorithm, buffer_size=4096,
+                     use_mmap=use_mmap) == hashlib.new(
+                         algorithm, data).hexdigest()
+
+
+def test_hash_file_empty(tmpdir):
+    """Test an empty file can be mapped."""
+    file_path = tmpdir.join("empty.exr")
+    file_path.write_binary(b"")
+    assert hash_file(str(file_path), use_mmap=True) == hashlib.md5(
+    ).hexdigest()
+
+
+def test_hash_manifest(tmpdir):
+    """Test every entry gets a hash and cached files are not read again."""
+    entries = []
+    for index in range(5):
+        file_path = tmpdir.join("%d.exr" % index)
+        file_path.write_binary(b"x" * (index + 1))
+        entries.append({"local": str(file_path), "server": ""})
+    engine = HashEngine("sha1", max_workers=3,
+                        fingerprint_cache=FingerprintCache(
+                            str(tmpdir.join("fingerprint.db"))))
+
+    stats = engine.hash_manifest(entries)
+
+    assert entries[2]["hash"] == hashlib.sha1(b"xxx").hexdigest()
+    assert (stats["files"], stats["bytes"], stats["cached_files"]) == (
+        5, 15, 0)
+    stats = engine.hash_manifest(entries)
+    assert (stats["bytes"], stats["cached_files"]) == (0, 5)
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_hash_missing_file(tmpdir, use_mmap):
+    """Test a file that can not be read gets no digest."""
+    assert hash_file(str(tmpdir.join("missing.exr")),
+                     use_mmap=use_mmap) is None
+    assert hash_file(str(tmpdir), use_mmap=use_mmap) is None
+
+
+def test_hash_manifest_missing_file(tmpdir):
+    """Test an entry of a missing file gets no hash."""
+    tmpdir.join("a.exr").write_binary(b"a")
+    entries = [{"local": str(tmpdir.join("a.exr"))},
+               {"local": str(tmpdir.join("missing.exr")), "hash": "old"}]
+
+    stats = HashEngine().hash_manifest(entries)
+
+    assert entries[0]["hash"] == hashlib.md5(b"a").hexdigest()
+    assert "hash" not in entries[1]
+    assert (stats["files"], stats["bytes"]) == (2, 1)
+
+
+def test_unsupported_algorithm():
+    """Test only the supported algorithms can be selected."""
+    with pytest.raises(Exception):
+        HashEngine("crc32")
@@ -0,0 +1,27 @@
+"""Test importing rayvision_clarisse stays cheap."""
+
+# pylint: disable=import-error
+import subprocess
+import sys
+
+
+def test_import_does_not_load_heavy_dependencies():
+    """Test rayvision_utils and rayvision_log are imported on demand."""
+    script = ("import sys; import rayvision_clarisse.analyse_clarisse; "
+              "print(','.join(sorted(name for name in ("
+              "'pkg_resources', 'rayvision_utils', 'rayvision_log') "
+              "if name in sys.modules)))")
+    output = subprocess.check_output([sys.executable, "-c", script])
+    assert output.decode().strip() == ""
+
+
+def test_version_is_resolved_lazily():
+    """Test __version__ is still available."""
+    import rayvision_clarisse
+    assert rayvision_clarisse.__version__
+
+
+def test_unknown_attribute():
+    """Test other missing attributes still raise AttributeError."""
+    import rayvision_clarisse
+    assert not hasattr(rayvision_clarisse, "missing")
@@ -0,0 +1,256 @@
+"""Test rayvision_clarisse.incremental model."""
+
+# pylint: disable=import-error
+import os
+
+from rayvision_clarisse import analyse_clarisse
+from rayvision_clarisse.dir_index import DirectoryIndex
+from rayvision_clarisse import incremental
+from rayvision_clarisse import validate
+
+
+def test_update_assets_reports_delta(tmpdir):
+    """Test only changed assets are hashed again."""
+    same = tmpdir.join("same.exr")
+    same.write("same")
+    changed = tmpdir.join("changed.exr")
+    changed.write("old")
+    previous_assets = {
+        str(same): dict(incremental.stat_record(str(same)), hash="h1"),
+        str(changed): {"stat": [1, 1, 1], "hash": "h2"},
+        str(tmpdir.join("removed.exr")): {"stat": [1, 1, 1]},
+    }
+    rehashed = []
+
+    def rehash(paths):
+        rehashed.append(paths)
+        return {path: "new" for path in paths}
+
+    assets, delta = incremental.update_assets(
+        [str(same), str(changed), str(tmpdir.join("added.exr"))],
+        previous_assets, rehash)
+
+    assert rehashed == [[str(changed)]]
+    assert assets[str(same)]["hash"] == "h1"
+    assert assets[str(changed)]["hash"] == "new"
+    assert delta == {
+        "added": [str(tmpdir.join("added.exr"))],
+        "changed": [str(changed)],
+        "removed": [str(tmpdir.join("removed.exr"))],
+        "missing": [str(tmpdir.join("added.exr"))],
+        "unchanged": 1,
+    }
+
+
+def test_changed_assets_hashed_in_batches(tmpdir):
+    """Test the changed assets are hashed with one call per batch."""
+    paths = []
+    for index in range(5):
+        texture = tmpdir.join("%d.exr" % index)
+        texture.write("new")
+        paths.append(str(texture))
+    previous_assets = {path: {"stat": [1, 1, 1], "hash": "old"}
+                       for path in paths}
+    calls = []
+
+    def rehash(batch):
+        calls.append(batch)
+        return {path: "new" for path in batch}
+
+    records = list(incremental.iter_asset_records(
+        ((path, None) for path in paths), previous_assets, rehash,
+        incremental.new_delta(), batch_size=2))
+
+    assert calls == [paths[:2], paths[2:4], paths[4:]]
+    assert [path for path, _ in records] == paths
+    assert all(record["hash"] == "new" for _, record in records)
+
+
+def test_scene_hashed_once_per_analysis(tmpdir, monkeypatch):
+    """Test the scene is read once by an incremental analysis."""
+    scene = tmpdir.join("scene.project")
+    scene.write('TextureMapFile "a" { filename "a.exr" }\n')
+    tmpdir.join("a.exr").write("pixels")
+    first = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("first")), incremental=True)
+    first.analyse(mode="fast")
+    scene.write('TextureMapFile "a" { filename "a.exr" }\n\n')
+    hashed = []
+    real_get_file_md5 = analyse_clarisse.AnalyzeClarisse.get_file_md5
+
+    def get_file_md5(self, file_path):
+        hashed.append(file_path)
+        return real_get_file_md5(self, file_path)
+
+    monkeypatch.setattr(analyse_clarisse.AnalyzeClarisse, "get_file_md5",
+                        get_file_md5)
+    second = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("second")),
+        previous_workspace=first.workspace)
+    second.analyse(mode="fast")
+
+    assert hashed == [str(scene)]
+
+
+def test_analyse_reuses_previous_workspace(tmpdir, fake_analyzer):
+    """Test an unchanged scene reuses the previous result."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    texture = tmpdir.join("a.exr")
+    texture.write("pixels")
+    calls = fake_analyzer([str(texture)])
+    first = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("first")), incremental=True)
+    first.analyse()
+    texture.write("new pixels")
+    second = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("second")),
+        previous_workspace=first.workspace)
+    second.analyse()
+
+    assert len(calls) == 1
+    assert second.delta["changed"] == [str(texture)]
+    assert second.delta["unchanged"] == 1
+    assert os.path.exists(os.path.join(second.workspace,
+                                       incremental.DELTA_FILE))
+    assert len(second.upload_info["asset"]) == 2
+
+
+def test_changed_scene_seen_through_a_shared_index(tmpdir, fake_analyzer):
+    """Test the scene is stat directly, not from a shared index."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    calls = fake_analyzer()
+    workspaces = [str(tmpdir.mkdir(name)) for name in ("first", "second")]
+    index = DirectoryIndex(ttl=3600, recheck=3600)
+    first = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3", dir_index=index,
+        workspace=workspaces[0], incremental=True)
+    first.analyse()
+    scene.write("SCENE")
+    os.utime(str(scene), (1, 1))
+    second = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3", dir_index=index,
+        workspace=workspaces[1], previous_workspace=first.workspace)
+    second.analyse()
+
+    assert len(calls) == 2
+    assert incremental.load_state(second.workspace)["scene"]["stat"][1] == (
+        1000000000)
+
+
+def test_changed_reference_is_analysed_again(tmpdir, fake_analyzer):
+    """Test the result is not reused when a referenced project changed."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    reference = tmpdir.join("set.project")
+    reference.write("set")
+    calls = fake_analyzer([str(reference)])
+    first = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("first")), incremental=True)
+    first.analyse()
+    reference.write("set with a new object")
+    second = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("second")),
+        previous_workspace=first.workspace)
+    second.analyse()
+
+    assert calls == [first.workspace, second.workspace]
+    assert second.delta["changed"] == [str(reference)]
+
+
+def test_state_only_saved_when_incremental(tmpdir, fake_analyzer):
+    """Test a plain analysis does not stat its assets for a state."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    fake_analyzer()
+    analyze_obj = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3", workspace=str(tmpdir))
+    analyze_obj.analyse()
+
+    assert not os.path.exists(os.path.join(analyze_obj.workspace,
+                                           incremental.STATE_FILE))
+    assert "update_state" not in analyze_obj.metrics["phases"]
+
+
+def test_streamed_upload_state_is_not_loaded(tmpdir, fake_analyzer):
+    """Test the state of a streamed upload.json is written as it is read."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    tmpdir.join("a.exr").write("a")
+    assets = [str(tmpdir.join("a.exr")), str(tmpdir.join("missing.exr"))]
+    fake_analyzer(assets)
+    analyze_obj = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3", workspace=str(tmpdir),
+        stream_upload=True, incremental=True)
+    analyze_obj.analyse()
+
+    assert not analyze_obj.result.is_loaded("upload")
+    state = incremental.load_state(analyze_obj.workspace)
+    assert sorted(state["assets"]) == sorted(assets + [
+        str(scene).replace("\\", "/")])
+    assert state["assets"][assets[1]] == {"stat": None}
+    assert state["scene"]["path"] == str(scene).replace("\\", "/")
+
+
+def test_reused_hashes_of_changed_files_are_recomputed(tmpdir, fake_analyzer):
+    """Test a changed file gets a new hash in the state of a reused result."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    texture = tmpdir.join("a.exr")
+    texture.write("pixels")
+    fake_analyzer([str(texture)])
+    first = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("first")), hash_assets=True,
+        incremental=True)
+    first.analyse()
+    old_hash = first.upload_info["asset"][0]["hash"]
+    texture.write("new pixels")
+    second = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("second")),
+        previous_workspace=first.workspace)
+    second.analyse()
+
+    state = incremental.load_state(second.workspace)
+    assert state["assets"][str(texture)]["hash"] not in (None, old_hash)
+
+
+def test_reused_result_validates_changed_assets(tmpdir, monkeypatch,
+                                               fake_analyzer):
+    """Test only the assets changed since the reused result are checked."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    same = tmpdir.join("same.exr")
+    same.write("same")
+    changed = tmpdir.join("changed.exr")
+    changed.write("old")
+    checked = []
+
+    def fake_validate_files(paths, max_workers=16, index=None):
+        checked.append(sorted(paths))
+        return validate.validate_files([], max_workers, index)
+
+    fake_analyzer([str(same), str(changed)])
+    first = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("first")), validate_assets=True,
+        incremental=True)
+    first.analyse()
+    changed.write("new pixels")
+    monkeypatch.setattr(analyse_clarisse, "validate_files",
+                        fake_validate_files)
+    second = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3",
+        workspace=str(tmpdir.mkdir("second")), validate_assets=True,
+        previous_workspace=first.workspace)
+    second.analyse()
+
+    assert checked == [[str(changed)]]
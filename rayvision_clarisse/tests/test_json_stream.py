@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+"""Test rayvision_clarisse.json_stream functions."""
+
+# pylint: disable=import-error
+import json
+import os
+
+import pytest
+
+from rayvision_clarisse.json_stream import iter_json_items
+from rayvision_clarisse.json_stream import JsonStreamWriter
+
+DOCUMENT = {
+    "asset": [{"local": u"D:/贴图/a.exr", "size": 123456789},
+              {"local": "D:/tex/b.exr", "size": 0.5, "hash": None}],
+    "empty": [],
+    "count": 1234567,
+    "scene": [True, False, "D:/scene.project"],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 65536])
+def test_iter_json_items(tmpdir, chunk_size):
+    """Test items are read across chunk boundaries."""
+    json_path = tmpdir.join("upload.json")
+    json_path.write_text(json.dumps(DOCUMENT, indent=2, ensure_ascii=False),
+                         "utf-8")
+
+    items = list(iter_json_items(str(json_path), chunk_size=chunk_size))
+
+    assert items == ([("asset", item) for item in DOCUMENT["asset"]] +
+                     [("count", 1234567)] +
+                     [("scene", item) for item in DOCUMENT["scene"]])
+    assert list(iter_json_items(str(json_path), keys=["scene"],
+                                chunk_size=chunk_size))[-1] == (
+                                    "scene", "D:/scene.project")
+
+
+def test_iter_json_items_invalid(tmpdir):
+    """Test a file that is not a json object raises ValueError."""
+    json_path = tmpdir.join("upload.json")
+    json_path.write('{"asset": [{"local": "a"}')
+    with pytest.raises(ValueError):
+        list(iter_json_items(str(json_path)))
+
+
+def test_json_stream_writer(tmpdir):
+    """Test the written file is complete json, and only once closed."""
+    json_path = str(tmpdir.join("upload.json"))
+    with JsonStreamWriter(json_path) as writer:
+        writer.extend("empty", ())
+        for item in DOCUMENT["asset"]:
+            writer.append("asset", item)
+        writer.write("count", 1234567)
+        writer.extend("scene", DOCUMENT["scene"])
+        assert not os.path.exists(json_path)
+
+    with open(json_path, "rb") as json_f:
+        assert json.loads(json_f.read().decode("utf-8")) == DOCUMENT
+    assert writer.count == 5
+    with pytest.raises(Exception):
+        with JsonStreamWriter(json_path) as writer:
+            writer.append("asset", {})
+            writer.write("asset", [])
+    assert os.listdir(str(tmpdir)) == ["upload.json"]
+
+
+def test_json_stream_writer_items(tmpdir):
+    """Test an object member is written pair by pair."""
+    json_path = str(tmpdir.join("asset_state.json"))
+    with JsonStreamWriter(json_path) as writer:
+        writer.write("scene", {"path": "D:/scene.project"})
+        writer.write_items("assets", iter([("D:/a.exr", {"stat": None}),
+                                           ("D:/b.exr", {"hash": "1"})]))
+        writer.write_items("empty", ())
+
+    with open(json_path, "rb") as json_f:
+        assert json.loads(json_f.read().decode("utf-8")) == {
+            "scene": {"path": "D:/scene.project"},
+            "assets": {"D:/a.exr": {"stat": None}, "D:/b.exr": {"hash": "1"}},
+            "empty": {}}
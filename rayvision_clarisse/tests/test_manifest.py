@@ -0,0 +1,92 @@
+# -*- coding:utf-8 -*-
+"""Test rayvision_clarisse.manifest functions."""
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_clarisse.manifest import append_to_upload
+from rayvision_clarisse.manifest import normalize_local_path
+from rayvision_clarisse.manifest import stream_upload
+from rayvision_clarisse.manifest import UploadManifest
+from rayvision_utils import utils
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("d:\\work\\render/a.exr", "D:/work/render/a.exr"),
+    ("D://work//a.exr", "D:/work/a.exr"),
+    ("\\\\server\\share\\a.exr", "//server/share/a.exr"),
+    ("/mnt/work/a.exr", "/mnt/work/a.exr"),
+])
+def test_normalize_local_path(path, expected):
+    """Test equivalent local paths share one key."""
+    assert normalize_local_path(path) == expected
+
+
+def test_manifest_merges_duplicates():
+    """Test duplicates keep the first place and fill missing keys."""
+    manifest = UploadManifest([
+        {"local": "D:/tex/a.exr", "server": "/D/tex/a.exr"},
+        {"local": "D:/tex/b.exr", "server": "/D/tex/b.exr"},
+    ])
+    manifest.add("d:\\tex\\a.exr", size=6)
+    manifest.add("D:\\tex\\c.exr")
+
+    assert manifest.to_list() == [
+        {"local": "D:/tex/a.exr", "server": "/D/tex/a.exr", "size": 6},
+        {"local": "D:/tex/b.exr", "server": "/D/tex/b.exr"},
+        {"local": "D:/tex/c.exr", "server": "/D/tex/c.exr"},
+    ]
+    assert "D:/TEX/b.exr" not in manifest
+    assert "d:/tex/b.exr" in manifest
+
+
+def test_manifest_keeps_the_entries(tmpdir):
+    """Test the added dicts are completed in place, not copied."""
+    texture = tmpdir.join("a.exr")
+    texture.write("pixels")
+    entries = [{"local": str(texture)}, {"local": str(tmpdir.join("b.exr"))}]
+
+    manifest = UploadManifest(entries)
+    manifest.fill_sizes(chunk_size=1)
+
+    assert all(kept is entry for kept, entry in zip(manifest.to_list(),
+                                                     entries))
+    assert entries[0]["size"] == 6 and entries[0]["server"]
+    assert "size" not in entries[1]
+
+
+def test_append_to_upload_skips_listed_files(tmpdir):
+    """Test append_to_upload does not list a file twice."""
+    texture = tmpdir.join("a.exr")
+    texture.write("pixels")
+    upload_json = str(tmpdir.join("upload.json"))
+    utils.json_save(upload_json, {"asset": [
+        {"local": str(texture).replace("\\", "/"), "server": "/a.exr"}]})
+
+    append_to_upload([str(texture), str(texture)], upload_json)
+
+    assert len(utils.json_load(upload_json)["asset"]) == 1
+    with pytest.raises(Exception):
+        append_to_upload(str(tmpdir.join("missing.exr")), upload_json)
+
+
+def test_stream_upload_matches_manifest(tmpdir):
+    """Test the streamed upload.json has the entries of UploadManifest."""
+    upload_json = str(tmpdir.join("upload.json"))
+    entries = [{"local": "D:/tex/{}.exr".format(index % 5),
+                "server": "/D/tex/{}.exr".format(index % 5)}
+               for index in range(12)]
+    utils.json_save(upload_json, {"asset": entries})
+
+    count, hash_stats = stream_upload(
+        upload_json, upload_json, extra_paths=["d:\\tex\\1.exr",
+                                               "D:\\scene.project"],
+        scene_entries=[{"local": "D:/scene.project"}], chunk_size=2)
+
+    expected = UploadManifest(entries)
+    expected.add("D:\\scene.project")
+    assert count == 6
+    assert hash_stats == {}
+    assert utils.json_load(upload_json) == {
+        "asset": expected.to_list(),
+        "scene": [{"local": "D:/scene.project"}]}
@@ -0,0 +1,170 @@
+"""Test rayvision_clarisse.metrics model."""
+
+# pylint: disable=import-error
+import json
+import os
+import stat
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+from rayvision_clarisse.metrics import merge_record
+from rayvision_clarisse.metrics import PhaseMetrics
+from rayvision_clarisse.metrics import STATS_FILE
+from rayvision_clarisse.runner import wait_process
+
+STUB_ANALYZER = """#!{python}
+import json
+import os
+import sys
+import time
+
+task_json = sys.argv[sys.argv.index("-tj") + 1]
+workspace = os.path.dirname(task_json)
+end = time.process_time() + 0.2
+while time.process_time() < end:
+    pass
+for name in ("task.json", "asset.json", "tips.json"):
+    with open(os.path.join(workspace, name), "w") as json_f:
+        json.dump({{}}, json_f)
+with open(os.path.join(workspace, "upload.json"), "w") as json_f:
+    json.dump({{"asset": []}}, json_f)
+"""
+
+
+def test_phase_records_usage():
+    """Test a phase records the time, bytes and memory it used."""
+    records = []
+    recorder = PhaseMetrics(hook=lambda phase, record: records.append(phase))
+
+    with recorder.total():
+        with recorder.phase("run"):
+            # Another child of the process is not counted as the analyzer.
+            subprocess.call([sys.executable, "-c", "pass"])
+
+    record = recorder.metrics["phases"]["run"]
+    assert records == ["run", "total"]
+    assert record["wall"] > 0 and record["calls"] == 1
+    assert record["analyzer_cpu"] is None
+    assert recorder.metrics["total"]["wall"] >= record["wall"]
+    assert "peak_rss" not in record and "read_bytes" not in record
+    if os.name != "nt":
+        assert recorder.metrics["total"]["process"]["peak_rss"] > 0
+
+
+def test_phase_cpu_is_of_its_thread():
+    """Test a phase does not count the cpu time of other threads."""
+    recorder = PhaseMetrics()
+    started = threading.Event()
+    stop = threading.Event()
+
+    def spin():
+        started.set()
+        while not stop.is_set():
+            pass
+
+    thread = threading.Thread(target=spin)
+    thread.start()
+    started.wait()
+    try:
+        with recorder.total():
+            with recorder.phase("sleep"):
+                time.sleep(0.3)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert recorder.metrics["phases"]["sleep"]["cpu"] < 0.1
+    assert "cpu" not in recorder.metrics["total"]
+    assert recorder.metrics["total"]["process"]["cpu"] >= 0.1
+
+
+def test_analyzer_usage_goes_to_open_phases():
+    """Test the usage of an analyzer is added to the phases around it."""
+    recorder = PhaseMetrics()
+    usage = {"cpu": 1.5, "peak_rss": 100}
+
+    with recorder.total():
+        with recorder.phase("analyze"):
+            recorder.add_analyzer_usage(usage)
+            recorder.add_analyzer_usage(dict(usage, peak_rss=50))
+        with recorder.phase("flush"):
+            pass
+
+    phases = recorder.metrics["phases"]
+    assert phases["analyze"]["analyzer_cpu"] == 3.0
+    assert phases["analyze"]["analyzer_peak_rss"] == 100
+    assert phases["flush"]["analyzer_cpu"] is None
+    assert recorder.metrics["total"]["analyzer_cpu"] == 3.0
+
+
+@pytest.mark.skipif(not hasattr(os, "wait4"), reason="needs os.wait4")
+def test_wait_process_reads_its_usage():
+    """Test the usage of one process is read when it ends."""
+    process = subprocess.Popen([
+        sys.executable, "-c",
+        "import time\nend = time.process_time() + 0.2\n"
+        "while time.process_time() < end: pass\nraise SystemExit(3)"])
+
+    code, usage = wait_process(process)
+
+    assert code == 3 and process.returncode == 3
+    assert usage["cpu"] >= 0.2 and usage["peak_rss"] > 0
+
+
+def test_phase_adds_up_runs_and_survives_hook_errors():
+    """Test the runs of a phase are added up and a bad hook is ignored."""
+    def hook(phase, record):
+        raise ValueError(phase)
+
+    recorder = PhaseMetrics(hook=hook)
+    for _ in range(3):
+        with recorder.phase("load_json"):
+            pass
+
+    assert recorder.metrics["phases"]["load_json"]["calls"] == 3
+    recorder.reset()
+    assert recorder.metrics == {"phases": {}, "total": None}
+
+
+@pytest.mark.parametrize("record, other, expected", [
+    ({"wall": 1.0, "cpu": 0.5, "analyzer_cpu": None,
+      "analyzer_peak_rss": None, "calls": 1},
+     {"wall": 2.0, "cpu": 0.5, "analyzer_cpu": 1.0,
+      "analyzer_peak_rss": 50, "calls": 1},
+     {"wall": 3.0, "cpu": 1.0, "analyzer_cpu": 1.0,
+      "analyzer_peak_rss": 50, "calls": 2}),
+])
+def test_merge_record(record, other, expected):
+    """Test merging the records of two runs of a phase."""
+    assert merge_record(record, other) == expected
+
+
+@pytest.mark.skipif(os.name == "nt", reason="stub analyzer needs a shebang")
+def test_analyse_writes_stats(tmpdir):
+    """Test analyse measures its phases and saves them to stats.json."""
+    analyzer = tmpdir.join("analyzer.py")
+    analyzer.write(STUB_ANALYZER.format(python=sys.executable))
+    os.chmod(str(analyzer), stat.S_IRWXU)
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    pushed = []
+    analyze_obj = AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3", workspace=str(tmpdir),
+        custom_exe_path=str(analyzer),
+        metrics_hook=lambda phase, record: pushed.append(phase))
+
+    analyze_obj.analyse()
+
+    phases = analyze_obj.metrics["phases"]
+    assert {"write_task_json", "analyze", "load_json", "gather_upload",
+            "flush"} <= set(phases)
+    assert phases["analyze"]["analyzer_cpu"] >= 0.2
+    assert pushed[-1] == "total"
+    with open(os.path.join(analyze_obj.workspace, STATS_FILE)) as stats_f:
+        assert json.load(stats_f) == json.loads(
+            json.dumps(analyze_obj.metrics))
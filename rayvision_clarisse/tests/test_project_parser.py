@@ -0,0 +1,118 @@
+# -*- coding:utf-8 -*-
+"""Test rayvision_clarisse.project_parser functions."""
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_clarisse import project_parser
+from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+
+SCENE_PROJECT = """#Isotropix_Serial_Version 1.2
+#Isotropix_Clarisse_Version 4.0 SP3
+Context "scene" {
+    TextureMapFile "diffuse.exr" {
+        filename "$PDIR/textures/diffuse.<UDIM>.tx"
+        color_space_auto_detect yes
+    }
+    GeometryBundleAlembic "character" {
+        filename "cache/character.abc"
+        frame_rate 24
+    }
+    GeometryVolumeFile "smoke" { filename "cache/smoke.####.vdb" }
+    Context "set" {
+        filename "$PDIR/set.project"
+    }
+    Material "note" {
+        comment "see D:/docs/readme.txt"
+        extra_maps { "$PDIR/textures/spec.exr" "$PDIR/textures/missing.exr" }
+    }
+}
+"""
+
+SET_PROJECT = """#Isotropix_Serial_Version 1.2
+Context "set" {
+    TextureMapFile "ground" {
+        filename "$PDIR/textures/ground.tx"
+    }
+    Context "scene" {
+        filename "$PDIR/scene.project"
+    }
+}
+"""
+
+
+@pytest.fixture()
+def scene_project(tmpdir):
+    """Create a synthetic project, the set it references and its files."""
+    tmpdir.join("scene.project").write(SCENE_PROJECT)
+    tmpdir.join("set.project").write(SET_PROJECT)
+    textures = tmpdir.mkdir("textures")
+    for name in ["diffuse.1001.tx", "diffuse.1002.tx", "diffuse.v1.tx",
+                 "spec.exr", "ground.tx"]:
+        textures.join(name).write(name)
+    cache = tmpdir.mkdir("cache")
+    cache.join("character.abc").write("abc")
+    for frame in range(1, 4):
+        cache.join("smoke.%04d.vdb" % frame).write("vdb")
+    return tmpdir
+
+
+@pytest.mark.parametrize("line, tokens", [
+    ('filename "D:/a b/c.exr"', [("filename", False),
+                                 ("D:/a b/c.exr", True)]),
+    ('Context "set" {', [("Context", False), ("set", True), ("{", False)]),
+    ('#Isotropix_Serial_Version 1.2', []),
+    ('name "say \\"hi\\""', [("name", False), ('say "hi"', True)]),
+])
+def test_tokenize_line(line, tokens):
+    """Test tokenize_line splits words, strings and braces."""
+    assert project_parser.tokenize_line(line) == tokens
+
+
+def test_iter_references_follows_referenced_projects(scene_project):
+    """Test every referenced file is found once across projects."""
+    root = str(scene_project).replace("\\", "/")
+    references = list(project_parser.iter_references(
+        str(scene_project.join("scene.project"))))
+    paths = [reference.path for reference in references]
+    assert paths == [
+        root + "/textures/diffuse.<UDIM>.tx",
+        root + "/cache/character.abc",
+        root + "/cache/smoke.####.vdb",
+        root + "/set.project",
+        root + "/textures/spec.exr",
+        root + "/textures/missing.exr",
+        root + "/textures/ground.tx",
+        root + "/scene.project",
+    ]
+    assert references[1].kind == "cache"
+    assert references[1].object_name == "character"
+    assert references[3].kind == "reference"
+
+
+def test_expand_sequence(scene_project):
+    """Test sequence paths expand to the numbered files only."""
+    root = str(scene_project).replace("\\", "/")
+    assert project_parser.expand_sequence(
+        root + "/textures/diffuse.<UDIM>.tx") == [
+            root + "/textures/diffuse.1001.tx",
+            root + "/textures/diffuse.1002.tx"]
+    assert len(project_parser.expand_sequence(
+        root + "/cache/smoke.####.vdb")) == 3
+    assert project_parser.expand_sequence(
+        root + "/textures/missing.exr") == []
+
+
+@pytest.mark.parametrize("stream_upload", [False, True])
+def test_analyse_fast_mode(scene_project, stream_upload):
+    """Test the fast mode writes the result files without the analyzer."""
+    analyze_obj = AnalyzeClarisse(str(scene_project.join("scene.project")),
+                                  "clarisse_ifx_4.0_sp3",
+                                  workspace=str(scene_project),
+                                  stream_upload=stream_upload)
+    analyze_obj.analyse(mode="fast")
+
+    assert len(analyze_obj.asset_info["texture"]) == 4
+    assert analyze_obj.tips_info["25009"][0].endswith("missing.exr")
+    # 2 udim tiles, spec, ground, abc, 3 vdb frames and 2 projects.
+    assert len(analyze_obj.upload_info["asset"]) == 10
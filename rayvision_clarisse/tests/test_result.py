@@ -0,0 +1,87 @@
+"""Test rayvision_clarisse.result model."""
+
+# pylint: disable=import-error
+import json
+import os
+
+import pytest
+
+from rayvision_clarisse import result as result_module
+from rayvision_clarisse.result import AnalysisResult
+
+
+def test_flush_writes_only_dirty_documents(tmpdir):
+    """Test unchanged documents are not written again."""
+    tmpdir.join("asset.json").write('{"texture": []}')
+    analysis_result = AnalysisResult(str(tmpdir))
+    assert analysis_result.get("asset") == {"texture": []}
+    analysis_result.get("tips")["25009"] = ["a.exr"]
+    analysis_result.mark_dirty("tips")
+
+    assert analysis_result.flush() == ["tips"]
+    assert analysis_result.flush() == []
+    assert json.loads(tmpdir.join("tips.json").read()) == {
+        "25009": ["a.exr"]}
+    assert sorted(os.listdir(str(tmpdir))) == ["asset.json", "tips.json"]
+
+
+def test_sync_from_disk_merges_dirty_documents(tmpdir):
+    """Test in-memory changes win over the files of the analyzer."""
+    analysis_result = AnalysisResult(str(tmpdir))
+    analysis_result.get("asset")
+    analysis_result.set("tips", {"15000": ["memory"]})
+    tmpdir.join("tips.json").write('{"15000": ["disk"], "25009": ["a"]}')
+    tmpdir.join("asset.json").write('{"texture": ["b.exr"]}')
+
+    analysis_result.sync_from_disk()
+
+    assert analysis_result.get("tips") == {"15000": ["memory"],
+                                           "25009": ["a"]}
+    assert analysis_result.get("asset") == {"texture": ["b.exr"]}
+    assert analysis_result.is_dirty("tips")
+
+
+def test_atomic_write_keeps_target_on_error(tmpdir, monkeypatch):
+    """Test a failed write leaves the previous file and no temporary."""
+    target = tmpdir.join("upload.json")
+    target.write('{"asset": []}')
+
+    def broken_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(result_module.os, "replace", broken_replace)
+    with pytest.raises(OSError):
+        result_module.json_dump_atomic(str(target), {"asset": [1]})
+
+    assert target.read() == '{"asset": []}'
+    assert os.listdir(str(tmpdir)) == ["upload.json"]
+
+
+def test_analyzer_tips_do_not_read_previous_tips(tmpdir, monkeypatch):
+    """Test tips of the output are not merged into a stale tips.json."""
+    from rayvision_clarisse import analyse_clarisse
+    from rayvision_clarisse.constants import MISSING_ASSET_CODE
+
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+
+    def fake_run_analyzer(self, parser):
+        tips_json = self.result.path("tips")
+        with open(tips_json, "w") as tips_f:
+            tips_f.write('{"999": ["previous analysis"]}')
+        parser.feed("Reference file not found: D:/tex/missing.exr")
+        for name in ("task", "asset", "tips"):
+            with open(self.result.path(name), "w") as json_f:
+                json_f.write("{}")
+        with open(self.result.path("upload"), "w") as json_f:
+            json_f.write('{"asset": []}')
+        return 0, False
+
+    monkeypatch.setattr(analyse_clarisse.AnalyzeClarisse, "run_analyzer",
+                        fake_run_analyzer)
+    analyze_obj = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3", workspace=str(tmpdir))
+    analyze_obj.analyse(no_upload=True)
+
+    assert analyze_obj.tips_info == {
+        MISSING_ASSET_CODE: ["D:/tex/missing.exr"]}
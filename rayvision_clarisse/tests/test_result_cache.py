@@ -0,0 +1,121 @@
+"""Test rayvision_clarisse.result_cache model."""
+
+# pylint: disable=import-error
+import os
+
+from rayvision_clarisse import analyse_clarisse
+from rayvision_clarisse import result_cache
+from rayvision_clarisse.result_cache import iter_referenced_paths
+from rayvision_clarisse.result_cache import ResultCache
+from rayvision_utils import utils
+
+
+def test_iter_referenced_paths():
+    """Test asset paths are collected from asset.json and upload.json."""
+    asset_info = {"texture": {"files": ["D:/tex/a.exr", "not a path"]},
+                  "count": 3}
+    upload_info = {"asset": [{"local": "D:/tex/b.exr", "server": "/D/tex"},
+                             {"local": "D:/tex/a.exr", "server": "/D/tex"}]}
+    assert list(iter_referenced_paths(asset_info, upload_info)) == [
+        "D:/tex/b.exr", "D:/tex/a.exr"]
+
+
+def test_analyse_skips_analyzer_on_hit(tmpdir, fake_analyzer):
+    """Test the second analysis of an unchanged scene hits the cache."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    texture = tmpdir.join("a.exr")
+    texture.write("pixels")
+    calls = fake_analyzer([str(texture)], {"texture": [str(texture)]})
+
+    def analyse():
+        analyze_obj = analyse_clarisse.AnalyzeClarisse(
+            str(scene), "clarisse_ifx_4.0_sp3", workspace=str(tmpdir),
+            result_cache=str(tmpdir.join("cache")))
+        analyze_obj.analyse()
+        return analyze_obj
+
+    first = analyse()
+    second = analyse()
+    assert len(calls) == 1
+    assert second.asset_info == first.asset_info
+    assert len(second.upload_info["asset"]) == 2
+
+    texture.write("new pixels")
+    analyse()
+    assert len(calls) == 2
+
+
+def test_lookup_misses_when_asset_appears(tmpdir):
+    """Test an entry recorded with a missing asset is invalid once it exists.
+    """
+    workspace = tmpdir.mkdir("workspace")
+    texture = str(tmpdir.join("late.exr"))
+    utils.json_save(str(workspace.join("task.json")), {})
+    utils.json_save(str(workspace.join("tips.json")), {})
+    utils.json_save(str(workspace.join("asset.json")), {})
+    utils.json_save(str(workspace.join("upload.json")), {"asset": [
+        {"local": texture, "server": texture}]})
+    cache = ResultCache(str(tmpdir.join("cache")))
+    key = cache.make_key("scene", "exe", "4.0", {})
+    cache.store(key, str(workspace))
+    assert cache.lookup(key)
+
+    with open(texture, "w") as texture_f:
+        texture_f.write("pixels")
+    assert cache.lookup(key) is None
+
+
+def _write_result(workspace, upload=True):
+    """Write the result files of an analysis without assets."""
+    for name in ("task.json", "tips.json", "asset.json"):
+        utils.json_save(str(workspace.join(name)), {})
+    if upload:
+        utils.json_save(str(workspace.join("upload.json")), {"asset": []})
+
+
+def test_store_without_upload(tmpdir):
+    """Test a result without upload.json is stored and restored."""
+    workspace = tmpdir.mkdir("workspace")
+    _write_result(workspace, upload=False)
+    cache = ResultCache(str(tmpdir.join("cache")))
+    key = cache.make_key("scene", "exe", "4.0", {})
+    cache.store(key, str(workspace))
+
+    target = tmpdir.mkdir("target")
+    _write_result(target)
+    assert cache.restore(key, str(target))
+    assert sorted(os.listdir(str(target))) == [
+        "asset.json", "task.json", "tips.json"]
+
+
+def test_store_replaces_an_entry(tmpdir):
+    """Test storing a key again replaces its entry in one rename."""
+    workspace = tmpdir.mkdir("workspace")
+    _write_result(workspace)
+    cache = ResultCache(str(tmpdir.join("cache")))
+    key = cache.make_key("scene", "exe", "4.0", {})
+    cache.store(key, str(workspace))
+    utils.json_save(str(workspace.join("tips.json")), {"999": ["new"]})
+
+    cache.store(key, str(workspace))
+
+    entry = cache.entry_path(key)
+    assert utils.json_load(os.path.join(entry, "tips.json")) == {
+        "999": ["new"]}
+    assert os.listdir(os.path.dirname(entry)) == [key]
+
+
+def test_restore_misses_a_replaced_entry(tmpdir, monkeypatch):
+    """Test a restore racing with a store is a miss, not an error."""
+    workspace = tmpdir.mkdir("workspace")
+    _write_result(workspace)
+    cache = ResultCache(str(tmpdir.join("cache")))
+    key = cache.make_key("scene", "exe", "4.0", {})
+    cache.store(key, str(workspace))
+
+    def copyfile(source, target):
+        raise IOError("No such file or directory: %s" % source)
+
+    monkeypatch.setattr(result_cache.shutil, "copyfile", copyfile)
+    assert not cache.restore(key, str(tmpdir.mkdir("target")))
@@ -0,0 +1,79 @@
+"""Test rayvision_clarisse.runner model."""
+
+# pylint: disable=import-error
+import sys
+import time
+
+import pytest
+
+from rayvision_clarisse.runner import AnalyzeOutputParser
+from rayvision_clarisse.runner import run_streaming
+
+
+def _python_cmd(script):
+    """Get a command running a python script."""
+    return [sys.executable, "-u", "-c", script]
+
+
+def test_parser_collects_tips_and_progress():
+    """Test reference and progress lines are handled while streaming."""
+    tips = {}
+    progress = []
+    lines = []
+    parser = AnalyzeOutputParser(
+        lambda code, info: tips.setdefault(code, []).append(info),
+        progress_callback=lambda percent, line: progress.append(percent),
+        line_hook=lines.append)
+    script = ("print('analyse 50%'); "
+              "print('Reference file not found in scene: D:/tex/a.exr'); "
+              "print('analyse 100%')")
+
+    code, aborted = run_streaming(_python_cmd(script), parser)
+
+    assert (code, aborted) == (0, False)
+    assert tips == {"25009": ["D:/tex/a.exr"]}
+    assert progress == [50.0, 100.0]
+    assert len(lines) == 3
+
+
+@pytest.mark.parametrize("line, tips, progress", [
+    ("analyse 42%", {}, [42.0]),
+    ("Progress: 12.5 %", {}, [12.5]),
+    # Percent signs in log text.
+    ("load texture D:/tex/100%.exr", {}, []),
+    ("[Analyze Error] render region 100%", {"999": ["render region 100%"]},
+     []),
+    # A fatal line matching another rule too.
+    ("[Analyze Error] Reference file not found: D:/a.exr",
+     {"999": ["Reference file not found: D:/a.exr"]}, []),
+])
+def test_parser_rules_before_progress(line, tips, progress):
+    """Test fatal lines come first and only progress lines give progress."""
+    found = {}
+    percents = []
+    parser = AnalyzeOutputParser(
+        lambda code, info: found.setdefault(code, []).append(info),
+        progress_callback=lambda percent, line: percents.append(percent),
+        fail_fast=True)
+
+    assert parser.feed(line) is bool(tips)
+    assert found == tips
+    assert percents == progress
+
+
+def test_fail_fast_stops_the_command():
+    """Test a fatal line terminates a long running command."""
+    tips = {}
+    parser = AnalyzeOutputParser(
+        lambda code, info: tips.setdefault(code, []).append(info),
+        fail_fast=True)
+    script = ("import time; print('[Analyze Error] bad scene'); "
+              "time.sleep(60)")
+    start = time.time()
+
+    _, aborted = run_streaming(_python_cmd(script), parser)
+
+    assert aborted
+    assert time.time() - start < 30
+    assert tips == {"999": ["bad scene"]}
+    assert parser.fatal_line == "[Analyze Error] bad scene"
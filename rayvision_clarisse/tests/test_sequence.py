@@ -0,0 +1,133 @@
+"""Test rayvision_clarisse.sequence model."""
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+from rayvision_clarisse.manifest import append_to_upload
+from rayvision_clarisse.sequence import collapse_entries
+from rayvision_clarisse.sequence import collapse_paths
+from rayvision_clarisse.sequence import format_frames
+from rayvision_clarisse.sequence import iter_expanded
+from rayvision_clarisse.sequence import parse_frames
+from rayvision_clarisse import utils
+
+
+def _entries(pattern, numbers, **extra):
+    """Get the upload entries of numbered files."""
+    entries = []
+    for number in numbers:
+        local = pattern % number
+        entry = {"local": local, "server": "/" + local.replace(":", "")}
+        for name, values in extra.items():
+            entry[name] = values[number]
+        entries.append(entry)
+    return entries
+
+
+@pytest.mark.parametrize("frames, text", [
+    ([1, 2, 3, 5], "1-3,5"),
+    ([0, 10, 11, 12, 13, 20], "0,10-13,20"),
+    ([7], "7"),
+    ([], ""),
+])
+def test_frames_round_trip(frames, text):
+    """Test numbers formatted as ranges and parsed back."""
+    assert format_frames(frames) == text
+    assert list(parse_frames(text)) == frames
+
+
+def test_collapse_frame_sequence():
+    """Test a cache sequence becomes one record and expands back."""
+    sizes = {frame: frame * 10 for frame in range(1, 101)}
+    entries = _entries("D:/cache/sim.%04d.vdb", range(1, 101), size=sizes)
+    entries.append({"local": "D:/scene/a.exr", "server": "/D/scene/a.exr"})
+
+    collapsed = collapse_entries(entries)
+
+    assert collapsed[0] == {
+        "local": "D:/cache/sim.####.vdb", "server": "/D/cache/sim.####.vdb",
+        "frames": "1-100", "sizes": [sizes[frame] for frame in sizes]}
+    assert collapsed[1] == entries[-1]
+    assert list(iter_expanded(collapsed)) == entries
+
+
+def test_collapse_udim_tiles():
+    """Test the tiles of a UDIM texture become one record."""
+    entries = _entries("D:/tex/diffuse.%d.exr", [1001, 1002, 1011],
+                       hash={1001: "a", 1002: "b", 1011: "c"})
+
+    collapsed = collapse_entries(entries)
+
+    assert collapsed == [{
+        "local": "D:/tex/diffuse.<UDIM>.exr",
+        "server": "/D/tex/diffuse.<UDIM>.exr",
+        "tiles": [1001, 1002, 1011], "hashes": ["a", "b", "c"]}]
+    assert list(iter_expanded(collapsed)) == entries
+
+
+@pytest.mark.parametrize("entries", [
+    # Too few files.
+    _entries("D:/cache/sim.%04d.vdb", [1, 2]),
+    # Keys a record can not hold.
+    [dict(entry, note="x")
+     for entry in _entries("D:/cache/sim.%04d.vdb", range(1, 5))],
+    # Server paths not following the local ones.
+    [dict(entry, server="/other/%d.vdb" % index) for index, entry in
+     enumerate(_entries("D:/cache/sim.%04d.vdb", range(1, 5)))],
+])
+def test_entries_kept(entries):
+    """Test entries that can not be collapsed are kept as they are."""
+    assert collapse_entries(entries) == entries
+
+
+def test_collapse_paths():
+    """Test the sequences of asset.json become their pattern."""
+    paths = ["D:/cache/sim.%04d.vdb" % frame for frame in range(1, 50)]
+    paths.insert(1, "D:/cache/character.abc")
+
+    assert collapse_paths(paths) == ["D:/cache/sim.####.vdb",
+                                     "D:/cache/character.abc"]
+
+
+def test_append_to_collapsed_upload(tmpdir):
+    """Test files added to a collapsed upload.json keep it collapsed."""
+    upload_path = str(tmpdir.join("upload.json"))
+    entries = _entries("D:/cache/sim.%04d.vdb", range(1, 11))
+    utils.json_save(upload_path, {"asset": collapse_entries(entries)})
+    extra = tmpdir.join("extra.exr")
+    extra.write("extra")
+
+    append_to_upload(str(extra), upload_path)
+
+    assets = utils.json_load(upload_path)["asset"]
+    assert assets[0]["frames"] == "1-10"
+    assert list(iter_expanded(assets))[:10] == entries
+    assert assets[1]["local"] == str(extra).replace("\\", "/")
+
+
+@pytest.mark.parametrize("stream_upload", [False, True])
+def test_analyse_collapse_sequences(tmpdir, stream_upload):
+    """Test an analysis stores its cache sequence as one record."""
+    cache = tmpdir.mkdir("cache")
+    for frame in range(1, 21):
+        cache.join("smoke.%04d.vdb" % frame).write("vdb")
+    scene = tmpdir.join("scene.project")
+    scene.write('GeometryVolumeFile "smoke" { filename "cache/'
+                'smoke.####.vdb" }\n')
+    analyze_obj = AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3",
+                                  workspace=str(tmpdir),
+                                  stream_upload=stream_upload,
+                                  collapse_sequences=True)
+
+    analyze_obj.analyse(mode="fast")
+    analyze_obj.result.sync_from_disk()
+
+    records = [entry for entry in analyze_obj.upload_info["asset"]
+               if "frames" in entry]
+    assert len(records) == 1 and records[0]["frames"] == "1-20"
+    assert records[0]["sizes"] == [3] * 20
+    assert len([entry for entry in analyze_obj.iter_upload_assets()
+                if entry["local"].endswith(".vdb")]) == 20
+    assert analyze_obj.asset_info["cache"] == [
+        str(cache.join("smoke.####.vdb")).replace("\\", "/")]
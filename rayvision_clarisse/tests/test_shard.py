@@ -0,0 +1,149 @@
+"""Test rayvision_clarisse.shard model."""
+
+# pylint: disable=import-error
+import os
+
+import pytest
+
+from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+from rayvision_clarisse.json_stream import iter_json_items
+from rayvision_clarisse.sequence import collapse_entries
+from rayvision_clarisse.shard import plan_shards
+from rayvision_clarisse.shard import stream_shards
+from rayvision_clarisse.shard import SUMMARY_NAME
+from rayvision_clarisse.shard import write_shards
+from rayvision_clarisse import utils
+
+
+def _entries(sizes):
+    """Get upload entries of the given sizes."""
+    return [{"local": "D:/cache/file_%d.bin" % number,
+             "server": "/D/cache/file_%d.bin" % number, "size": size}
+            for number, size in enumerate(sizes)]
+
+
+def _bytes(shards):
+    """Get the bytes of each shard."""
+    return [sum(entry["size"] for entry in shard) for shard in shards]
+
+
+def test_largest_file_alone():
+    """Test a large file gets a shard while the others share the rest."""
+    gb = 1024 ** 3
+    shards = plan_shards(_entries([gb] * 8 + [40 * gb]), 4, file_cost=0)
+
+    assert sorted(_bytes(shards)) == [2 * gb, 3 * gb, 3 * gb, 40 * gb]
+    assert sorted(len(shard) for shard in shards) == [1, 2, 3, 3]
+
+
+@pytest.mark.parametrize("count", [1, 3, 8])
+def test_shards_hold_every_entry_once(count):
+    """Test the shards split the entries without loss, in their order."""
+    entries = _entries([(number * 7919) % 1000 for number in range(200)])
+
+    shards = plan_shards(entries, count)
+
+    assert len(shards) == count
+    assert sorted(entry["local"] for shard in shards for entry in shard) == \
+        sorted(entry["local"] for entry in entries)
+    for shard in shards:
+        positions = [entries.index(entry) for entry in shard]
+        assert positions == sorted(positions)
+
+
+def test_file_count_balanced():
+    """Test files of the same size are dealt evenly."""
+    shards = plan_shards(_entries([0] * 10), 3)
+
+    assert sorted(len(shard) for shard in shards) == [3, 3, 4]
+
+
+def test_sizes_of_files_and_records(tmpdir):
+    """Test sizes are stat when missing and records are expanded."""
+    for frame in range(1, 5):
+        tmpdir.join("sim.%04d.vdb" % frame).write("x" * frame)
+    folder = str(tmpdir).replace("\\", "/")
+    entries = collapse_entries(
+        [{"local": "%s/sim.%04d.vdb" % (folder, frame)}
+         for frame in range(1, 5)])
+    entries.append({"local": folder + "/missing.exr"})
+
+    shards = plan_shards(entries, 2, file_cost=0)
+
+    sizes = {entry["local"]: entry.get("size")
+             for shard in shards for entry in shard}
+    assert sizes[folder + "/sim.0004.vdb"] == 4
+    assert sizes[folder + "/missing.exr"] is None
+    assert sorted(_bytes([[entry for entry in shard if "size" in entry]
+                          for shard in shards])) == [5, 5]
+
+
+def test_write_shards(tmpdir):
+    """Test the shards are written as upload.json files with a summary."""
+    shards = plan_shards(_entries([10, 20, 30]), 2, file_cost=0)
+    scene = [{"local": "D:/scene.project", "server": "/D/scene.project"}]
+
+    summary = write_shards(shards, str(tmpdir), scene)
+
+    assert utils.json_load(str(tmpdir.join(SUMMARY_NAME))) == summary
+    assert summary["files"] == 3 and summary["bytes"] == 60
+    assert summary["imbalance"] == 1.0
+    first = utils.json_load(str(tmpdir.join(summary["shards"][0]["path"])))
+    assert first["scene"] == scene
+    assert first["asset"] == shards[0]
+
+
+def test_stream_shards_reads_entries_twice(tmpdir):
+    """Test streamed shards match the planned ones, from two passes."""
+    sizes = [(number * 7919) % 1000 for number in range(50)]
+    passes = []
+
+    def entries():
+        passes.append(len(passes))
+        return (entry for entry in _entries(sizes))
+
+    streamed = tmpdir.mkdir("streamed")
+    summary = stream_shards(entries, 4, str(streamed))
+
+    expected = write_shards(plan_shards(_entries(sizes), 4),
+                            str(tmpdir.mkdir("planned")))
+    assert passes == [0, 1]
+    assert summary == expected
+    for shard in summary["shards"]:
+        assert utils.json_load(str(streamed.join(shard["path"]))) == \
+            utils.json_load(str(tmpdir.join("planned", shard["path"])))
+
+
+def test_invalid_count():
+    """Test a shard count below 1 is refused."""
+    with pytest.raises(Exception):
+        plan_shards([], 0)
+
+
+@pytest.mark.parametrize("stream_upload", [False, True])
+def test_analyse_upload_shards(tmpdir, stream_upload):
+    """Test an analysis writes its upload shards in the workspace."""
+    cache = tmpdir.mkdir("cache")
+    for frame in range(1, 7):
+        cache.join("smoke.%04d.vdb" % frame).write("v" * 100 * frame)
+    scene = tmpdir.join("scene.project")
+    scene.write('GeometryVolumeFile "smoke" { filename "cache/'
+                'smoke.####.vdb" }\n')
+    analyze_obj = AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3",
+                                  workspace=str(tmpdir),
+                                  stream_upload=stream_upload,
+                                  upload_shards=3)
+
+    analyze_obj.analyse(mode="fast")
+
+    summary = analyze_obj.shard_summary
+    assert [shard["path"] for shard in summary["shards"]] == [
+        "upload_shard_0.json", "upload_shard_1.json", "upload_shard_2.json"]
+    assert summary["files"] == 7
+    assert summary["scene"][0]["local"] == str(scene).replace("\\", "/")
+    locals_ = [entry["local"] for shard in summary["shards"]
+               for _, entry in iter_json_items(
+                   os.path.join(analyze_obj.workspace, shard["path"]),
+                   keys=["asset"])]
+    assert sorted(locals_) == sorted(
+        entry["local"] for entry in analyze_obj.iter_upload_assets())
@@ -60,3 +60,61 @@ def test_convert_path(path):
     """Test get_encode, we can get a expected result."""
     result_path = utils.convert_path(path)
     assert result_path == r"/D/work/render/19183793/max/d/Work/c05.txt"
+
+
+@pytest.mark.parametrize("path, server_path", [
+    ("Z:/shot/a.exr", "/projects/shot/a.exr"),
+    ("z:\\shot\\a.exr", "/projects/shot/a.exr"),
+    ("//nas/share/tex/b.exr", "/nas_share/tex/b.exr"),
+    ("D:/work/c05.txt", "/D/work/c05.txt"),
+    ("//other/share/c.exr", "/other/share/c.exr"),
+])
+def test_path_mapper(path, server_path):
+    """Test rules win over convert_path and server paths map back."""
+    mapper = utils.PathMapper({"Z:/": "/projects/",
+                               "//nas/share": "/nas_share"})
+    assert mapper.to_server_list([path]) == [server_path]
+    assert mapper.to_local(server_path) == path.replace(
+        "\\", "/").replace("z:", "Z:")
+
+
+def test_memoize():
+    """Test results are remembered until the memo is full."""
+    calls = []
+    upper = utils._memoize(lambda text: calls.append(text) or text.upper(),
+                           2)
+
+    assert [upper(text) for text in "aabcc"] == list("AABCC")
+    assert calls == ["a", "b", "c"]
+
+
+def test_path_mapper_longest_prefix():
+    """Test the longest matching local prefix is used."""
+    mapper = utils.PathMapper([("Z:/", "/projects/"),
+                               ("Z:/shots/sq010", "/sq010")])
+    assert mapper.to_server_list(["Z:/shots/sq010/a.exr",
+                                  "Z:/shots/sq020/a.exr"]) == [
+                                      "/sq010/a.exr",
+                                      "/projects/shots/sq020/a.exr"]
+
+
+def test_stream_decoder_detects_once():
+    """Test the encoding is detected once and split lines are joined."""
+    decoder = utils.StreamDecoder()
+    text = u"参考文件丢失: D:/贴图/a.exr\nok\n"
+    data = text.encode("gbk")
+    lines = decoder.feed(b"start\n") + decoder.feed(data[:7])
+    lines += decoder.feed(data[7:]) + decoder.feed(b"end") + decoder.flush()
+
+    assert decoder.encoding == "gb18030"
+    assert lines == ["start", u"参考文件丢失: D:/贴图/a.exr", "ok", "end"]
+
+
+@pytest.mark.parametrize("data, encoding", [
+    (u"文件".encode("utf-8"), "utf-8"),
+    (u"文件".encode("gbk"), "gb18030"),
+])
+def test_detect_encoding(data, encoding, monkeypatch):
+    """Test strict decoding picks the right encoding."""
+    monkeypatch.setattr(utils, "DETECT_ENCODINGS", ("utf-8", "gb18030"))
+    assert utils.detect_encoding(data, utils.DETECT_ENCODINGS) == encoding
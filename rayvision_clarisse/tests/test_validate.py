@@ -0,0 +1,106 @@
+"""Test rayvision_clarisse.validate model."""
+
+# pylint: disable=import-error
+import errno
+import os
+
+import pytest
+
+from rayvision_clarisse import analyse_clarisse
+from rayvision_clarisse import validate
+from rayvision_clarisse.validate import validate_files
+from rayvision_utils import utils
+
+
+def test_validate_files(tmpdir):
+    """Test missing, empty and existing files are told apart."""
+    textures = tmpdir.mkdir("textures")
+    textures.join("a.exr").write("pixels")
+    textures.join("empty.exr").write("")
+    paths = [str(textures.join("a.exr")),
+             str(textures.join("missing.exr")),
+             str(textures.join("empty.exr")),
+             str(tmpdir.join("nowhere", "b.exr")),
+             str(textures.join("a.exr"))]
+
+    report = validate_files(paths, max_workers=2)
+
+    assert report.missing == [paths[1], paths[3]]
+    assert report.empty == [paths[2]]
+    assert report.unreadable == []
+    assert report.sizes[paths[0]] == 6
+
+
+def test_validate_large_folder_in_chunks(tmpdir, monkeypatch):
+    """Test the files of one folder are checked in chunks on the pool."""
+    monkeypatch.setattr(validate, "CHUNK_SIZE", 3)
+    for number in range(10):
+        tmpdir.join("%d.exr" % number).write("x" * number)
+    paths = [str(tmpdir.join("%d.exr" % number)) for number in range(11)]
+    chunks = []
+    check_names = validate._check_names
+
+    def fake_check_names(entries, names):
+        chunks.append(len(names))
+        return check_names(entries, names)
+
+    monkeypatch.setattr(validate, "_check_names", fake_check_names)
+    report = validate_files(paths, max_workers=4)
+
+    assert sorted(chunks) == [2, 3, 3, 3]
+    assert report.missing == [paths[10]]
+    assert report.empty == [paths[0]]
+    assert report.sizes[paths[9]] == 9
+
+
+@pytest.mark.skipif(os.name == "nt" or os.geteuid() == 0,
+                    reason="needs a file permission the user can not bypass")
+def test_validate_unreadable_folder(tmpdir):
+    """Test the files of a folder that can not be listed are unreadable."""
+    locked = tmpdir.mkdir("locked")
+    locked.join("a.exr").write("pixels")
+    os.chmod(str(locked), 0)
+    try:
+        report = validate_files([str(locked.join("a.exr"))])
+    finally:
+        os.chmod(str(locked), 0o755)
+    assert report.unreadable == [str(locked.join("a.exr"))]
+
+
+@pytest.mark.parametrize("code, unreadable", [
+    (errno.EACCES, True),
+    (errno.EPERM, True),
+    (errno.ENOENT, False),
+])
+def test_validate_folder_listing_errors(tmpdir, monkeypatch, code,
+                                        unreadable):
+    """Test a folder listing error is told apart by its errno."""
+    def fake_list_folder(index, folder):
+        raise OSError(code, os.strerror(code), folder)
+
+    monkeypatch.setattr(validate.DirectoryIndex, "list_folder",
+                        fake_list_folder)
+    path = str(tmpdir.join("a.exr"))
+
+    report = validate_files([path])
+
+    assert report.unreadable == ([path] if unreadable else [])
+    assert report.missing == ([] if unreadable else [path])
+
+
+def test_analyse_writes_validation_tips(tmpdir, fake_analyzer):
+    """Test the validation stage writes tips for bad files."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    tmpdir.join("empty.exr").write("")
+    missing = str(tmpdir.join("missing.exr"))
+
+    fake_analyzer([str(tmpdir.join("empty.exr"))], {"texture": [missing]})
+    analyze_obj = analyse_clarisse.AnalyzeClarisse(
+        str(scene), "clarisse_ifx_4.0_sp3", workspace=str(tmpdir),
+        validate_assets=True)
+    analyze_obj.analyse()
+
+    tips = utils.json_load(analyze_obj.tips_json)
+    assert tips["25009"] == [missing]
+    assert tips["10012"] == [str(tmpdir.join("empty.exr"))]
@@ -0,0 +1,170 @@
+"""Test rayvision_clarisse.worker model."""
+
+# pylint: disable=import-error
+import io
+import os
+import sys
+
+import pytest
+
+from rayvision_clarisse.analyse_clarisse import AnalyzeClarisse
+from rayvision_clarisse.constants import MISSING_ASSET_CODE
+from rayvision_clarisse.worker import AnalyzerWorker
+from rayvision_clarisse.worker import read_frame
+from rayvision_clarisse.worker import serve
+from rayvision_clarisse.worker import write_frame
+
+STUB_WORKER = """
+import json
+import os
+import sys
+
+sys.path.insert(0, {root!r})
+from rayvision_clarisse.worker import serve
+
+
+def analyse(args, emit):
+    scene = args[args.index("-cf") + 1]
+    task_json = args[args.index("-tj") + 1]
+    print("stray print")
+    emit("worker pid {{}}".format(os.getpid()))
+    if "crash" in scene:
+        os._exit(3)
+    emit("Reference file not found: D:/tex/missing.exr")
+    emit("analyse 100%")
+    workspace = os.path.dirname(task_json)
+    for name in ("task.json", "asset.json", "tips.json"):
+        with open(os.path.join(workspace, name), "w") as json_f:
+            json.dump({{}}, json_f)
+    with open(os.path.join(workspace, "upload.json"), "w") as json_f:
+        json.dump({{"asset": []}}, json_f)
+    return 0
+
+
+serve(analyse)
+"""
+
+pytestmark = pytest.mark.skipif(os.name == "nt",
+                                reason="the stub worker writes to /tmp")
+
+
+@pytest.fixture()
+def worker_cmd(tmpdir):
+    """Command starting the stub worker."""
+    script = tmpdir.join("stub_worker.py")
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    script.write(STUB_WORKER.format(root=root))
+    return [sys.executable, str(script)]
+
+
+def _run(worker, tmpdir, scene="scene.project"):
+    """Run a job of the stub worker, get its code, lines and pid."""
+    lines = []
+    task_json = tmpdir.join("task.json")
+    code, aborted = worker.run(["-cf", scene, "-tj", str(task_json)],
+                               lines.append)
+    pids = [int(line.split()[-1]) for line in lines
+            if line.startswith("worker pid")]
+    return code, aborted, lines, pids[0] if pids else None
+
+
+@pytest.mark.parametrize("message", [
+    {"type": "analyse", "args": ["-cf", u"D:/\u573a\u666f.project"]},
+    {"type": "done", "code": 0},
+])
+def test_frame_round_trip(message):
+    """Test a message read back from its frame."""
+    stream = io.BytesIO()
+    write_frame(stream, message)
+    write_frame(stream, message)
+    stream.seek(0)
+
+    assert read_frame(stream) == message
+    assert read_frame(stream) == message
+    assert read_frame(stream) is None
+
+
+def test_truncated_frame():
+    """Test a stream ending inside a frame is an error."""
+    stream = io.BytesIO()
+    write_frame(stream, {"type": "done", "code": 0})
+    stream = io.BytesIO(stream.getvalue()[:-2])
+
+    with pytest.raises(Exception):
+        read_frame(stream)
+
+
+def test_serve_reports_handler_errors():
+    """Test serve answers a failing job and goes on with the next one."""
+    requests = io.BytesIO()
+    write_frame(requests, {"type": "analyse", "args": ["bad"]})
+    write_frame(requests, {"type": "analyse", "args": ["good"]})
+    requests.seek(0)
+    answers = io.BytesIO()
+
+    def handler(args, emit):
+        if args == ["bad"]:
+            raise ValueError("bad scene")
+        emit("ok")
+        return 0
+
+    serve(handler, requests, answers)
+
+    answers.seek(0)
+    messages = []
+    while True:
+        message = read_frame(answers)
+        if message is None:
+            break
+        messages.append(message)
+    assert messages[-2:] == [{"type": "output", "lines": ["ok"]},
+                             {"type": "done", "code": 0}]
+    assert {"type": "done", "code": 1} in messages
+    assert any("ValueError: bad scene" in line for message in messages
+               for line in message.get("lines", []))
+
+
+def test_worker_is_reused_and_restarted(tmpdir, worker_cmd):
+    """Test jobs share a process until max_jobs, a crash restarts it."""
+    with AnalyzerWorker(worker_cmd, max_jobs=2) as worker:
+        first = _run(worker, tmpdir)
+        second = _run(worker, tmpdir)
+        third = _run(worker, tmpdir)
+        crash = _run(worker, tmpdir, scene="crash.project")
+        after_crash = _run(worker, tmpdir)
+
+    assert first[0] == second[0] == third[0] == 0
+    assert "stray print" not in first[2]
+    assert first[3] == second[3] != third[3]
+    assert crash[0] == 3 and crash[3] == third[3]
+    assert after_crash[0] == 0 and after_crash[3] != crash[3]
+    assert worker.starts == 3
+    assert worker.pid is None
+
+
+def test_worker_abort_stops_the_process(tmpdir, worker_cmd):
+    """Test a callback asking to stop kills the worker."""
+    with AnalyzerWorker(worker_cmd) as worker:
+        code, aborted = worker.run(["-cf", "scene.project", "-tj",
+                                    str(tmpdir.join("task.json"))],
+                                   lambda line: True)
+        assert aborted and code is None
+        assert worker.pid is None
+        assert _run(worker, tmpdir)[0] == 0
+
+
+def test_analyse_in_worker(tmpdir, worker_cmd):
+    """Test AnalyzeClarisse runs its analyses in a shared worker."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    with AnalyzerWorker(worker_cmd) as worker:
+        for _ in range(2):
+            analyze_obj = AnalyzeClarisse(str(scene), "clarisse_ifx_4.0_sp3",
+                                          workspace=str(tmpdir),
+                                          worker=worker)
+            analyze_obj.analyse()
+            assert analyze_obj.tips_info[MISSING_ASSET_CODE] == [
+                "D:/tex/missing.exr"]
+            assert analyze_obj.upload_info["scene"][0]["hash"]
+        assert worker.starts == 1 and worker.jobs == 2
@@ -0,0 +1,113 @@
+"""Test rayvision_clarisse.workspace model."""
+
+# pylint: disable=import-error
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from rayvision_clarisse import analyse_clarisse
+from rayvision_clarisse import workspace as workspace_module
+from rayvision_clarisse.workspace import WorkspaceManager
+
+
+def make_workspace(manager, name, size=0, age=0):
+    """Create a released workspace last used ``age`` seconds ago."""
+    path = manager.open(os.path.join(manager.root, name))
+    with open(os.path.join(path, "asset.json"), "w") as asset_f:
+        asset_f.write("x" * size)
+    manager.release(path)
+    used = time.time() - age
+    os.utime(os.path.join(path, workspace_module.MARKER_FILE), (used, used))
+    return path
+
+
+def test_open_locks_workspace(tmpdir):
+    """Test a workspace held by another analysis is not shared."""
+    manager = WorkspaceManager(str(tmpdir))
+    path = manager.open(manager.scene_path("a.project"), scene="a.project")
+    other = WorkspaceManager(str(tmpdir)).open(path)
+
+    assert other != path
+    assert manager.is_active(path)
+    manager.release(path)
+    assert not manager.is_active(path)
+    assert manager.read_marker(path)["scene"] == "a.project"
+
+
+def test_acquire_takes_over_stale_lock(tmpdir):
+    """Test the lock of a dead process is taken over."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    path = tmpdir.mkdir("1234")
+    path.join(workspace_module.LOCK_FILE).write(
+        "{}@{}".format(process.pid, workspace_module.socket.gethostname()))
+    manager = WorkspaceManager(str(tmpdir))
+
+    assert manager.acquire(str(path))
+    assert os.listdir(str(path)) == [workspace_module.LOCK_FILE]
+
+
+@pytest.mark.parametrize("quota, expected", [
+    ({"max_age": 3600}, ["2", "3"]),
+    ({"max_age": None, "max_bytes": 150}, ["3"]),
+    ({"max_age": None, "max_count": 2}, ["2", "3"]),
+])
+def test_cleanup_evicts_least_recently_used(tmpdir, quota, expected):
+    """Test cleanup removes the oldest workspaces beyond the quotas."""
+    manager = WorkspaceManager(str(tmpdir), **quota)
+    make_workspace(manager, "1", size=100, age=7200)
+    make_workspace(manager, "2", size=100, age=60)
+    make_workspace(manager, "3", size=100, age=0)
+    tmpdir.mkdir("result_cache")
+
+    manager.cleanup()
+
+    assert sorted(os.listdir(str(tmpdir))) == sorted(expected +
+                                                     ["result_cache"])
+
+
+def test_cleanup_keeps_active_workspace(tmpdir):
+    """Test cleanup never removes a locked workspace."""
+    manager = WorkspaceManager(str(tmpdir), max_age=3600)
+    path = make_workspace(manager, "1", age=7200)
+    WorkspaceManager(str(tmpdir)).acquire(path)
+
+    assert manager.cleanup() == []
+    assert os.path.exists(path)
+
+
+def test_cleanup_keeps_folders_it_did_not_create(tmpdir):
+    """Test cleanup leaves alone the folders a manager did not create."""
+    manager = WorkspaceManager(str(tmpdir), max_age=3600)
+    user_folder = tmpdir.mkdir("2019")
+    # An existing folder opened as a workspace is not marked as managed.
+    existing = tmpdir.mkdir("1234")
+    manager.release(manager.open(str(existing)))
+    old = time.time() - 7200
+    for path in (user_folder, existing):
+        os.utime(str(path), (old, old))
+    os.utime(str(existing.join(workspace_module.MARKER_FILE)), (old, old))
+    make_workspace(manager, "5678", age=7200)
+
+    assert manager.cleanup() == [str(tmpdir.join("5678"))]
+    assert user_folder.check() and existing.check()
+
+
+def test_analyse_reuses_scene_workspace(tmpdir, fake_analyzer):
+    """Test a reused workspace keeps the result of the same scene."""
+    scene = tmpdir.join("scene.project")
+    scene.write("scene")
+    calls = fake_analyzer()
+    root = tmpdir.mkdir("workspace")
+    for _ in range(2):
+        analyze_obj = analyse_clarisse.AnalyzeClarisse(
+            str(scene), "clarisse_ifx_4.0_sp3", workspace=str(root),
+            reuse_workspace=True, workspace_manager=True)
+        analyze_obj.analyse()
+
+    assert len(calls) == 1
+    assert calls[0] == analyze_obj.workspace
+    assert not analyze_obj.workspace_manager.is_active(analyze_obj.workspace)
@@ -1,8 +1,170 @@
 """Common method for rayvision_clarisse API."""
 
+import codecs
+import json
 import sys
 
 
+def json_load(json_path, encoding='utf-8'):
+    """Load the data from the json file.
+
+    Same as ``rayvision_utils.utils.json_load``, without importing
+    ``rayvision_utils`` and its dependencies.
+
+    Args:
+        json_path (str): Json file path.
+        encoding (str): Encoding, default is ``utf-8``.
+
+    Returns:
+        dict: Data in the json file.
+
+    """
+    with codecs.open(json_path, 'r', encoding=encoding) as f_json:
+        return json.load(f_json)
+
+
+def json_save(json_path, data, encoding='utf-8', ensure_ascii=True):
+    """Save data to the json file.
+
+    Same as ``rayvision_utils.utils.json_save``, without importing
+    ``rayvision_utils`` and its dependencies.
+
+    Args:
+        json_path (str): Json file path.
+        data (dict): Data to save.
+        encoding (str): Encoding, default is ``utf-8``.
+        ensure_ascii (bool): Escape non ASCII characters, default ``True``.
+
+    """
+    with codecs.open(json_path, 'w', encoding=encoding) as f_json:
+        json.dump(data, f_json, ensure_ascii=ensure_ascii, indent=2,
+                  default=json_default)
+
+
+def json_default(obj):
+    """Encode the objects with a ``to_json`` method, e.g. ``AssetTable``.
+
+    Passed as ``default`` to the json encoders.
+
+    """
+    to_json = getattr(obj, "to_json", None)
+    if to_json is None:
+        raise TypeError("Object of type {} is not JSON serializable".format(
+            type(obj).__name__))
+    return to_json()
+
+
+# Encodings tried in order by ``detect_encoding``.
+DETECT_ENCODINGS = ("utf-8", sys.getfilesystemencoding(), "gb18030")
+
+
+def is_ascii(data):
+    """Tell whether bytes are plain ASCII."""
+    try:
+        return data.isascii()
+    except AttributeError:
+        # Python older than 3.7.
+        try:
+            data.decode("ascii")
+        except UnicodeDecodeError:
+            return False
+        return True
+
+
+def detect_encoding(data, candidates=DETECT_ENCODINGS):
+    """Find the first encoding that decodes bytes without error.
+
+    Args:
+        data (bytes): Bytes to decode.
+        candidates (tuple): Encodings tried in order.
+
+    Returns:
+        str: The encoding, utf-8 if none fits.
+
+    """
+    for code in candidates:
+        try:
+            data.decode(code)
+            return code
+        except (UnicodeDecodeError, LookupError):
+            pass
+    return "utf-8"
+
+
+class StreamDecoder(object):
+    """Decode the output of a process chunk by chunk.
+
+    The encoding is detected once, from the first chunk that is not ASCII,
+    and reused for the rest of the stream. ASCII chunks skip detection.
+
+    Examples:
+        decoder = StreamDecoder()
+        for chunk in chunks:
+            for line in decoder.feed(chunk):
+                print(line)
+        for line in decoder.flush():
+            print(line)
+
+    """
+
+    def __init__(self, encoding=None, candidates=DETECT_ENCODINGS):
+        """Initialize the decoder.
+
+        Args:
+            encoding (str, optional): Encoding of the stream, detected if
+                not given.
+            candidates (tuple): Encodings tried by the detection.
+
+        """
+        self.encoding = encoding
+        self.candidates = candidates
+        self._pending = b""
+
+    def decode(self, data):
+        """Decode complete bytes of the stream in one call.
+
+        Args:
+            data (bytes): Bytes not ending inside a character.
+
+        Returns:
+            str: Decoded text.
+
+        """
+        if is_ascii(data):
+            return data.decode("ascii")
+        if self.encoding is None:
+            self.encoding = detect_encoding(data, self.candidates)
+        return data.decode(self.encoding, "replace")
+
+    def feed(self, data):
+        """Add a chunk of the stream.
+
+        Args:
+            data (bytes): Chunk as read from the stream.
+
+        Returns:
+            list: Lines completed by the chunk, without line breaks.
+
+        """
+        data = self._pending + data
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._pending = data
+            return []
+        self._pending = data[end + 1:]
+        return self.decode(data[:end + 1]).splitlines()
+
+    def flush(self):
+        """Get the last line of the stream if it has no line break.
+
+        Returns:
+            list: The remaining line, if any.
+
+        """
+        data, self._pending = self._pending, b""
+        return self.decode(data).splitlines() if data else []
+
+
 def get_encode(encode_str, py_version=3):
     """Get the encoding of the string decoding.
 
@@ -46,6 +208,8 @@ def str_to_unicode(encode_str, py_version=3):
     elif ((py_version == 2 and isinstance(encode_str, str)) or (
             py_version == 3 and isinstance(encode_str, str))):
         pass
+    elif is_ascii(encode_str):
+        encode_str = encode_str.decode("ascii")
     else:
         code = get_encode(encode_str)
         encode_str = encode_str.decode(code, 'ignore')
@@ -138,3 +302,162 @@ def convert_path(path):
         path_server = lower_path[1:]
 
     return path_server
+
+
+def _split_path(path):
+    """Split a path into its components for the prefix trie.
+
+    Returns:
+        list: Components, a leading "" marks an absolute path and a drive
+            letter is upper case.
+
+    """
+    path = path.replace("\\", "/")
+    if len(path) > 1 and path[1] == ":":
+        path = path[0].upper() + path[1:]
+    if path.startswith("//"):
+        # UNC path, keep the host as one marked component.
+        return ["", ""] + [part for part in path[2:].split("/") if part]
+    parts = [part for part in path.split("/") if part]
+    return [""] + parts if path.startswith("/") else parts
+
+
+class _PrefixTrie(object):
+    """Longest prefix match on path components."""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, prefix, value):
+        """Add a value for a path prefix."""
+        node = self.root
+        for part in _split_path(prefix):
+            node = node.setdefault(part, {})
+        node[None] = value
+
+    def match(self, path):
+        """Find the longest prefix of a path.
+
+        Returns:
+            tuple: Value of the prefix and the components after it, value is
+                None if no prefix matches.
+
+        """
+        parts = _split_path(path)
+        node = self.root
+        value, depth = node.get(None), 0
+        for index, part in enumerate(parts):
+            node = node.get(part)
+            if node is None:
+                break
+            if None in node:
+                value, depth = node[None], index + 1
+        return value, parts[depth:]
+
+
+def _memoize(func, size):
+    """Remember the results of a one argument function in a dict.
+
+    The dict is emptied when it holds ``size`` results.
+
+    """
+    memo = {}
+
+    def call(arg):
+        try:
+            return memo[arg]
+        except KeyError:
+            pass
+        if len(memo) >= size:
+            memo.clear()
+        value = memo[arg] = func(arg)
+        return value
+
+    return call
+
+
+class PathMapper(object):
+    """Convert local paths to server paths and back with prefix rules.
+
+    Paths without a matching rule are converted like ``convert_path``.
+
+    Examples:
+        mapper = PathMapper([("Z:/", "/projects/"),
+                             ("//nas/share/", "/nas_share/")])
+        mapper.to_server_list(["Z:/shot/a.exr", "D:/tex/b.exr"])
+        # ["/projects/shot/a.exr", "/D/tex/b.exr"]
+        mapper.to_local("/projects/shot/a.exr")
+        # "Z:/shot/a.exr"
+
+    """
+
+    def __init__(self, rules=None, memo_size=65536):
+        """Compile the mapping rules.
+
+        Args:
+            rules (list or dict, optional): (local prefix, server prefix)
+                pairs.
+            memo_size (int): Number of converted paths remembered.
+
+        """
+        if isinstance(rules, dict):
+            rules = list(rules.items())
+        self.rules = list(rules or [])
+        self._local_trie = _PrefixTrie()
+        self._server_trie = _PrefixTrie()
+        for local_prefix, server_prefix in self.rules:
+            self._local_trie.insert(local_prefix, server_prefix)
+            self._server_trie.insert(server_prefix, local_prefix)
+        self.to_server = _memoize(self._to_server, memo_size)
+        self.to_local = _memoize(self._to_local, memo_size)
+
+    @staticmethod
+    def _join(prefix, parts):
+        """Join a prefix and the remaining components."""
+        prefix = prefix.replace("\\", "/")
+        if not parts:
+            return prefix
+        return prefix.rstrip("/") + "/" + "/".join(parts)
+
+    def _to_server(self, path):
+        """Convert one local path, see ``to_server_list``."""
+        server_prefix, parts = self._local_trie.match(path)
+        if server_prefix is not None:
+            return self._join(server_prefix, parts)
+        return convert_path(path)
+
+    def _to_local(self, server_path):
+        """Convert one server path, see ``to_local_list``."""
+        local_prefix, parts = self._server_trie.match(server_path)
+        if local_prefix is not None:
+            return self._join(local_prefix, parts)
+        path = server_path.replace("\\", "/")
+        drive = path.split("/")[1] if path.startswith("/") else ""
+        if len(drive) == 1 and drive.isalpha():
+            return drive + ":" + path[2:]
+        # convert_path drops the first character of other paths.
+        return "/" + path
+
+    def to_server_list(self, paths):
+        """Convert local paths to server paths.
+
+        Args:
+            paths (iterable): Local paths.
+
+        Returns:
+            list: Server paths.
+
+        """
+        return [self.to_server(path) for path in paths]
+
+    def to_local_list(self, server_paths):
+        """Convert server paths back to local paths.
+
+        Args:
+            server_paths (iterable): Server paths.
+
+        Returns:
+            list: Local paths.
+
+        """
+        return [self.to_local(path) for path in server_paths]
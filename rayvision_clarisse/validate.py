@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Check the files referenced by an analysis in bulk.
+
+Paths are grouped by folder and each folder is listed once through a
+``DirectoryIndex``, folders are listed in parallel by a thread pool. On
+network shares this replaces the lookup of each file by one per folder.
+The files of a folder are then stat in chunks of ``CHUNK_SIZE`` names, also
+on the pool, as ``os.DirEntry.stat`` is still a system call per file on
+POSIX and one large folder would otherwise keep a single thread busy.
+
+Files are not opened, a file that exists but can not be read is reported
+when it is read, i.e. hashed or uploaded. Only the files whose folder can
+not be listed or which can not be stat are reported as unreadable here.
+
+"""
+
+# Import built-in models
+import collections
+import errno
+import os
+from concurrent import futures
+
+from rayvision_clarisse.dir_index import DirectoryIndex
+
+# Number of names of one folder stat by a task of the pool.
+CHUNK_SIZE = 512
+
+ValidationReport = collections.namedtuple(
+    "ValidationReport", ["missing", "empty", "unreadable", "sizes"])
+
+
+def _list_folder(folder, index):
+    """List one folder.
+
+    Returns:
+        tuple: The entries by normalized name and the error of the listing,
+            one of them is None.
+
+    """
+    try:
+        return index.list_folder(folder), None
+    except (IOError, OSError) as err:
+        return None, err
+
+
+def _check_names(entries, names):
+    """Check files of one folder.
+
+    Args:
+        entries (dict): Listing of the folder, see
+            ``DirectoryIndex.list_folder``.
+        names (list): Normalized file names and the paths asked for.
+
+    Returns:
+        tuple: Missing, empty and unreadable paths and the size by path.
+
+    """
+    missing, empty, unreadable, sizes = [], [], [], {}
+    for name, paths in names:
+        entry = entries.get(name)
+        try:
+            if entry is None or not entry.is_file():
+                missing.extend(paths)
+                continue
+            size = entry.stat().st_size
+        except OSError:
+            unreadable.extend(paths)
+            continue
+        for path in paths:
+            sizes[path] = size
+        if size == 0:
+            empty.extend(paths)
+    return missing, empty, unreadable, sizes
+
+
+def _chunks(items, size):
+    """Split a list into lists of at most ``size`` items."""
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def validate_files(paths, max_workers=16, index=None):
+    """Check that files exist and are not empty.
+
+    Args:
+        paths (iterable): File paths.
+        max_workers (int): Number of folders listed, or chunks of files
+            stat, at the same time.
+        index (DirectoryIndex, optional): Index answering from the folders
+            it already listed, default lists every folder.
+
+    Returns:
+        ValidationReport: Missing, empty and unreadable paths in the order
+            of ``paths`` and the size of every existing path.
+
+    """
+    order = {}
+    folders = collections.OrderedDict()
+    for path in paths:
+        if path in order:
+            continue
+        order[path] = len(order)
+        folder, name = os.path.split(path)
+        folders.setdefault(folder, {}).setdefault(
+            os.path.normcase(name), []).append(path)
+
+    missing, empty, unreadable, sizes = [], [], [], {}
+    index = index or DirectoryIndex()
+    if folders:
+        max_workers = max(1, min(max_workers, len(order)))
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            jobs = []
+            for (folder, names), (entries, error) in zip(
+                    folders.items(),
+                    pool.map(lambda folder: _list_folder(folder, index),
+                             folders)):
+                if error is not None:
+                    folder_paths = [path for group in names.values()
+                                    for path in group]
+                    if error.errno in (errno.EACCES, errno.EPERM):
+                        unreadable.extend(folder_paths)
+                    else:
+                        missing.extend(folder_paths)
+                    continue
+                for chunk in _chunks(list(names.items()), CHUNK_SIZE):
+                    jobs.append(pool.submit(_check_names, entries, chunk))
+            for job in jobs:
+                result = job.result()
+                missing.extend(result[0])
+                empty.extend(result[1])
+                unreadable.extend(result[2])
+                sizes.update(result[3])
+    return ValidationReport(sorted(missing, key=order.get),
+                            sorted(empty, key=order.get),
+                            sorted(unreadable, key=order.get),
+                            sizes)
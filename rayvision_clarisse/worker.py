@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""Keep an analyzer process alive between analyses.
+
+Starting the analyzer and its runtime is most of the time spent on a small
+scene. A worker is a long-lived process analysing scenes one after another,
+driven through its stdin and stdout with framed json messages: a 4 bytes
+big-endian length followed by the utf-8 json of the message.
+
+Requests sent to the worker::
+
+    {"type": "analyse", "args": ["-cf", "D:/scene.project",
+                                 "-tj", "c:/workspace/1/task.json"]}
+
+Messages sent back for each request, any number of ``output`` then one
+``done``::
+
+    {"type": "output", "lines": ["analyse 50%"]}
+    {"type": "done", "code": 0}
+
+The worker side is implemented with ``serve``, the client is
+``AnalyzerWorker``. The worker is experimental: the bundled Analyze.exe has
+no worker mode, the command of the worker must be an analyzer build calling
+``serve`` with its own analysis as the handler, e.g.::
+
+    with AnalyzerWorker(["clarisse_worker", "--serve"]) as worker:
+        for scene in scenes:
+            AnalyzeClarisse(scene, "clarisse_ifx_4.0_sp3",
+                            worker=worker).analyse()
+
+"""
+
+# Import built-in models
+import json
+import logging
+import struct
+import subprocess
+import sys
+import threading
+import traceback
+
+from rayvision_clarisse.runner import handle_output_lines
+from rayvision_clarisse.runner import kill_process_tree
+from rayvision_clarisse.runner import popen_kwargs
+
+# Length prefix of a frame.
+_HEADER = struct.Struct(">I")
+
+# Largest frame accepted, a bigger length means the stream is corrupted.
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+def write_frame(stream, message):
+    """Write a message as a frame and flush it.
+
+    Args:
+        stream (file): Binary stream.
+        message (dict): Json serializable message.
+
+    """
+    data = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    stream.write(_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def _read_exactly(stream, size):
+    """Read ``size`` bytes, fewer only at the end of the stream."""
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def read_frame(stream):
+    """Read the next frame.
+
+    Args:
+        stream (file): Binary stream.
+
+    Returns:
+        dict: The message, None at the end of the stream.
+
+    Raises:
+        Exception: The stream ends inside a frame or is not made of frames.
+
+    """
+    header = _read_exactly(stream, _HEADER.size)
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        raise Exception("Truncated frame header.")
+    size = _HEADER.unpack(header)[0]
+    if size > MAX_FRAME_SIZE:
+        raise Exception("Frame of {} bytes is too big.".format(size))
+    data = _read_exactly(stream, size)
+    if len(data) < size:
+        raise Exception("Truncated frame.")
+    return json.loads(data.decode("utf-8"))
+
+
+def serve(handler, reader=None, writer=None):
+    """Answer the analysis requests of an ``AnalyzerWorker``.
+
+    Runs until the client closes the stream. ``sys.stdout`` is redirected to
+    ``sys.stderr`` meanwhile, so a stray print does not break the frames.
+
+    Examples:
+        def analyse(args, emit):
+            emit("analyse 50%")
+            return run_analysis(args)
+
+        serve(analyse)
+
+    Args:
+        handler (function): Called as ``handler(args, emit)`` for each
+            request, ``emit(line)`` sends an output line to the client, its
+            return value is the exit code of the analysis.
+        reader (file, optional): Binary stream of the requests, default is
+            stdin.
+        writer (file, optional): Binary stream of the answers, default is
+            stdout.
+
+    """
+    reader = reader or sys.stdin.buffer
+    writer = writer or sys.stdout.buffer
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+
+    def emit(line):
+        write_frame(writer, {"type": "output", "lines": [line]})
+
+    try:
+        while True:
+            request = read_frame(reader)
+            if request is None:
+                return
+            if request.get("type") != "analyse":
+                emit("[Analyze Error] unknown request: {}".format(
+                    request.get("type")))
+                write_frame(writer, {"type": "done", "code": 1})
+                continue
+            try:
+                code = handler(request.get("args", []), emit)
+            except Exception:  # pylint: disable=broad-except
+                for line in traceback.format_exc().splitlines():
+                    emit(line)
+                code = 1
+            write_frame(writer, {"type": "done", "code": code or 0})
+    finally:
+        sys.stdout = stdout
+
+
+class AnalyzerWorker(object):
+    """Client of a worker process started with ``cmd``.
+
+    The process is started by the first job, restarted after ``max_jobs``
+    jobs and after a crash. Jobs run one at a time, the worker can be shared
+    by threads. It cannot be passed to another process.
+
+    """
+
+    def __init__(self, cmd, max_jobs=100, stop_timeout=10, env=None,
+                 cwd=None):
+        """Initialize the client, nothing is started yet.
+
+        Args:
+            cmd (list): Command starting the worker, e.g.
+                ``["clarisse_worker", "--serve"]``.
+            max_jobs (int): Jobs run by a process before it is restarted,
+                bounding leaks of the analyzer.
+            stop_timeout (float): Seconds a stopping worker is given to exit
+                before it is killed.
+            env (dict, optional): Environment of the worker.
+            cwd (str, optional): Working directory of the worker.
+
+        """
+        self.cmd = list(cmd)
+        self.max_jobs = max_jobs
+        self.stop_timeout = stop_timeout
+        self.env = env
+        self.cwd = cwd
+        self.process = None
+        self.jobs = 0
+        self.starts = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_):
+        self.close()
+
+    @property
+    def pid(self):
+        """int: Pid of the running worker, None if not running."""
+        if self.process is not None and self.process.poll() is None:
+            return self.process.pid
+        return None
+
+    def _start(self):
+        """Start a worker process."""
+        self.process = subprocess.Popen(
+            self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            env=self.env, cwd=self.cwd, **popen_kwargs())
+        self.jobs = 0
+        self.starts += 1
+
+    def _stop(self, kill=False):
+        """Stop the worker process, ``kill`` does not wait for it to exit."""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        if not kill:
+            try:
+                process.stdin.close()
+                process.wait(self.stop_timeout)
+            except (IOError, OSError, subprocess.TimeoutExpired):
+                kill = True
+        if kill and process.poll() is None:
+            kill_process_tree(process.pid)
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except (IOError, OSError):
+                pass
+        process.wait()
+
+    def _send(self, request):
+        """Send a request, to a new worker if the current one died idle."""
+        if self.process is not None and self.process.poll() is not None:
+            self._stop(kill=True)
+        for attempt in range(2):
+            if self.process is None:
+                self._start()
+            try:
+                write_frame(self.process.stdin, request)
+                return
+            except (IOError, OSError):
+                self._stop(kill=True)
+                if attempt:
+                    raise
+
+    def run(self, args, line_callback=None, logger=None):
+        """Run an analysis in the worker.
+
+        Args:
+            args (list): Arguments of the analyzer, e.g.
+                ``["-cf", scene, "-tj", task_json]``.
+            line_callback (function, optional): Called with every output
+                line, returning True stops the analysis and the worker.
+            logger (logging.Logger, optional): Logger of the output lines.
+
+        Returns:
+            tuple: Exit code and whether the analysis was stopped by the
+                callback, like ``runner.run_streaming``. The code of a crash
+                is the one of the worker, -1 if unknown.
+
+        """
+        logger = logger or logging.getLogger(__name__)
+        with self._lock:
+            self._send({"type": "analyse", "args": list(args)})
+            process = self.process
+            logger.info("run in worker %s:\n%s", process.pid, args)
+            self.jobs += 1
+            code = None
+            aborted = False
+            try:
+                while True:
+                    try:
+                        message = read_frame(process.stdout)
+                    except Exception as err:  # pylint: disable=broad-except
+                        logger.error("worker %s: %s", process.pid, err)
+                        message = None
+                    if message is None:
+                        break
+                    if message.get("type") == "output":
+                        aborted = handle_output_lines(
+                            message.get("lines", []), line_callback, logger)
+                        if aborted:
+                            break
+                    elif message.get("type") == "done":
+                        code = message.get("code", 0)
+                        break
+            except BaseException:
+                self._stop(kill=True)
+                raise
+            if code is None:
+                # Crashed or stopped, the next job starts a new worker.
+                self._stop(kill=True)
+                if not aborted:
+                    code = process.returncode or -1
+                    logger.error("worker %s exited with %s", process.pid,
+                                 process.returncode)
+            elif self.jobs >= self.max_jobs:
+                self._stop()
+            return code, aborted
+
+    def terminate(self):
+        """Kill the worker from another thread, its job ends as a crash."""
+        process = self.process
+        if process is not None and process.poll() is None:
+            kill_process_tree(process.pid)
+
+    def close(self):
+        """Stop the worker process."""
+        with self._lock:
+            self._stop()
+
@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""Lifecycle of the analysis workspaces under the workspace root.
+
+Every analysis writes its json files to its own folder under the workspace
+root, ``~/renderfarm_sdk`` by default. The manager tracks the folders it
+created and removes the least recently used ones beyond an age, a total size
+or a count. Only a folder whose marker says the manager created it is ever
+removed, other folders of the root are left alone whatever their name.
+
+A workspace in use holds a lock file with the pid and host of its owner,
+cleanup never removes a workspace whose owner is still alive, so it is safe
+to run while other analyses, threads or processes, use the same root.
+
+Layout of the workspace root::
+
+    <root>/.cleanup                      time of the last cleanup
+    <root>/<time><id>_<n>/.lock          pid@host of the owner, if in use
+                      /.workspace.json   creation, scene, size and last use
+    <root>/scene_<digest>/...            workspace reused for one scene
+
+"""
+
+# Import built-in models
+import collections
+import errno
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+
+LOCK_FILE = ".lock"
+
+MARKER_FILE = ".workspace.json"
+
+CLEANUP_FILE = ".cleanup"
+
+# Workspaces being removed are renamed with this prefix first.
+TRASH_PREFIX = ".trash_"
+
+WorkspaceInfo = collections.namedtuple(
+    "WorkspaceInfo", ["path", "scene", "size", "last_used", "active"])
+
+# Workspace names given by this process, see ``new_workspace_name``.
+_NAME_COUNTER = itertools.count()
+
+
+def new_workspace_name():
+    """Get the name of a new workspace, unique within this process.
+
+    The time and the pid, or the thread id outside the main thread, are
+    followed by a counter, so the jobs run one after the other by a pool
+    worker within a second get different names.
+
+    Returns:
+        str: Workspace name.
+            e.g.:
+                "1700000000123_0"
+
+    """
+    ident = threading.get_ident() if (
+        threading.current_thread() is not threading.main_thread()
+    ) else os.getpid()
+    return "{}{}_{}".format(int(time.time()), ident, next(_NAME_COUNTER))
+
+
+def claim_folder(path):
+    """Create a new folder, with a suffix if ``path`` already exists.
+
+    The folder is created with a single ``mkdir``, two processes never get
+    the same one.
+
+    Args:
+        path (str): Wanted folder path, its parent is created if needed.
+
+    Returns:
+        str: Path of the created folder.
+
+    """
+    parent = os.path.dirname(path)
+    if parent and not os.path.isdir(parent):
+        try:
+            os.makedirs(parent)
+        except OSError:
+            if not os.path.isdir(parent):
+                raise
+    candidate = path
+    for number in itertools.count(1):
+        try:
+            os.mkdir(candidate)
+            return candidate
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        candidate = "{}_{}".format(path, number)
+
+
+def scene_workspace_name(scene):
+    """Get the name of the workspace reused for a scene.
+
+    Args:
+        scene (str): Scene file path.
+
+    Returns:
+        str: Workspace name.
+            e.g.:
+                "scene_3f2a9c0d1e4b5a67"
+
+    """
+    scene = os.path.normcase(os.path.abspath(scene)).replace("\\", "/")
+    return "scene_" + hashlib.sha1(scene.encode("utf-8")).hexdigest()[:16]
+
+
+def folder_size(folder):
+    """Get the total size of the files under a folder, in bytes."""
+    total = 0
+    stack = [folder]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass
+    return total
+
+
+def pid_alive(pid):
+    """Check whether a process of this host is running.
+
+    Args:
+        pid (int): Process id.
+
+    Returns:
+        bool: True if the process exists.
+
+    """
+    if pid <= 0:
+        return False
+    if sys.platform.startswith("win"):
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            # STILL_ACTIVE
+            return exit_code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except OSError as err:
+        return err.errno == errno.EPERM
+    return True
+
+
+class WorkspaceManager(object):
+    """Create, lock, reuse and evict the workspaces of a workspace root."""
+
+    def __init__(self, root, max_age=None, max_bytes=None,
+                 max_count=None, cleanup_interval=3600,
+                 stale_lock_age=24 * 3600):
+        """Initialize the manager.
+
+        Args:
+            root (str): Workspace root, created on first use.
+            max_age (float, optional): Seconds after its last use a
+                workspace is removed, default None keeps them forever.
+            max_bytes (int, optional): Total size of the workspaces, the
+                least recently used are removed beyond it.
+            max_count (int, optional): Number of workspaces kept.
+            cleanup_interval (float): Seconds between two cleanups started
+                by ``maybe_cleanup``.
+            stale_lock_age (float): Seconds after which the lock of another
+                host is taken as stale, the pid of another host can not be
+                checked.
+
+        """
+        self.root = root
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.cleanup_interval = cleanup_interval
+        self.stale_lock_age = stale_lock_age
+        self.owner = "{}@{}".format(os.getpid(), socket.gethostname())
+        self._owned = set()
+        self._lock = threading.Lock()
+
+    def new_path(self):
+        """Get the path of a new workspace, see ``new_workspace_name``."""
+        return os.path.join(self.root, new_workspace_name())
+
+    def scene_path(self, scene):
+        """Get the path of the workspace reused for a scene."""
+        return os.path.join(self.root, scene_workspace_name(scene))
+
+    def _lock_path(self, path):
+        return os.path.join(path, LOCK_FILE)
+
+    def _is_stale(self, lock_path):
+        """Check whether a lock file was left by a dead owner."""
+        try:
+            with open(lock_path) as lock_f:
+                owner = lock_f.read().strip()
+            lock_age = time.time() - os.path.getmtime(lock_path)
+        except (IOError, OSError):
+            # Released meanwhile.
+            return False
+        if not owner:
+            # Created, the owner is being written.
+            return lock_age > 60
+        pid, _, host = owner.partition("@")
+        if host == socket.gethostname():
+            try:
+                return not pid_alive(int(pid))
+            except ValueError:
+                return True
+        return lock_age > self.stale_lock_age
+
+    def acquire(self, path):
+        """Lock a workspace for this process.
+
+        A lock left by a dead owner is taken over.
+
+        Args:
+            path (str): Existing workspace path.
+
+        Returns:
+            bool: True if locked, False if another live owner holds it.
+
+        """
+        lock_path = self._lock_path(path)
+        for _ in range(2):
+            try:
+                lock_fd = os.open(lock_path,
+                                  os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except OSError as err:
+                if err.errno != errno.EEXIST:
+                    raise
+                if not self._is_stale(lock_path):
+                    return False
+                # Move the stale lock away, only one process succeeds.
+                try:
+                    os.rename(lock_path, "{}.{}.{}".format(
+                        lock_path, os.getpid(), threading.get_ident()))
+                except OSError:
+                    return False
+                self._remove_stale_locks(path)
+                continue
+            with os.fdopen(lock_fd, "w") as lock_f:
+                lock_f.write(self.owner)
+            with self._lock:
+                self._owned.add(os.path.abspath(path))
+            return True
+        return False
+
+    @staticmethod
+    def _remove_stale_locks(path):
+        """Remove the stale locks moved away by ``acquire``."""
+        for name in os.listdir(path):
+            if name.startswith(LOCK_FILE + "."):
+                try:
+                    os.remove(os.path.join(path, name))
+                except OSError:
+                    pass
+
+    def open(self, path, scene=None, new=False):
+        """Create and lock a workspace.
+
+        A workspace created here is marked as managed, so cleanup may
+        remove it later, an existing folder is only locked.
+
+        Args:
+            path (str): Workspace path, see ``new_path`` and ``scene_path``.
+            scene (str, optional): Scene analysed in the workspace.
+            new (bool): Never use an existing folder, a suffix is added to
+                ``path`` if it exists, default is False.
+
+        Returns:
+            str: The locked workspace, a new one if ``path`` is locked by
+                another analysis.
+
+        """
+        created = False
+        if new or not os.path.exists(path):
+            path = claim_folder(path)
+            created = True
+        if not self.acquire(path):
+            path = claim_folder(self.new_path())
+            created = True
+            self.acquire(path)
+        self.write_marker(path, scene=scene, managed=created or None)
+        return path
+
+    def write_marker(self, path, **info):
+        """Update the marker of a workspace, its mtime is the last use."""
+        marker_path = os.path.join(path, MARKER_FILE)
+        marker = self.read_marker(path)
+        marker.update((key, value) for key, value in info.items()
+                      if value is not None)
+        with open(marker_path, "w") as marker_f:
+            json.dump(marker, marker_f)
+
+    @staticmethod
+    def read_marker(path):
+        """Read the marker of a workspace, empty for an unmanaged one."""
+        try:
+            with open(os.path.join(path, MARKER_FILE)) as marker_f:
+                return json.load(marker_f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def release(self, path):
+        """Unlock a workspace and record its size.
+
+        Args:
+            path (str): Workspace locked by ``open`` or ``acquire``.
+
+        """
+        with self._lock:
+            self._owned.discard(os.path.abspath(path))
+        if not os.path.isdir(path):
+            return
+        self.write_marker(path, size=folder_size(path))
+        try:
+            os.remove(self._lock_path(path))
+        except OSError:
+            pass
+
+    def is_active(self, path):
+        """Check whether a workspace is locked by a live owner."""
+        if os.path.abspath(path) in self._owned:
+            return True
+        lock_path = self._lock_path(path)
+        return os.path.exists(lock_path) and not self._is_stale(lock_path)
+
+    def list_workspaces(self):
+        """List the workspaces of the root created by a manager.
+
+        Returns:
+            list: WorkspaceInfo of each workspace, least recently used
+                first.
+
+        """
+        workspaces = []
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return workspaces
+        for entry in entries:
+            if (entry.name.startswith(TRASH_PREFIX) or
+                    not entry.is_dir(follow_symlinks=False)):
+                continue
+            marker = self.read_marker(entry.path)
+            if not marker.get("managed"):
+                # Not created by a manager, e.g. a folder of the user.
+                continue
+            try:
+                last_used = os.path.getmtime(
+                    os.path.join(entry.path, MARKER_FILE))
+            except OSError:
+                last_used = entry.stat().st_mtime
+            size = marker.get("size")
+            if size is None:
+                size = folder_size(entry.path)
+            workspaces.append(WorkspaceInfo(
+                entry.path, marker.get("scene"), size, last_used,
+                self.is_active(entry.path)))
+        workspaces.sort(key=lambda info: info.last_used)
+        return workspaces
+
+    def remove(self, path):
+        """Remove a workspace unless another analysis uses it.
+
+        Returns:
+            bool: True if removed.
+
+        """
+        if not self.acquire(path):
+            return False
+        trash_path = os.path.join(os.path.dirname(path), "{}{}_{}".format(
+            TRASH_PREFIX, os.path.basename(path), os.getpid()))
+        try:
+            os.rename(path, trash_path)
+        except OSError:
+            self.release(path)
+            return False
+        with self._lock:
+            self._owned.discard(os.path.abspath(path))
+        shutil.rmtree(trash_path, ignore_errors=True)
+        return True
+
+    def cleanup(self, exclude=()):
+        """Remove the workspaces beyond the age, size and count quotas.
+
+        Workspaces in use are never removed, they still count towards the
+        size and count quotas.
+
+        Args:
+            exclude (iterable): Workspace paths kept in any case.
+
+        Returns:
+            list: Paths of the removed workspaces.
+
+        """
+        exclude = {os.path.abspath(path) for path in exclude}
+        workspaces = self.list_workspaces()
+        now = time.time()
+        total_bytes = sum(info.size for info in workspaces)
+        count = len(workspaces)
+        removed = []
+        for info in workspaces:
+            expired = (self.max_age is not None and
+                       now - info.last_used > self.max_age)
+            over_size = (self.max_bytes is not None and
+                         total_bytes > self.max_bytes)
+            over_count = (self.max_count is not None and
+                          count > self.max_count)
+            if not (expired or over_size or over_count):
+                # Sorted by last use, the next ones are newer.
+                break
+            if (info.active or os.path.abspath(info.path) in exclude or
+                    not self.remove(info.path)):
+                continue
+            removed.append(info.path)
+            total_bytes -= info.size
+            count -= 1
+        self._remove_trash()
+        return removed
+
+    def _remove_trash(self):
+        """Remove the leftovers of interrupted removals."""
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.startswith(TRASH_PREFIX):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def maybe_cleanup(self, exclude=()):
+        """Run ``cleanup`` if the last one is older than the interval.
+
+        Returns:
+            list: Paths of the removed workspaces, empty if skipped.
+
+        """
+        stamp_path = os.path.join(self.root, CLEANUP_FILE)
+        try:
+            if time.time() - os.path.getmtime(
+                    stamp_path) < self.cleanup_interval:
+                return []
+        except OSError:
+            pass
+        try:
+            with open(stamp_path, "w") as stamp_f:
+                stamp_f.write(str(time.time()))
+        except (IOError, OSError):
+            return []
+        return self.cleanup(exclude)
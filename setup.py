@@ -21,6 +21,9 @@ setup(
     description='A Python-based API for Using Renderbus cloud rendering service.',
     entry_points={},
     install_requires=list(parse_requirements("requirements.txt")),
+    extras_require={
+        'fast-json': ['orjson'],
+    },
     package_data={
         'rayvision_clarisse': ["./tool/*/*"],
     },